@@ -0,0 +1,387 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Measure the receive performance of the JPEG and MJPEG samples with the camera simulator.
+    カメラシミュレータを使って JPEG と MJPEG サンプルの受信性能を計測します。
+
+[Details]
+    This program starts camera_simulator.py in another process, runs the receive part of each sample
+    without a window for a fixed time, and prints sustained fps, CPU usage and latency.
+
+        jpeg_1      connect_with_jpeg_1.py          requests.get() with a new HTTPDigestAuth for every frame.
+        jpeg_2      connect_with_jpeg_2.py - 5.py   One requests.Session.
+        jpeg_6      connect_with_jpeg_6.py          ReceiveImageProcess() (requests.Session + PIL) in another process.
+        jpeg_async  jpeg_async_poller.py            AsyncSnapshotPoller. (asyncio + aiohttp)
+        mjpeg_cv2   connect_with_mjpeg_1_1.py, 2.py, 3_1.py, 5.py   cv2.VideoCapture().
+        mjpeg_1_2   connect_with_mjpeg_1_2.py, 4.py urllib + MjpegStreamReader.
+        mjpeg_6     connect_with_mjpeg_6.py         ReceiveImageProcess() (cv2.VideoCapture + SharedFrameRing)
+                                                    in another process.
+
+    Every path decodes the image and resizes it to the display size (1280x720) as the samples do.
+    Only cv2.imshow() and the GUI are skipped.
+    CPU is the CPU time of this process and its child processes (the simulator is not included) divided by
+    the elapsed time. 100% means one CPU core.
+    Latency is the time from the simulator sending a frame until the frame is decoded.
+    It is measured only for the paths that see the JPEG data. ("-" for the others)
+    Frames of the JPEG paths are images the client requested, so "fps" is the maximum polling rate.
+
+    このプログラムは camera_simulator.py を別プロセスで起動し、各サンプルの受信処理をウィンドウなしで一定時間実行して、
+    継続的な fps、CPU 使用率、遅延を表示します。
+
+    全ての方法で、サンプルと同様に画像をデコードし表示サイズ (1280x720) にリサイズします。cv2.imshow() と GUI だけを省略します。
+    CPU は本プロセスと子プロセスの CPU 時間 (シミュレータは含まない) を経過時間で割った値です。100% は CPU １コアです。
+    遅延はシミュレータがフレームを送信してから、そのフレームをデコードするまでの時間です。
+    JPEG データを参照できる方法のみ計測します。(その他は "-")
+    JPEG の方法はクライアントが要求した画像なので、"fps" は最大のポーリングレートです。
+
+    Usage:
+        python benchmark_capture.py --duration 10 --fps 30
+        python benchmark_capture.py --dir images --paths jpeg_2,mjpeg_1_2 --jitter 0.005 --disconnect-after 100
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:        pip install opencv-python
+    numpy:      pip install numpy
+    requests:   pip install requests
+    aiohttp:    pip install aiohttp         (jpeg_async)
+    PIL:        pip install pillow          (jpeg_6, mjpeg_6)
+'''
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import sys
+import time
+import urllib.request as rq
+
+import cv2
+import numpy as np
+import requests
+from requests.auth import HTTPDigestAuth
+
+import camera_simulator as sim     # Local module. See 'camera_simulator.py'.
+
+# The samples to measure are in the sibling folders.
+# 計測するサンプルは隣のフォルダにある。
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(base_dir, '..', 'connect_with_jpeg'))
+sys.path.append(os.path.join(base_dir, '..', 'connect_with_mjpeg'))
+from mjpeg_stream import MjpegStreamReader          # Local module. See 'connect_with_mjpeg/mjpeg_stream.py'.
+from shared_frame_ring import SharedFrameRing       # Local module. See 'connect_with_mjpeg/shared_frame_ring.py'.
+
+
+display_size = (1280, 720)      # Size to resize for display. (same as the samples)
+frame_shape  = (1080, 1920, 3)  # Max image size for SharedFrameRing.
+
+
+class CaptureStats():
+    '''
+    Statistics of one path.
+    １つの方法の統計。
+    '''
+
+    def __init__(self):
+        self.frames = 0
+        self.latencies = []
+        self.reconnects = 0
+        self.errors = 0
+
+    def add(self, send_time=None):
+        ''' Count one decoded frame. send_time is the time inserted by the simulator. '''
+        self.frames += 1
+        if send_time is not None:
+            self.latencies.append(time.time() - send_time)
+
+
+def DecodeJpeg(jpg, stats):
+    ''' Decode and resize the JPEG data as the samples do, and count it. '''
+    img = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        stats.errors += 1
+        return
+    cv2.resize(img, display_size)
+    stats.add(sim.ReadSendTime(jpg))
+
+
+def SnapshotUrl(host):
+    return f"http://{host}/cgi-bin/camera?resolution=1920"
+
+
+def MjpegUrl(host, user=True):
+    credential = f"{sim.user_id}:{sim.user_pw}@" if user else ""
+    return f"http://{credential}{host}/cgi-bin/nphMotionJpeg?Resolution=1920x1080&Quality=Standard&Framerate=30"
+
+
+def CaptureJpegRequests(host, deadline, stats):
+    ''' connect_with_jpeg_1.py: requests.get() with a new HTTPDigestAuth for every frame. '''
+    url = SnapshotUrl(host)
+    while time.perf_counter() < deadline:
+        try:
+            rs = requests.get(url, auth=HTTPDigestAuth(sim.user_id, sim.user_pw), timeout=10)
+            DecodeJpeg(rs.content, stats)
+        except requests.exceptions.RequestException:
+            stats.errors += 1
+
+
+def CaptureJpegSession(host, deadline, stats):
+    ''' connect_with_jpeg_2.py - 5.py: one requests.Session. '''
+    url = SnapshotUrl(host)
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(sim.user_id, sim.user_pw)
+    while time.perf_counter() < deadline:
+        try:
+            rs = session.get(url, timeout=10)
+            DecodeJpeg(rs.content, stats)
+        except requests.exceptions.RequestException:
+            stats.errors += 1
+    session.close()
+
+
+def Jpeg6Process(host, imageSender, request, canvas_size):
+    ''' Run ReceiveImageProcess() of connect_with_jpeg_6.py for the simulator. '''
+    import connect_with_jpeg_6 as sample
+    sample.user_id = sim.user_id
+    sample.user_pw = sim.user_pw
+    sample.url = SnapshotUrl(host)
+    sample.ReceiveImageProcess(imageSender, request, canvas_size)
+
+
+def CaptureJpegProcess(host, deadline, stats):
+    ''' connect_with_jpeg_6.py: ReceiveImageProcess() in another process. '''
+    imageReceiver, imageSender = mp.Pipe(False)
+    request = mp.Value('i', 0)
+    canvas_size = mp.Array('i', display_size)
+    p = mp.Process(target=Jpeg6Process, args=(host, imageSender, request, canvas_size), daemon=True)
+    p.start()
+    while time.perf_counter() < deadline:
+        if imageReceiver.poll(0.1):
+            pil_image, captured_time = imageReceiver.recv()
+            stats.add()
+
+    # The process may be waiting in send(). Read the pipe until it ends.
+    request.value = -1
+    while p.is_alive():
+        if imageReceiver.poll(0.1):
+            imageReceiver.recv()
+    p.join()
+
+
+def CaptureJpegAsync(host, deadline, stats):
+    ''' jpeg_async_poller.py: AsyncSnapshotPoller. '''
+    from jpeg_async_poller import AsyncSnapshotPoller, CameraSetting
+
+    async def Poll():
+        cameras = [CameraSetting('simulator', host, sim.user_id, sim.user_pw, rate=1000.0)]
+        # Keep only the newest image like a display. A longer queue adds its waiting time to the latency.
+        # 表示と同様に最新の画像だけを保持する。キューが長いと、その待ち時間が遅延に加わる。
+        async with AsyncSnapshotPoller(cameras, queue_size=1) as poller:
+            while time.perf_counter() < deadline:
+                try:
+                    name, jpeg, captured_time = await asyncio.wait_for(poller.__anext__(), 1.0)
+                except asyncio.TimeoutError:
+                    continue
+                DecodeJpeg(jpeg, stats)
+
+    asyncio.run(Poll())
+
+
+def CaptureMjpegOpenCV(host, deadline, stats):
+    ''' connect_with_mjpeg_1_1.py, 2.py, 3_1.py, 5.py: cv2.VideoCapture(). '''
+    url = MjpegUrl(host)
+    cap = cv2.VideoCapture(url)
+    while time.perf_counter() < deadline:
+        ret, frame = cap.read()
+        if ret == True:
+            cv2.resize(frame, display_size)
+            stats.add()
+        else:
+            # Reconnect
+            stats.reconnects += 1
+            cap.release()
+            cap = cv2.VideoCapture(url)
+    cap.release()
+
+
+def CaptureMjpegReader(host, deadline, stats):
+    ''' connect_with_mjpeg_1_2.py, 4.py: urllib + MjpegStreamReader. '''
+    url = MjpegUrl(host, user=False)
+    pass_mgr = rq.HTTPPasswordMgrWithDefaultRealm()
+    pass_mgr.add_password(realm=None, uri=url, user=sim.user_id, passwd=sim.user_pw)
+    opener = rq.build_opener(rq.HTTPDigestAuthHandler(pass_mgr))
+
+    stream = opener.open(url)
+    reader = MjpegStreamReader(stream)
+    while time.perf_counter() < deadline:
+        jpg = reader.read_frame()
+        if jpg is None:
+            # The connection was closed by the camera. Reconnect.
+            stats.reconnects += 1
+            stream.close()
+            stream = opener.open(url)
+            reader = MjpegStreamReader(stream)
+            continue
+        DecodeJpeg(jpg, stats)
+    stream.close()
+
+
+def Mjpeg6Process(host, imageSender, ring, request, canvas_size):
+    ''' Run ReceiveImageProcess() of connect_with_mjpeg_6.py for the simulator. '''
+    import connect_with_mjpeg_6 as sample
+    sample.url = MjpegUrl(host)
+    sample.ReceiveImageProcess(imageSender, ring, request, canvas_size)
+
+
+def CaptureMjpegProcess(host, deadline, stats):
+    ''' connect_with_mjpeg_6.py: ReceiveImageProcess() in another process with SharedFrameRing. '''
+    imageReceiver, imageSender = mp.Pipe(False)
+    ring = SharedFrameRing(slots=3, max_shape=frame_shape)
+    request = mp.Value('i', 0)
+    canvas_size = mp.Array('i', display_size)
+    p = mp.Process(target=Mjpeg6Process, args=(host, imageSender, ring, request, canvas_size), daemon=True)
+    p.start()
+    while time.perf_counter() < deadline:
+        if imageReceiver.poll(0.1):
+            seq, captured_time = imageReceiver.recv()
+            if ring.get(seq) is not None:
+                stats.add()
+
+    request.value = -1
+    while p.is_alive():
+        if imageReceiver.poll(0.1):
+            imageReceiver.recv()
+    p.join()
+    ring.close()
+    ring.unlink()
+
+
+# name: (sample, function)
+CAPTURE_PATHS = {
+    'jpeg_1':       ('connect_with_jpeg_1',                 CaptureJpegRequests),
+    'jpeg_2':       ('connect_with_jpeg_2 - 5',             CaptureJpegSession),
+    'jpeg_6':       ('connect_with_jpeg_6',                 CaptureJpegProcess),
+    'jpeg_async':   ('jpeg_async_poller',                   CaptureJpegAsync),
+    'mjpeg_cv2':    ('connect_with_mjpeg_1_1, 2, 3_1, 5',   CaptureMjpegOpenCV),
+    'mjpeg_1_2':    ('connect_with_mjpeg_1_2, 4',           CaptureMjpegReader),
+    'mjpeg_6':      ('connect_with_mjpeg_6',                CaptureMjpegProcess),
+}
+
+
+def CpuTime():
+    ''' CPU time [sec] of this process and the finished child processes. '''
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def RunCapturePath(name, host, duration):
+    '''
+    Run one path for 'duration' seconds.
+    １つの方法を 'duration' 秒実行する。
+
+    Returns:
+        Result in dictionary format.
+    '''
+    sample, function = CAPTURE_PATHS[name]
+    stats = CaptureStats()
+    cpu = CpuTime()
+    start = time.perf_counter()
+    function(host, start + duration, stats)
+    elapsed = time.perf_counter() - start
+    cpu = CpuTime() - cpu
+
+    latencies = np.array(stats.latencies) * 1000
+    return {
+        'name':         name,
+        'sample':       sample,
+        'frames':       stats.frames,
+        'fps':          stats.frames / elapsed,
+        'cpu_percent':  cpu / elapsed * 100,
+        'latency_ms_avg': float(latencies.mean()) if len(latencies) > 0 else None,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) > 0 else None,
+        'latency_ms_p95': float(np.percentile(latencies, 95)) if len(latencies) > 0 else None,
+        'latency_ms_p99': float(np.percentile(latencies, 99)) if len(latencies) > 0 else None,
+        'reconnects':   stats.reconnects,
+        'errors':       stats.errors,
+    }
+
+
+def SimulatorProcess(args, port_queue, stop):
+    ''' Run the camera simulator in another process, so that its CPU time is not measured. '''
+    if args.dir is not None:
+        frames = sim.LoadJpegFiles(args.dir)
+    else:
+        frames = sim.MakeTestJpegs(30, args.width, args.height)
+    server = sim.StartCameraSimulator(frames, fps=args.fps, jitter=args.jitter, delay=args.delay,
+                                      disconnect_after=args.disconnect_after)
+    port_queue.put((server.server_address[1], len(frames), sum(len(f) for f in frames) // len(frames)))
+    stop.wait()
+    sim.StopCameraSimulator(server)
+
+
+def PrintResult(result):
+    latency = '-'
+    if result['latency_ms_avg'] is not None:
+        latency = f"{result['latency_ms_avg']:6.1f} / {result['latency_ms_p95']:6.1f}"
+    print(f"{result['name']:11s} {result['sample']:35s} {result['frames']:7d} {result['fps']:8.1f} "
+          f"{result['cpu_percent']:7.1f} {latency:>17s} {result['reconnects']:6d} {result['errors']:6d}")
+
+
+if __name__ == '__main__':
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Measure the receive performance of the JPEG and MJPEG samples.')
+    parser.add_argument('--paths', default=','.join(CAPTURE_PATHS), help='comma separated paths to measure.')
+    parser.add_argument('--duration', type=float, default=10.0, help='time [sec] to measure each path.')
+    parser.add_argument('--dir', default=None, help='folder of JPEG files. If not given, test images are created.')
+    parser.add_argument('--width', type=int, default=1920, help='width of the test images.')
+    parser.add_argument('--height', type=int, default=1080, help='height of the test images.')
+    parser.add_argument('--fps', type=float, default=30, help='MJPEG frame rate of the simulator.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random variation [sec] of the frame interval.')
+    parser.add_argument('--delay', type=float, default=0.0, help='time [sec] to create one snapshot.')
+    parser.add_argument('--disconnect-after', type=int, default=0, help='close the connection after N frames.')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.paths.split(',') if name.strip() != '']
+    for name in names:
+        if name not in CAPTURE_PATHS:
+            print(f"[ERROR] Unknown path: {name}  ({', '.join(CAPTURE_PATHS)})")
+            raise SystemExit(1)
+
+    port_queue = mp.Queue()
+    stop = mp.Event()
+    simulator = mp.Process(target=SimulatorProcess, args=(args, port_queue, stop), daemon=True)
+    simulator.start()
+    port, count, size = port_queue.get()
+    host = f"127.0.0.1:{port}"
+    print(f"Camera simulator: {host}  {count} images  {size // 1024} KB/image  MJPEG {args.fps} fps")
+    print(f"{'path':11s} {'sample':35s} {'frames':>7s} {'fps':>8s} {'CPU%':>7s} {'latency avg/p95':>17s} "
+          f"{'recon':>6s} {'errors':>6s}")
+
+    try:
+        for name in names:
+            PrintResult(RunCapturePath(name, host, args.duration))
+    except KeyboardInterrupt:
+        # Press '[ctrl] + [c]' on the console to exit the program.
+        print("KeyboardInterrupt")
+
+    stop.set()
+    simulator.join()
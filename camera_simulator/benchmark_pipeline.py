@@ -0,0 +1,654 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Measure the capture and analytics pipelines of the samples, and compare the result with a baseline.
+    サンプルの受信処理と解析処理を計測し、結果をベースラインと比較します。
+
+[Details]
+    This program runs each pipeline below without a window for a fixed time against the camera simulator
+    (or a recorded video file / camera URL given by --source), and writes the result to a JSON report.
+
+        rtsp_3_1            connect_with_rtsp_3_1.py            Face detection in the main loop.
+        rtsp_3_2            connect_with_rtsp_3_2.py            Face detection in another process with SharedFrameRing.
+        classification_1    classification_with_camera_1.py     Image classification (VGG16) in the main loop.
+        classification_2    classification_with_camera_2.py     Image classification (VGG16) in another process.
+        jpeg_1, jpeg_2, ... benchmark_capture.py                Receive only. (JPEG and MJPEG samples)
+
+    Each pipeline runs in a new process, so that the memory of one pipeline does not affect the next one.
+    The report has the following values for each pipeline.
+
+        fps                 Frames displayed (or received) per second.
+        analysis_fps        Frames analysed per second.
+        latency_ms_p50/p99  Analysis pipelines: from the arrival of the frame to the analysis result.
+                            Receive only: from the simulator sending the frame to the decoded image.
+        captured, analysed, dropped
+                            Frames received, frames analysed, and frames received but never analysed.
+        processes           CPU usage and peak RSS of every process of the pipeline. 100% means one CPU core.
+
+    With --baseline, fps, analysis_fps, latency, CPU and RSS are compared with a stored report,
+    and the program exits with 1 if any value is worse than --tolerance.
+
+    下記の各パイプラインを、カメラシミュレータ (または --source で指定した録画ファイル / カメラの URL) に対して
+    ウィンドウなしで一定時間実行し、結果を JSON 形式のレポートに出力します。
+
+    各パイプラインは新しいプロセスで実行するので、あるパイプラインのメモリが次のパイプラインに影響しません。
+    --baseline を指定すると、fps、analysis_fps、遅延、CPU、RSS を保存済みのレポートと比較し、
+    いずれかの値が --tolerance より悪化した場合は終了コード 1 で終了します。
+
+    Usage:
+        python benchmark_pipeline.py --duration 20 --output baseline.json
+        python benchmark_pipeline.py --duration 20 --output report.json --baseline baseline.json
+        python benchmark_pipeline.py --source recorded.mp4 --pipelines rtsp_3_1,rtsp_3_2
+        python benchmark_pipeline.py --compare report.json --baseline baseline.json
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:        pip install opencv-python
+    numpy:      pip install numpy
+    torch, torchvision : see https://pytorch.org/get-started/locally/   (classification_1, 2)
+
+[Note]
+    rtsp_3_1 and rtsp_3_2 need "haarcascade_frontalface_alt2.xml". (see connect_with_rtsp_3_1.py)
+    classification_1 and 2 need "data/imagenet_class_index.json". (see image_classification_vgg/preparation.py)
+    Pipelines whose files or libraries are not found are reported as "skipped".
+    Peak RSS is not available on Windows.
+'''
+
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import benchmark_capture as capture     # Local module. See 'benchmark_capture.py'.
+
+# The samples to measure are in the sibling folders.
+# 計測するサンプルは隣のフォルダにある。
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(base_dir, '..', 'connect_with_rtsp'))
+sys.path.append(os.path.join(base_dir, '..', 'image_classification_vgg'))
+from latest_frame_capture import LatestFrameCapture     # Local module. See 'connect_with_rtsp/latest_frame_capture.py'.
+from shared_frame_ring import SharedFrameRing           # Local module. See 'connect_with_rtsp/shared_frame_ring.py'.
+
+
+REPORT_VERSION = 1
+
+# Values compared with the baseline. (name, +1: larger is better, -1: smaller is better)
+COMPARE_METRICS = [
+    ('fps',             +1),
+    ('analysis_fps',    +1),
+    ('latency_ms_p50',  -1),
+    ('latency_ms_p99',  -1),
+    ('cpu_percent',     -1),
+    ('rss_peak_mb',     -1),
+]
+
+# Exception definition
+SkipPipeline = type('SkipPipeline', (Exception,), {})
+
+
+def PeakRss():
+    ''' Peak RSS [MB] of this process. None if it is not available. (Windows) '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+class ProcessMeter():
+    '''
+    CPU usage and peak RSS of this process.
+    本プロセスの CPU 使用率とピーク RSS。
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    def result(self):
+        elapsed = time.perf_counter() - self.start
+        return {
+            'name':         self.name,
+            'pid':          os.getpid(),
+            'cpu_percent':  (time.process_time() - self.cpu_start) / elapsed * 100,
+            'rss_peak_mb':  PeakRss(),
+        }
+
+
+def LatencySummary(latencies):
+    ''' Return avg / p50 / p99 [ms] of the latencies [sec]. '''
+    if len(latencies) == 0:
+        return {'latency_ms_avg': None, 'latency_ms_p50': None, 'latency_ms_p99': None}
+    latencies = np.array(latencies) * 1000
+    return {
+        'latency_ms_avg': float(latencies.mean()),
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p99': float(np.percentile(latencies, 99)),
+    }
+
+
+class PipelineStats():
+    '''
+    Statistics of one analysis pipeline.
+    １つの解析パイプラインの統計。
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.displayed = 0
+        self.analysed = 0
+        self.latencies = []
+
+    def add_result(self, captured_time):
+        ''' Count one analysis result of the frame captured at 'captured_time' (time.time()). '''
+        self.analysed += 1
+        self.latencies.append(time.time() - captured_time)
+
+    def result(self, captured, reconnects=0):
+        elapsed = time.perf_counter() - self.start
+        result = {
+            'fps':          self.displayed / elapsed,
+            'analysis_fps': self.analysed / elapsed,
+            'captured':     captured,
+            'analysed':     self.analysed,
+            'dropped':      max(captured - self.analysed, 0),
+            'reconnects':   reconnects,
+        }
+        result.update(LatencySummary(self.latencies))
+        return result
+
+
+def LoadCascade(cascade_file):
+    ''' Load the haarcascade file. The folder of opencv-python is also searched. '''
+    if not hasattr(cv2, 'CascadeClassifier'):
+        raise SkipPipeline("cv2.CascadeClassifier is not available in this OpenCV.")
+    candidates = [cascade_file]
+    if hasattr(cv2, 'data'):
+        candidates.append(os.path.join(cv2.data.haarcascades, os.path.basename(cascade_file)))
+    for path in candidates:
+        if os.path.exists(path):
+            return cv2.CascadeClassifier(path)
+    raise SkipPipeline(f"{cascade_file} is not found.")
+
+
+def ImportClassification(name, class_index):
+    ''' Import a classification sample. Raise SkipPipeline if torch or the class index file is not found. '''
+    if not os.path.exists(class_index):
+        raise SkipPipeline(f"{class_index} is not found.")
+    try:
+        return __import__(name)
+    except ImportError as e:
+        raise SkipPipeline(str(e))
+
+
+def OpenLatestFrameCapture(url, decode_on_demand):
+    ''' Open LatestFrameCapture and wait for the first frame, so that the connection time is not measured. '''
+    cap = LatestFrameCapture(url, decode_on_demand=decode_on_demand)
+    ret, frame = cap.read(timeout=10.0)
+    if ret == False:
+        cap.release()
+        raise RuntimeError(f"No frame from {url}")
+    return cap
+
+
+def ResizeToFit(frame, width, height):
+    ''' Resize keeping the aspect ratio as the classification samples do. '''
+    h, w = frame.shape[:2]
+    aspect = w / h
+    if width / height >= aspect:
+        nh = height
+        nw = round(nh * aspect)
+    else:
+        nw = width
+        nh = round(nw / aspect)
+    return cv2.resize(frame, (nw, nh))
+
+
+def RunFaceInline(url, deadline_sec, options, resultQueue):
+    ''' connect_with_rtsp_3_1.py: Face detection in the main loop. '''
+    cascade = LoadCascade(options.cascade)
+    import connect_with_rtsp_3_1 as sample
+    cap = OpenLatestFrameCapture(url, decode_on_demand=True)
+    captured = cap.captured
+
+    stats = PipelineStats()
+    deadline = stats.start + deadline_sec
+    while time.perf_counter() < deadline:
+        ret, frame = cap.read(timeout=1.0)
+        if ret == True:
+            face_list = sample.DetectFaces(cascade, frame)
+            sample.DrawFaceRectangles(frame, face_list)
+            stats.add_result(cap.frame_time)
+            cv2.resize(frame, (1280, 720))
+            stats.displayed += 1
+
+    cap.release()
+    return stats.result(cap.captured - captured)
+
+
+def FaceDetectionWorker(cascade_file, q1, q2, demand, ring, resultQueue):
+    ''' Run DetectFacesProcess() of connect_with_rtsp_3_2.py and report its CPU and RSS. '''
+    meter = ProcessMeter('face detection')
+    # Check the cascade before the import. The sample creates cv2.CascadeClassifier when it is imported.
+    cascade = LoadCascade(cascade_file)
+    import connect_with_rtsp_3_2 as sample
+    sample.cascade = cascade
+    sample.DetectFacesProcess(q1, q2, demand, ring)
+    resultQueue.put(('process', meter.result()))
+
+
+def RunFaceProcess(url, deadline_sec, options, resultQueue):
+    ''' connect_with_rtsp_3_2.py: Face detection in another process with SharedFrameRing. '''
+    # Check the cascade before the import. The sample creates cv2.CascadeClassifier when it is imported.
+    # サンプルは import 時に cv2.CascadeClassifier を作成するので、import の前に確認する。
+    LoadCascade(options.cascade)
+    import connect_with_rtsp_3_2 as sample
+
+    cap = cv2.VideoCapture(url)
+    ret, frame = cap.read()
+    if ret == False:
+        raise RuntimeError(f"No frame from {url}")
+
+    q1 = mp.Queue()
+    q2 = mp.Queue()
+    demand = mp.Event()
+    ring = SharedFrameRing(slots=3, max_shape=sample.frame_shape)
+    p = mp.Process(target=FaceDetectionWorker, args=(options.cascade, q1, q2, demand, ring, resultQueue))
+    p.daemon = True
+    p.start()
+
+    stats = PipelineStats()
+    deadline = stats.start + deadline_sec
+    captured = 0
+    reconnects = 0
+    sent_times = deque()
+    init = False
+    while time.perf_counter() < deadline:
+        ret, frame = cap.read()
+        if ret == True:
+            captured += 1
+            captured_time = time.time()
+
+            # Pass the image to the face detection process only when the process requests it.
+            if demand.is_set():
+                demand.clear()
+                q1.put(ring.put(frame))
+                sent_times.append(captured_time)
+
+            # The process returns the results in the order the images were sent, so the result is for
+            # the oldest image in sent_times. (The image sent just above may be the next one.)
+            # プロセスは画像を渡した順に結果を返すので、結果は sent_times の最も古い画像に対するもの。
+            if q2.qsize() != 0:
+                face_list = q2.get()
+                stats.add_result(sent_times.popleft())
+                init = True
+
+            if init == True:
+                sample.DrawFaceRectangles(frame, face_list)
+            cv2.resize(frame, (1280, 720))
+            stats.displayed += 1
+        else:
+            # Reconnect
+            reconnects += 1
+            cap.release()
+            cap = cv2.VideoCapture(url)
+
+    result = stats.result(captured, reconnects)
+    q1.put(-1)
+    p.join()
+    ring.close()
+    ring.unlink()
+    cap.release()
+    return result
+
+
+def RunClassificationInline(url, deadline_sec, options, resultQueue):
+    ''' classification_with_camera_1.py: Image classification in the main loop. '''
+    sample = ImportClassification('classification_with_camera_1', options.class_index)
+    classifier = sample.ImagenetClassificationVgg(options.class_index)
+    cap = OpenLatestFrameCapture(url, decode_on_demand=True)
+    captured = cap.captured
+
+    stats = PipelineStats()
+    deadline = stats.start + deadline_sec
+    while time.perf_counter() < deadline:
+        ret, frame = cap.read(timeout=1.0)
+        if ret == True:
+            result, score = classifier.do_classification(sample.CV2Pil(frame))
+            stats.add_result(cap.frame_time)
+            ResizeToFit(frame, 640, 480)
+            stats.displayed += 1
+
+    cap.release()
+    return stats.result(cap.captured - captured)
+
+
+def ClassificationWorker(class_index, q, doneQueue, resultQueue):
+    ''' Run ImageClassificationProcess() of classification_with_camera_2.py and report when each image is classified. '''
+    import classification_with_camera_2 as sample
+    meter = ProcessMeter('image classification')
+
+    class TimedClassification(sample.ImagenetClassificationVgg):
+        ''' Send the time of every result to doneQueue. The class index file is given by the option. '''
+        def __init__(self, class_index_file):
+            super().__init__(class_index)
+
+        def do_classification(self, image):
+            ret = super().do_classification(image)
+            doneQueue.put(time.time())
+            return ret
+
+    sample.ImagenetClassificationVgg = TimedClassification
+    sample.ImageClassificationProcess(q)
+    resultQueue.put(('process', meter.result()))
+
+
+def RunClassificationProcess(url, deadline_sec, options, resultQueue):
+    ''' classification_with_camera_2.py: Image classification in another process. '''
+    ImportClassification('classification_with_camera_2', options.class_index)
+
+    q = mp.Queue()
+    doneQueue = mp.Queue()
+    p = mp.Process(target=ClassificationWorker, args=(options.class_index, q, doneQueue, resultQueue))
+    p.start()
+    cap = OpenLatestFrameCapture(url, decode_on_demand=False)
+    captured = cap.captured
+
+    # The process classifies the images in the order they are put, so the n-th result is for the n-th image.
+    # プロセスは渡された順に画像を分類するので、n 番目の結果は n 番目の画像に対するもの。
+    put_times = deque()
+    stats = PipelineStats()
+    deadline = stats.start + deadline_sec
+    while time.perf_counter() < deadline:
+        ret, frame = cap.read(timeout=1.0)
+        if ret == True:
+            if (q.qsize() <= 1):
+                q.put(frame)
+                put_times.append(cap.frame_time)
+            ResizeToFit(frame, 640, 480)
+            stats.displayed += 1
+
+        while not doneQueue.empty():
+            done_time = doneQueue.get()
+            stats.analysed += 1
+            stats.latencies.append(done_time - put_times.popleft())
+
+    result = stats.result(cap.captured - captured)
+    q.put(-1)
+    p.join()
+    cap.release()
+    return result
+
+
+# name: (sample, function)
+PIPELINES = {
+    'rtsp_3_1':         ('connect_with_rtsp_3_1',           RunFaceInline),
+    'rtsp_3_2':         ('connect_with_rtsp_3_2',           RunFaceProcess),
+    'classification_1': ('classification_with_camera_1',    RunClassificationInline),
+    'classification_2': ('classification_with_camera_2',    RunClassificationProcess),
+}
+
+
+def PipelineProcess(name, url, host, options, resultQueue):
+    '''
+    Run one pipeline in this process and put the result to resultQueue.
+
+    Args:
+        name            [i] Name in PIPELINES or capture.CAPTURE_PATHS.
+        url             [i] Source of the analysis pipelines.
+        host            [i] Address of the camera simulator. None if --source is given.
+        options         [i] Command line options.
+        resultQueue     [o] ('process', dict) for every process, and ('result', dict) at the end.
+    '''
+    if not options.verbose:
+        # The samples print every result. Redirect the output of this process and its child processes.
+        # サンプルは結果を毎回表示するので、本プロセスと子プロセスの出力を捨てる。
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+    meter = ProcessMeter('main')
+    try:
+        if name in PIPELINES:
+            result = PIPELINES[name][1](url, options.duration, options, resultQueue)
+        else:
+            if host is None:
+                raise SkipPipeline("Receive only paths need the camera simulator.")
+            result = capture.RunCapturePath(name, host, options.duration)
+            result['dropped'] = None
+        result['status'] = 'ok'
+    except SkipPipeline as e:
+        result = {'status': 'skipped', 'reason': str(e)}
+    except Exception as e:
+        result = {'status': 'error', 'reason': repr(e)}
+
+    process = meter.result()
+    if 'cpu_percent' in result:
+        # RunCapturePath() includes the CPU of the receive process of jpeg_6 and mjpeg_6.
+        process['cpu_percent'] = result.pop('cpu_percent')
+    resultQueue.put(('process', process))
+    resultQueue.put(('result', result))
+
+
+def RunPipeline(name, url, host, options):
+    '''
+    Run one pipeline in a new process.
+    １つのパイプラインを新しいプロセスで実行する。
+
+    Returns:
+        Result in dictionary format.
+    '''
+    sample = PIPELINES[name][0] if name in PIPELINES else capture.CAPTURE_PATHS[name][0]
+    ctx = mp.get_context('spawn')
+    resultQueue = ctx.Queue()
+    p = ctx.Process(target=PipelineProcess, args=(name, url, host, options, resultQueue))
+    p.start()
+
+    processes = []
+    result = None
+    timeout = time.perf_counter() + options.duration + 120
+    while result is None and time.perf_counter() < timeout:
+        try:
+            kind, value = resultQueue.get(timeout=1.0)
+        except Exception:
+            if not p.is_alive() and resultQueue.empty():
+                break
+            continue
+        if kind == 'process':
+            processes.append(value)
+        else:
+            result = value
+    p.join(10)
+    if p.is_alive():
+        p.terminate()
+    if result is None:
+        result = {'status': 'error', 'reason': 'The pipeline process did not finish.'}
+
+    result = {'name': name, 'sample': sample, **result, 'processes': processes}
+    if result['status'] == 'ok':
+        result['cpu_percent'] = sum(process['cpu_percent'] for process in processes)
+        rss = [process['rss_peak_mb'] for process in processes if process['rss_peak_mb'] is not None]
+        result['rss_peak_mb'] = sum(rss) if len(rss) > 0 else None
+    return result
+
+
+def CompareReports(report, baseline, tolerance):
+    '''
+    Compare the report with the baseline and print the differences.
+    レポートをベースラインと比較し、差分を表示する。
+
+    Args:
+        report          [i] Report in dictionary format.
+        baseline        [i] Baseline report in dictionary format.
+        tolerance       [i] Allowed ratio of getting worse. (0.1: 10%)
+    Returns:
+        List of (pipeline name, metric name, baseline value, value) that got worse than tolerance.
+    '''
+    base_results = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"{'pipeline':17s} {'metric':15s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for result in report['results']:
+        base = base_results.get(result['name'])
+        if base is None or base['status'] != 'ok' or result['status'] != 'ok':
+            continue
+        for metric, direction in COMPARE_METRICS:
+            old = base.get(metric)
+            new = result.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / old
+            worse = change * direction < -tolerance
+            if worse:
+                regressions.append((result['name'], metric, old, new))
+            print(f"{result['name']:17s} {metric:15s} {old:10.1f} {new:10.1f} {change * 100:+7.1f}%"
+                  f"{'  << worse' if worse else ''}")
+    return regressions
+
+
+def PrintResult(result):
+    if result['status'] != 'ok':
+        print(f"{result['name']:17s} {result['status']}: {result['reason']}")
+        return
+
+    def Format(value, width):
+        return f"{value:{width}.1f}" if value is not None else f"{'-':>{width}s}"
+
+    analysis_fps = result.get('analysis_fps')
+    rss = result.get('rss_peak_mb')
+    dropped = result.get('dropped')
+    print(f"{result['name']:17s} {result['fps']:7.1f} {Format(analysis_fps, 8)} "
+          f"{Format(result['latency_ms_p50'], 8)} {Format(result['latency_ms_p99'], 8)} "
+          f"{dropped if dropped is not None else '-':>7} {result['cpu_percent']:7.1f} {Format(rss, 8)}")
+
+
+if __name__ == '__main__':
+    '''
+    [Abstract]
+        main function
+    '''
+    all_names = list(PIPELINES) + list(capture.CAPTURE_PATHS)
+    parser = argparse.ArgumentParser(description='Measure the capture and analytics pipelines of the samples.')
+    parser.add_argument('--pipelines', default=','.join(all_names), help='comma separated pipelines to measure.')
+    parser.add_argument('--duration', type=float, default=20.0, help='time [sec] to measure each pipeline.')
+    parser.add_argument('--source', default=None, help='video file or camera URL. If not given, the camera simulator is used.')
+    parser.add_argument('--dir', default=None, help='folder of JPEG files for the simulator. If not given, test images are created.')
+    parser.add_argument('--width', type=int, default=1920, help='width of the test images.')
+    parser.add_argument('--height', type=int, default=1080, help='height of the test images.')
+    parser.add_argument('--fps', type=float, default=30, help='MJPEG frame rate of the simulator.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random variation [sec] of the frame interval.')
+    parser.add_argument('--delay', type=float, default=0.0, help='time [sec] to create one snapshot.')
+    parser.add_argument('--disconnect-after', type=int, default=0, help='close the connection after N frames.')
+    parser.add_argument('--cascade', default='haarcascade_frontalface_alt2.xml', help='haarcascade file for rtsp_3_1, 3_2.')
+    parser.add_argument('--class-index', default=os.path.join(base_dir, '..', 'image_classification_vgg', 'data',
+                        'imagenet_class_index.json'), help='class index file for classification_1, 2.')
+    parser.add_argument('--output', default='benchmark_report.json', help='JSON report to write.')
+    parser.add_argument('--baseline', default=None, help='JSON report to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed ratio of getting worse than the baseline.')
+    parser.add_argument('--compare', default=None, help='compare this JSON report with --baseline without measuring.')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the samples.')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        if args.baseline is None:
+            print("[ERROR] --compare needs --baseline.")
+            raise SystemExit(1)
+        with open(args.compare, 'r') as f:
+            report = json.load(f)
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        raise SystemExit(1 if len(CompareReports(report, baseline, args.tolerance)) > 0 else 0)
+
+    names = [name.strip() for name in args.pipelines.split(',') if name.strip() != '']
+    for name in names:
+        if name not in all_names:
+            print(f"[ERROR] Unknown pipeline: {name}  ({', '.join(all_names)})")
+            raise SystemExit(1)
+
+    # Start the camera simulator in another process, so that its CPU time is not measured.
+    simulator = None
+    host = None
+    url = args.source
+    if url is None:
+        port_queue = mp.Queue()
+        stop = mp.Event()
+        simulator = mp.Process(target=capture.SimulatorProcess, args=(args, port_queue, stop), daemon=True)
+        simulator.start()
+        port, count, size = port_queue.get()
+        host = f"127.0.0.1:{port}"
+        url = capture.MjpegUrl(host)
+        print(f"Camera simulator: {host}  {count} images  {size // 1024} KB/image  MJPEG {args.fps} fps")
+
+    report = {
+        'version':  REPORT_VERSION,
+        'created':  datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': {
+            'system':       platform.platform(),
+            'python':       platform.python_version(),
+            'opencv':       cv2.__version__,
+            'numpy':        np.__version__,
+            'cpu_count':    os.cpu_count(),
+        },
+        'settings': {
+            'duration':     args.duration,
+            'source':       args.source if args.source is not None else 'camera simulator',
+            'dir':          args.dir,
+            'width':        args.width,
+            'height':       args.height,
+            'fps':          args.fps,
+            'jitter':       args.jitter,
+            'delay':        args.delay,
+            'disconnect_after': args.disconnect_after,
+        },
+        'results':  [],
+    }
+
+    print(f"{'pipeline':17s} {'fps':>7s} {'analysis':>8s} {'p50[ms]':>8s} {'p99[ms]':>8s} {'dropped':>7s} "
+          f"{'CPU%':>7s} {'RSS[MB]':>8s}")
+    try:
+        for name in names:
+            result = RunPipeline(name, url, host, args)
+            report['results'].append(result)
+            PrintResult(result)
+    except KeyboardInterrupt:
+        # Press '[ctrl] + [c]' on the console to exit the program.
+        print("KeyboardInterrupt")
+
+    if simulator is not None:
+        stop.set()
+        simulator.join()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report: {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        raise SystemExit(1 if len(CompareReports(report, baseline, args.tolerance)) > 0 else 0)
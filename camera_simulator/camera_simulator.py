@@ -0,0 +1,420 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Local i-PRO camera simulator for JPEG and MJPEG.
+    JPEG と MJPEG のローカル i-PRO カメラシミュレータ。
+
+[Details]
+    This program serves the following CGIs with digest authentication from a folder of JPEG files,
+    so that the programs in connect_with_jpeg and connect_with_mjpeg can be run and measured without a camera.
+
+        /cgi-bin/camera?resolution=1920                     One JPEG image. (snapshot)
+        /cgi-bin/nphMotionJpeg?Resolution=1920x1080&...     MJPEG stream. (multipart/x-mixed-replace)
+
+    The JPEG files are sent as they are (in file name order, repeatedly), so JPEG files with AI-VMD COM segments
+    saved from WV-XAE200WUX can also be used. The resolution parameter is accepted but the images are not resized.
+    The frame rate, jitter of the frame interval, the time to create one snapshot and disconnection after
+    a number of frames can be specified.
+    To measure the latency, an APP15 segment with the send time (time.time()) is inserted just after SOI.
+    Decoders and parse_jpeg.py ignore it. Use ReadSendTime() to read it.
+
+    このプログラムは JPEG ファイルのフォルダから下記の CGI を Digest 認証付きで応答します。
+    カメラがなくても connect_with_jpeg と connect_with_mjpeg のプログラムを実行・計測できます。
+
+    JPEG ファイルは (ファイル名順に繰り返し) そのまま送信するので、WV-XAE200WUX で保存した AI-VMD の COM セグメント付きの
+    JPEG ファイルも使用できます。resolution パラメータは受け付けますが、画像のリサイズはしません。
+    フレームレート、フレーム間隔のゆらぎ、スナップショット１枚の作成時間、指定フレーム数後の切断を指定できます。
+    遅延を計測するため、SOI の直後に送信時刻 (time.time()) を格納した APP15 セグメントを挿入します。
+    デコーダと parse_jpeg.py はこれを無視します。ReadSendTime() で読み出せます。
+
+    Usage:
+        python camera_simulator.py --dir images --port 8080 --fps 15 --jitter 0.005
+
+        Change the camera settings of the sample program as follows.
+        サンプルプログラムのカメラ設定を下記のように変更してください。
+            host        = "127.0.0.1:8080"
+            user_id     = "user-id"
+            user_pw     = "password"
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:    pip install opencv-python       (only to create test images when --dir is not given)
+'''
+
+import argparse
+import glob
+import hashlib
+import os
+import random
+import re
+import secrets
+import struct
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+user_id     = "user-id"         # User of the simulator.
+user_pw     = "password"        # Password of the simulator.
+realm       = "i-PRO camera simulator"
+MAX_NONCES  = 4096              # Number of nonces to remember. Older nonces are answered with "stale".
+boundary    = "myboundary"      # Boundary of the MJPEG stream.
+
+SEND_TIME_TAG = b'SIMTIME\0'    # Identifier of the APP15 segment with the send time.
+SEND_TIME     = struct.Struct('>d')
+SEND_TIME_SEGMENT_SIZE = 4 + len(SEND_TIME_TAG) + SEND_TIME.size
+
+
+def md5_hex(text):
+    ''' Return MD5 of the text as a hex string. '''
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def ParseDigestParams(header):
+    '''
+    Get the parameters of the digest "Authorization" header in dictionary format.
+    Digest 認証の "Authorization" ヘッダのパラメータを辞書形式で取得する。
+
+    Args:
+        header          [i] Value of the "Authorization" header.
+    Returns:
+        Parameters in dictionary format. If the header is not digest, it will be None.
+    '''
+    if not header.lower().startswith('digest '):
+        return None
+    params = {}
+    for name, quoted, token in re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', header[7:]):
+        params[name.lower()] = quoted if quoted else token
+    return params
+
+
+def LoadJpegFiles(directory):
+    '''
+    Read the JPEG files in the folder in file name order.
+    フォルダの JPEG ファイルをファイル名順に読み込む。
+    '''
+    files = sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.jpeg')))
+    frames = []
+    for filename in files:
+        with open(filename, 'rb') as fin:
+            frames.append(fin.read())
+    return frames
+
+
+def MakeTestJpegs(count=30, width=1920, height=1080, quality=80):
+    '''
+    Create numbered test images.
+    番号付きのテスト画像を作成する。
+    '''
+    import cv2
+    import numpy as np
+
+    frames = []
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    for i in range(count):
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:, :, 0] = x
+        image[:, :, 1] = y
+        image[:, :, 2] = (i * 255 // max(count - 1, 1))
+        cv2.putText(image, f"{i:04d}", (width // 10, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    height / 150, (255, 255, 255), max(height // 100, 1), cv2.LINE_AA)
+        ret, jpg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        frames.append(jpg.tobytes())
+    return frames
+
+
+def ReadSendTime(jpg):
+    '''
+    Get the send time inserted by the simulator.
+    シミュレータが挿入した送信時刻を取得する。
+
+    Args:
+        jpg             [i] JPEG data. (bytes-like object)
+    Returns:
+        Send time. (time.time()) If it does not exist, it will be None.
+    '''
+    offset = 6 + len(SEND_TIME_TAG)
+    if len(jpg) < offset + SEND_TIME.size or bytes(jpg[2:4]) != b'\xff\xef':
+        return None
+    if bytes(jpg[6:offset]) != SEND_TIME_TAG:
+        return None
+    return SEND_TIME.unpack_from(jpg, offset)[0]
+
+
+def SendTimeSegment():
+    ''' Return the APP15 segment with the current time. '''
+    payload = SEND_TIME_TAG + SEND_TIME.pack(time.time())
+    return b'\xff\xef' + struct.pack('>H', len(payload) + 2) + payload
+
+
+class CameraSimulatorHandler(BaseHTTPRequestHandler):
+    '''
+    Camera simulator that returns JPEG images and MJPEG streams with digest authentication.
+    Digest 認証付きで JPEG 画像と MJPEG ストリームを応答するカメラシミュレータ。
+    '''
+    protocol_version = 'HTTP/1.1'       # keep-alive
+    disable_nagle_algorithm = True      # Headers and image are written separately. Do not wait for ACK.
+
+    def setup(self):
+        super().setup()
+        self.snapshots = 0              # Snapshots sent on this connection.
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionError:
+            # The client closed the connection.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+    def count(self, name, value=1):
+        with self.server.lock:
+            self.server.stats[name] += value
+
+    def send_challenge(self, stale=False):
+        ''' Send 401 with a new nonce. '''
+        nonce = secrets.token_hex(16)
+        with self.server.lock:
+            self.server.nonces[nonce] = 0
+            # Forget the oldest nonces. A client using one of them gets "stale" and a new nonce.
+            # 古い nonce を破棄する。破棄した nonce を使うクライアントには "stale" と新しい nonce を返す。
+            while len(self.server.nonces) > MAX_NONCES:
+                self.server.nonces.popitem(last=False)
+        self.count('challenges')
+        self.send_response(401)
+        self.send_header('WWW-Authenticate',
+            f'Digest realm="{realm}", nonce="{nonce}", qop="auth", algorithm=MD5' + (', stale=true' if stale else ''))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def check_auth(self):
+        '''
+        Check the "Authorization" header.
+
+        Returns:
+            0: OK,  1: no or wrong authorization,  2: stale nonce.
+        '''
+        params = ParseDigestParams(self.headers.get('Authorization', ''))
+        if params is None or params.get('username') != user_id:
+            return 1
+        nonce = params.get('nonce', '')
+        try:
+            nc = int(params.get('nc', '0'), 16)
+        except ValueError:
+            return 1
+        with self.server.lock:
+            last_nc = self.server.nonces.get(nonce)
+            if last_nc is None:
+                return 2
+            self.server.nonces[nonce] = max(nc, last_nc)
+            self.server.nonces.move_to_end(nonce)
+        ha1 = md5_hex(f"{user_id}:{realm}:{user_pw}")
+        ha2 = md5_hex(f"{self.command}:{params.get('uri', '')}")
+        if params.get('qop'):
+            expected = md5_hex(f"{ha1}:{nonce}:{params.get('nc', '')}:{params.get('cnonce', '')}:{params.get('qop', '')}:{ha2}")
+        else:
+            expected = md5_hex(f"{ha1}:{nonce}:{ha2}")
+        if expected != params.get('response'):
+            return 1
+        return 0
+
+    def next_frame(self):
+        ''' Return the next JPEG data. '''
+        with self.server.lock:
+            index = self.server.next_index
+            self.server.next_index = (index + 1) % len(self.server.frames)
+        return self.server.frames[index]
+
+    def write_jpeg(self, jpg):
+        ''' Write the JPEG data. The send time is inserted just after SOI. '''
+        if self.server.timestamp:
+            segment = SendTimeSegment()
+            self.wfile.write(jpg[:2])
+            self.wfile.write(segment)
+            self.wfile.write(memoryview(jpg)[2:])
+            return len(jpg) + len(segment)
+        self.wfile.write(jpg)
+        return len(jpg)
+
+    def jpeg_length(self, jpg):
+        return len(jpg) + (SEND_TIME_SEGMENT_SIZE if self.server.timestamp else 0)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ('/cgi-bin/camera', '/cgi-bin/nphMotionJpeg'):
+            self.send_error(404)
+            return
+        ret = self.check_auth()
+        if ret != 0:
+            self.send_challenge(stale=(ret == 2))
+            return
+        self.count('requests')
+
+        query = {key.lower(): value[0] for key, value in parse_qs(url.query).items()}
+        if url.path == '/cgi-bin/camera':
+            self.send_snapshot()
+        else:
+            self.send_mjpeg(query)
+
+    def send_snapshot(self):
+        ''' Send one JPEG image. '''
+        server = self.server
+        if server.delay > 0 or server.jitter > 0:
+            # Time to create the image.
+            time.sleep(max(server.delay + random.uniform(-server.jitter, server.jitter), 0))
+
+        self.snapshots += 1
+        close = server.disconnect_after > 0 and self.snapshots >= server.disconnect_after
+        jpg = self.next_frame()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(self.jpeg_length(jpg)))
+        if close:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+            self.count('disconnects')
+        self.end_headers()
+        self.count('bytes', self.write_jpeg(jpg))
+        self.count('frames')
+
+    def send_mjpeg(self, query):
+        ''' Send the MJPEG stream until the client closes it, or 'disconnect_after' frames are sent. '''
+        server = self.server
+        fps = server.fps if server.fps > 0 else float(query.get('framerate', 15))
+        interval = 1.0 / max(fps, 0.1)
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={boundary}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+
+        next_time = time.perf_counter()
+        frames = 0
+        try:
+            while not server.stopping:
+                # Keep the frame rate from the start time. The jitter is added to each frame.
+                delay = next_time + random.uniform(-server.jitter, server.jitter) - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_time += interval
+
+                jpg = self.next_frame()
+                self.wfile.write((f"--{boundary}\r\nContent-Type: image/jpeg\r\n"
+                                  f"Content-Length: {self.jpeg_length(jpg)}\r\n\r\n").encode())
+                length = self.write_jpeg(jpg)
+                self.wfile.write(b'\r\n')
+                self.wfile.flush()
+                self.count('bytes', length)
+                self.count('frames')
+
+                frames += 1
+                if server.disconnect_after > 0 and frames >= server.disconnect_after:
+                    self.count('disconnects')
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream.
+            pass
+
+
+def StartCameraSimulator(frames, host='127.0.0.1', port=0, fps=0, jitter=0.0, delay=0.0, disconnect_after=0,
+                         timestamp=True):
+    '''
+    Start the camera simulator.
+    カメラシミュレータを起動する。
+
+    Args:
+        frames          [i] List of JPEG data.
+        host            [i] Listen address.
+        port            [i] Listen port. 0: a free port.
+        fps             [i] Frame rate of MJPEG. 0: "Framerate" of the request.
+        jitter          [i] Random variation [sec] of the frame interval and the snapshot time.
+        delay           [i] Time [sec] to create one snapshot.
+        disconnect_after [i] Close the connection after this number of frames. 0: never.
+        timestamp       [i] If True, insert the send time. (see ReadSendTime())
+    Returns:
+        server          ThreadingHTTPServer. server.server_address[1] is the port. Call StopCameraSimulator() to stop it.
+    '''
+    server = ThreadingHTTPServer((host, port), CameraSimulatorHandler)
+    server.daemon_threads = True
+    server.frames = frames
+    server.next_index = 0
+    server.fps = fps
+    server.jitter = jitter
+    server.delay = delay
+    server.disconnect_after = disconnect_after
+    server.timestamp = timestamp
+    server.stopping = False
+    server.lock = threading.Lock()
+    server.nonces = OrderedDict()     # nonce -> last nc. (oldest first)
+    server.stats = {'connections': 0, 'requests': 0, 'challenges': 0, 'frames': 0, 'bytes': 0, 'disconnects': 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def StopCameraSimulator(server):
+    '''
+    Stop the camera simulator. MJPEG streams are also closed.
+    カメラシミュレータを停止する。MJPEG ストリームも終了する。
+    '''
+    server.stopping = True
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Local i-PRO camera simulator for JPEG and MJPEG.')
+    parser.add_argument('--dir', default=None, help='folder of JPEG files. If not given, test images are created.')
+    parser.add_argument('--host', default='127.0.0.1', help='listen address.')
+    parser.add_argument('--port', type=int, default=8080, help='listen port.')
+    parser.add_argument('--fps', type=float, default=0, help='MJPEG frame rate. 0: "Framerate" of the request.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random variation [sec] of the frame interval.')
+    parser.add_argument('--delay', type=float, default=0.0, help='time [sec] to create one snapshot.')
+    parser.add_argument('--disconnect-after', type=int, default=0, help='close the connection after N frames.')
+    parser.add_argument('--no-timestamp', action='store_true', help='do not insert the send time.')
+    args = parser.parse_args()
+
+    frames = LoadJpegFiles(args.dir) if args.dir is not None else MakeTestJpegs()
+    if len(frames) == 0:
+        print(f"[ERROR] No JPEG files in {args.dir}")
+        raise SystemExit(1)
+
+    server = StartCameraSimulator(frames, args.host, args.port, args.fps, args.jitter, args.delay,
+                                  args.disconnect_after, not args.no_timestamp)
+    print(f"Camera simulator: http://{args.host}:{args.port}/  ({len(frames)} images)")
+    try:
+        while True:
+            time.sleep(5)
+            print(server.stats)
+    except KeyboardInterrupt:
+        # Press '[ctrl] + [c]' on the console to exit the program.
+        print("KeyboardInterrupt")
+    StopCameraSimulator(server)
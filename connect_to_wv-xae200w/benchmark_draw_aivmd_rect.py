@@ -0,0 +1,143 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Measure the time to draw the AI-VMD (WV-XAE200WUX) recognition result and resize the image for display.
+    AI-VMD (WV-XAE200WUX) 認識結果の描画と表示用リサイズの時間を計測します。
+
+[Details]
+    This program compares the following methods for 1920x1080 images and various numbers of detections.
+
+    (1) Previous:   The previous DrawAivmdRect() on the 1920x1080 image, then resize to 1280x720.
+                    Each box is scaled with Python float math and each label is drawn with cv2.putText().
+    (2) Renderer:   Resize to 1280x720, then AivmdOverlayRenderer.draw().
+                    All boxes are scaled with NumPy and cached label bitmaps are copied.
+
+    1920x1080 の画像と様々な検知数で下記の方法を比較します。
+
+    (1) Previous:   以前の DrawAivmdRect() を 1920x1080 の画像に実行し、1280x720 にリサイズ。
+                    枠毎に Python の浮動小数点演算で変換し、ラベル毎に cv2.putText() で描画します。
+    (2) Renderer:   1280x720 にリサイズし、AivmdOverlayRenderer.draw() を実行。
+                    全ての枠を NumPy で変換し、キャッシュしたラベル画像をコピーします。
+
+    Usage:
+        python benchmark_draw_aivmd_rect.py --areas 1 10 30 63 --repeat 100
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:    pip install opencv-python
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "parse_jpeg.py", "draw_aivmd_rect.py" and "benchmark_parse_jpeg.py" in the same location as this program.
+'''
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from parse_jpeg import ParseJpegFile
+from draw_aivmd_rect import AivmdOverlayRenderer
+from benchmark_parse_jpeg import BuildAivmdComment, InsertJpegSegments
+
+
+##########
+# Previous implementation of DrawAivmdRect(). Used as the baseline.
+##########
+def LegacyDrawAivmdRect(img, aivmd_result):
+    img_width  = img.shape[1]
+    img_height = img.shape[0]
+    aivmd_image_width = aivmd_result['imageWidth']
+    aivmd_image_height = aivmd_result['imageHeight']
+    for result in aivmd_result['detectResult']:
+        pos_x = int(result['hstart'] * img_width  / aivmd_image_width)
+        pos_y = int(result['vstart'] * img_height / aivmd_image_height)
+        w     = int(result['hcnt']   * img_width  / aivmd_image_width)
+        h     = int(result['vcnt']   * img_height / aivmd_image_height)
+        obj   = int(result['almObj'])
+        label = ''
+        thickness = 3
+        if obj == 1:
+            label = 'Person'
+            color = (0,0,255)
+        if obj == 2:
+            label = 'Car'
+            color = (255,0,0)
+        if obj == 3:
+            label = 'Bike'
+            color = (0,255,0)
+        if obj == 4:
+            label = ''
+            color = (255,255,0)
+            thickness = 1
+        cv2.rectangle(img, (pos_x, pos_y), (pos_x + w, pos_y + h), color, thickness=thickness)
+        label_pos_x = pos_x
+        label_pos_y = pos_y - 10
+        if label_pos_y <= 10:
+            label_pos_y = pos_y + h + 30
+        cv2.putText(img, text=label, org=(label_pos_x, label_pos_y), fontFace=cv2.FONT_HERSHEY_SIMPLEX,
+                    fontScale=1.0, color=color, thickness=2, lineType=cv2.LINE_AA)
+    return img
+
+
+def MakeAivmdResult(areas, width=1920, height=1080):
+    ''' Create the recognition result with 'areas' detections. '''
+    rng = np.random.default_rng(0)
+    area_list = [(i % 8 + 1, 1, 8, 0, int(rng.integers(1, 5)), int(rng.integers(0, width - 200)),
+                  int(rng.integers(0, height - 200)), int(rng.integers(20, 200)), int(rng.integers(20, 200)))
+                 for i in range(areas)]
+    jpeg = InsertJpegSegments(b'\xff\xd8\xff\xd9', BuildAivmdComment(1660000000, area_list, width, height))
+    return ParseJpegFile(jpeg)[1], ParseJpegFile(jpeg, as_array=True)[1]
+
+
+def Measure(draw, image, repeat):
+    ''' Return the average time [ms] of one draw. The image is drawn over repeatedly. '''
+    start = time.perf_counter()
+    for r in range(repeat):
+        draw(image)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Measure the time to draw the AI-VMD recognition result.')
+    parser.add_argument('--areas', type=int, nargs='+', default=[1, 10, 30, 63], help='numbers of detections.')
+    parser.add_argument('--repeat', type=int, default=100, help='number of repetitions.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    display = cv2.resize(image, (1280, 720))
+    renderer = AivmdOverlayRenderer(scale=1280 / 1920)
+
+    print(f"{'':6s} {'draw only [ms/frame]':>26s} {'draw + resize [ms/frame]':>28s}")
+    print(f"{'areas':>6s} {'Previous':>12s} {'Renderer':>12s}   {'Previous':>12s} {'Renderer':>12s}")
+    for areas in args.areas:
+        dict_result, array_result = MakeAivmdResult(areas)
+        draw_previous = Measure(lambda img: LegacyDrawAivmdRect(img, dict_result), image, args.repeat)
+        draw_current  = Measure(lambda img: renderer.draw(img, array_result), display, args.repeat)
+        total_previous = Measure(lambda img: cv2.resize(LegacyDrawAivmdRect(img, dict_result), (1280, 720)),
+                                 image, args.repeat)
+        total_current  = Measure(lambda img: renderer.draw(cv2.resize(img, (1280, 720)), array_result),
+                                 image, args.repeat)
+        print(f"{areas:6d} {draw_previous:12.3f} {draw_current:12.3f}   {total_previous:12.3f} {total_current:12.3f}")
@@ -0,0 +1,257 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Measure the time to extract the AI-VMD (WV-XAE200WUX) recognition result from JPEG files.
+    JPEG ファイルから AI-VMD (WV-XAE200WUX) の認識結果を取り出す時間を計測します。
+
+[Details]
+    This program compares the following methods, and checks that all of them return the same aivmd_result.
+
+    (1) Slice copy:     The previous parse_jpeg.py. data[length+2:] is copied for every marker.
+    (2) memoryview:     The current parse_jpeg.py. The markers are walked with offsets into one memoryview.
+    (3) np.frombuffer:  (2) with as_array=True. All areas are decoded into a NumPy structured array at once.
+
+    The JPEG files in --dir (ex. frames saved by connect_with_mjpeg_4.py from WV-XAE200WUX) are used.
+    If --dir is not given, JPEG files with an AI-VMD comment are created.
+
+    下記の方法を比較し、全てが同じ aivmd_result を返すことを確認します。
+
+    (1) Slice copy:     以前の parse_jpeg.py。マーカー毎に data[length+2:] をコピーします。
+    (2) memoryview:     現在の parse_jpeg.py。１つの memoryview へのオフセットでマーカーをたどります。
+    (3) np.frombuffer:  (2) を as_array=True で実行。全エリアを一度に NumPy の構造化配列にデコードします。
+
+    --dir の JPEG ファイル（例: WV-XAE200WUX から connect_with_mjpeg_4.py で保存したフレーム）を使います。
+    --dir を指定しない場合は、AI-VMD コメント付きの JPEG ファイルを作成します。
+
+    Usage:
+        python benchmark_parse_jpeg.py --dir image
+        python benchmark_parse_jpeg.py --count 100 --markers 16 --areas 20
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:    pip install opencv-python
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "parse_jpeg.py" in the same location as this program.
+'''
+
+import argparse
+import glob
+import os
+import struct
+import time
+
+import cv2
+import numpy as np
+from parse_jpeg import ParseJpegFile
+
+
+##########
+# Previous implementation of parse_jpeg.py (slice copy). Used as the baseline.
+##########
+def LegacyParseJpegComment(data):
+    length = len(data)
+    while length >= 4:
+        tag, data_length = struct.unpack('>HH', data[0:4])
+        if data_length > length or data_length < 4:
+            break
+        data_interior = data[4: data_length]
+        data = data[data_length:]
+        length -= data_length
+        if tag == 0x002f:
+            return True, LegacyParseAivmdResult(data_interior)
+    return False, None
+
+
+def LegacyParseAivmdResult(data):
+    result = {}
+    result['detectResult'] = []
+    length = len(data)
+    UTCClock, timeZone, timeZoneMinute, frameTime   = struct.unpack('>LBBH', data[ 0: 8])
+    algorithmId, resultInfo, resultInfoLength       = struct.unpack('>HHH',  data[ 8:14])
+    areaInfo, imageWidth, imageHeight               = struct.unpack('>HHH',  data[14:20])
+    areaNum = (areaInfo >> 10) & 0x3f
+    areaLength = areaInfo & 0x3ff
+    timeZoneDirection = (timeZone >> 6) & 0x01
+    result['UTCClock']          = UTCClock
+    result['timeZoneDirection'] = timeZoneDirection
+    result['summerTime']        = (timeZone >> 5) & 0x01
+    result['timeZoneHour']      = (timeZone & 0x1f) if timeZoneDirection == 0 else - (timeZone & 0x1f)
+    result['timeZoneMinute']    = timeZoneMinute
+    result['frameTime']         = frameTime
+    result['algorithmId']       = algorithmId
+    result['resultInfoFlag']    = (resultInfo >> 1) & 0x01
+    result['uniqueinfoflag']    = (resultInfo >> 0) & 0x01
+    result['resultInfoLength']  = resultInfoLength
+    result['areaNum']           = areaNum
+    result['areaLength']        = areaLength
+    result['imageWidth']        = imageWidth
+    result['imageHeight']       = imageHeight
+    offset = length - resultInfoLength
+    if (algorithmId==0x0100) and (resultInfoLength == areaNum * areaLength):
+        for i in range(areaNum):
+            areaId, detectArea, alarm   = struct.unpack('>HHH10x', data[offset+areaLength*i:offset+areaLength*(i+1)])
+            hstart, vstart, hcnt, vcnt  = struct.unpack('>8xHHHH', data[offset+areaLength*i:offset+areaLength*(i+1)])
+            result['detectResult'].append({
+                'areaId': areaId, 'detectArea': detectArea,
+                'almType': (alarm >> 12) & 0x0f, 'Dir': (alarm >> 8) & 0x0f, 'almObj': alarm & 0xff,
+                'hstart': hstart, 'vstart': vstart, 'hcnt': hcnt, 'vcnt': vcnt})
+    return result
+
+
+def LegacyParseJpegFile(data):
+    if len(data) < 4 or data[0:2] != b'\xff\xd8' or data[-2:] != b'\xff\xd9':
+        return False, None
+    next_data = data[2:]
+    while len(next_data) >= 4:
+        tag, length = struct.unpack('>HH', next_data[0:4])
+        if tag & 0xff00 != 0xff00 or length + 2 > len(next_data):
+            break
+        data = next_data[4:length+2]
+        next_data = next_data[length+2:]
+        if tag == 0xffda:   # SOS
+            break
+        if tag == 0xfffe:   # COM
+            return LegacyParseJpegComment(data)
+    return False, None
+
+
+##########
+# Test data.
+##########
+def BuildAivmdComment(utc_clock, areas, image_width=1920, image_height=1080):
+    '''
+    Build the JPEG comment data with the AI-VMD recognition result.
+    AI-VMD 認識結果を含む JPEG コメントデータを作成する。
+
+    Args:
+        utc_clock       [i] UTCClock. [sec]
+        areas           [i] List of (areaId, detectArea, almType, Dir, almObj, hstart, vstart, hcnt, vcnt).
+        image_width     [i] Width of the coordinate system of the areas.
+        image_height    [i] Height of the coordinate system of the areas.
+    Returns:
+        Comment data. (bytes)
+    '''
+    area_length = 16
+    area_data = b''.join(
+        struct.pack('>HHH2xHHHH', areaId, detectArea, (almType << 12) | (Dir << 8) | almObj, hstart, vstart, hcnt, vcnt)
+        for areaId, detectArea, almType, Dir, almObj, hstart, vstart, hcnt, vcnt in areas)
+    resultInfo = 0 if len(areas) > 0 else 0x02
+    areaInfo = (len(areas) << 10) | area_length
+    header = struct.pack('>LBBHHHHHHH', utc_clock, 9, 0, 0, 0x0100, resultInfo, len(area_data),
+                         areaInfo, image_width, image_height)
+    aivmd = header + area_data
+    # Another tag before the AI-VMD tag, like the camera.
+    other = struct.pack('>HH', 0x0001, 8) + b'\x00' * 4
+    return other + struct.pack('>HH', 0x002f, len(aivmd) + 4) + aivmd
+
+
+def InsertJpegSegments(jpeg, comment, markers=0):
+    '''
+    Insert APPn segments and a COM segment after SOI.
+    SOI の後に APPn セグメントと COM セグメントを挿入する。
+
+    Args:
+        jpeg            [i] JPEG data.
+        comment         [i] Comment data.
+        markers         [i] Number of APPn segments to insert before COM.
+    Returns:
+        JPEG data. (bytes)
+    '''
+    segments = []
+    for i in range(markers):
+        payload = bytes(60)
+        segments.append(struct.pack('>HH', 0xffe0 + (i % 15) + 1, len(payload) + 2) + payload)
+    segments.append(struct.pack('>HH', 0xfffe, len(comment) + 2) + comment)
+    return jpeg[:2] + b''.join(segments) + jpeg[2:]
+
+
+def MakeTestJpegFiles(count, markers, areas, width=1920, height=1080):
+    '''
+    Create JPEG data with an AI-VMD comment.
+    AI-VMD コメント付きの JPEG データを作成する。
+    '''
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    image = np.dstack([np.tile(gradient, (height, 1))] * 3)
+    image = cv2.add(image, rng.integers(0, 32, image.shape, dtype=np.uint8))
+    ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    jpeg = jpeg.tobytes()
+
+    files = []
+    for i in range(count):
+        area_list = [(j % 8 + 1, 1, 8, 0, rng.integers(1, 5), rng.integers(0, width - 200), rng.integers(0, height - 200),
+                      rng.integers(20, 200), rng.integers(20, 200)) for j in range(areas)]
+        comment = BuildAivmdComment(1660000000 + i, area_list, width, height)
+        files.append(InsertJpegSegments(jpeg, comment, markers))
+    return files
+
+
+def Measure(name, parse, files, repeat):
+    ''' Print the average time [us] to parse one file. '''
+    start = time.perf_counter()
+    for r in range(repeat):
+        for data in files:
+            parse(data)
+    elapsed = time.perf_counter() - start
+    print(f"{name:14s} {elapsed / (repeat * len(files)) * 1e6:10.1f} us/file")
+
+
+if __name__ == "__main__":
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Measure the time to extract the AI-VMD recognition result from JPEG files.')
+    parser.add_argument('--dir', default=None, help='folder of JPEG files saved from WV-XAE200WUX.')
+    parser.add_argument('--count', type=int, default=100, help='number of JPEG files to create if --dir is not given.')
+    parser.add_argument('--markers', type=int, default=16, help='number of APPn segments before COM in the created files.')
+    parser.add_argument('--areas', type=int, default=20, help='number of detection areas in the created files.')
+    parser.add_argument('--repeat', type=int, default=10, help='number of repetitions.')
+    args = parser.parse_args()
+
+    if args.dir is not None:
+        files = []
+        for filename in sorted(glob.glob(os.path.join(args.dir, '**', '*.jpg'), recursive=True)):
+            with open(filename, 'rb') as fin:
+                files.append(fin.read())
+    else:
+        files = MakeTestJpegFiles(args.count, args.markers, args.areas)
+
+    if len(files) == 0:
+        print("[ERROR] No JPEG files.")
+        exit(1)
+    print(f"{len(files)} files, {sum(len(data) for data in files) / len(files) / 1024:.0f} KB/file")
+
+    # All methods must return the same result.
+    for data in files:
+        expected = LegacyParseJpegFile(data)
+        result, aivmd_result = ParseJpegFile(data, as_array=True)
+        if result == True:
+            aivmd_result['detectResult'] = [
+                {name: int(area[name]) for name in area.dtype.names} for area in aivmd_result['detectResult']]
+        if expected != ParseJpegFile(data) or expected != (result, aivmd_result):
+            print("[ERROR] The results are different.")
+            exit(1)
+
+    Measure("Slice copy", LegacyParseJpegFile, files, args.repeat)
+    Measure("memoryview", ParseJpegFile, files, args.repeat)
+    Measure("np.frombuffer", lambda data: ParseJpegFile(data, as_array=True), files, args.repeat)
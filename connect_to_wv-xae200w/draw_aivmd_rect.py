@@ -22,7 +22,12 @@ limitations under the License.
 
 [Details]
     This program has been confirmed to work with WV-XAE200WUX Ver. 2.20.
-    
+
+    AivmdOverlayRenderer scales all boxes at once with NumPy and copies cached label bitmaps,
+    so it is fast enough to draw on the display image after resizing, for every frame.
+    AivmdOverlayRenderer は全ての枠を NumPy で一度に変換し、キャッシュしたラベル画像をコピーするので、
+    リサイズ後の表示画像に毎フレーム描画できます。
+
 [Author]
     kinoshita hidetoshi (木下英俊)
 
@@ -39,11 +44,143 @@ import cv2
 from parse_jpeg import ParseJpegFile
 
 
+# Label, color and thickness of the rectangle for each almObj.
+AIVMD_OBJECT_STYLES = {
+    1: ('Person',   (0,0,255),      3),     # red
+    2: ('Car',      (255,0,0),      3),     # blue
+    3: ('Bike',     (0,255,0),      3),     # green
+    4: ('',         (255,255,0),    1),     # sky blue. Future notification candidates
+}
+
+
+class AivmdOverlayRenderer():
+    '''
+    Draw the WV-XAE200WUX (AI-VMD) recognition result with vectorized scaling and cached label bitmaps.
+    WV-XAE200WUX (AI-VMD) 認識結果を、ベクトル化した座標変換とキャッシュしたラベル画像で描画する。
+
+    All boxes are scaled at once with NumPy, and the rectangles of each class are drawn with one cv2.polylines() call.
+    Each label is rendered with cv2.putText() only once, and the cached bitmap is copied with a mask after that.
+    Draw on the display image (ex. 1280x720) after resizing, not on the received image.
+    全ての枠を NumPy で一度に変換し、クラス毎の枠を cv2.polylines() １回で描画する。
+    各ラベルは cv2.putText() で１回だけ描画し、以降はキャッシュした画像をマスク付きでコピーする。
+    受信画像ではなく、リサイズ後の表示画像（例: 1280x720）に描画すること。
+    '''
+
+    def __init__(self, scale=1.0):
+        '''
+        Constructor
+
+        Args:
+            scale           [i] Scale of fonts, line thickness and label offsets. 1.0 is the size for 1920x1080.
+        '''
+        self.scale = scale
+        self.font_scale = 1.0 * scale
+        self.font_thickness = max(1, round(2 * scale))
+        self._labels = {}           # almObj -> (bitmap, mask, origin_x, origin_y)
+
+    def _get_label(self, obj):
+        '''
+        Get the cached label bitmap of the object class. It is rendered at the first call.
+        オブジェクトクラスのラベル画像をキャッシュから取得する。初回に描画する。
+
+        Returns:
+            (bitmap, mask, origin_x, origin_y). None if the class has no label.
+            origin_x, origin_y is the position in the bitmap corresponding to 'org' of cv2.putText().
+        '''
+        if obj in self._labels:
+            return self._labels[obj]
+
+        label, color, thickness = AIVMD_OBJECT_STYLES.get(obj, ('', (255,255,255), 1))
+        entry = None
+        if label != '':
+            (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.font_thickness)
+            pad = self.font_thickness + 1
+            alpha = np.zeros((text_h + baseline + pad * 2, text_w + pad * 2), dtype=np.uint8)
+            origin_x, origin_y = pad, pad + text_h
+            cv2.putText(alpha, label, (origin_x, origin_y), cv2.FONT_HERSHEY_SIMPLEX, self.font_scale,
+                        255, self.font_thickness, cv2.LINE_AA)
+            # The anti-aliased edge is kept as a darker color, instead of blending with the image.
+            bitmap = (np.array(color, dtype=np.uint16) * alpha[:, :, np.newaxis] // 255).astype(np.uint8)
+            mask = (alpha >= 64).astype(np.uint8)
+            entry = (bitmap, mask, origin_x, origin_y)
+
+        self._labels[obj] = entry
+        return entry
+
+    @staticmethod
+    def _blit(img, entry, x, y):
+        ''' Copy the label bitmap so that its origin is at (x, y). '''
+        bitmap, mask, origin_x, origin_y = entry
+        x0 = x - origin_x
+        y0 = y - origin_y
+        bx0 = max(0, -x0)
+        by0 = max(0, -y0)
+        bx1 = min(bitmap.shape[1], img.shape[1] - x0)
+        by1 = min(bitmap.shape[0], img.shape[0] - y0)
+        if bx1 <= bx0 or by1 <= by0:
+            return
+        cv2.copyTo(bitmap[by0:by1, bx0:bx1], mask[by0:by1, bx0:bx1], img[y0 + by0:y0 + by1, x0 + bx0:x0 + bx1])
+
+    def draw(self, img, aivmd_result):
+        '''
+        Draw recognition frames and labels on the image.
+        画像に認識枠とラベルを描画する。
+
+        Args:
+            img             [i] OpenCV image. It is changed.
+            aivmd_result    [i] WV-XAE200WUX (aivmd) recognition result. (detectResult is a list or ndarray)
+        Returns:
+            img             Image with recognition frames and labels drawn.
+        Raises
+            None
+        '''
+        areas = aivmd_result['detectResult']
+        if len(areas) == 0 or aivmd_result['imageWidth'] == 0 or aivmd_result['imageHeight'] == 0:
+            return img
+
+        if isinstance(areas, np.ndarray):
+            obj = areas['almObj'].astype(np.int32)
+            boxes = np.stack([areas['hstart'], areas['vstart'], areas['hcnt'], areas['vcnt']], axis=1).astype(np.int32)
+        else:
+            obj = np.array([area['almObj'] for area in areas], dtype=np.int32)
+            boxes = np.array([(area['hstart'], area['vstart'], area['hcnt'], area['vcnt']) for area in areas], dtype=np.int32)
+
+        # Scale all boxes at once. (x, y, w, h) -> (x0, y0, x1, y1)
+        ratio = np.array([img.shape[1] / aivmd_result['imageWidth'], img.shape[0] / aivmd_result['imageHeight']] * 2)
+        boxes = (boxes * ratio).astype(np.int32)
+        boxes[:, 2:] += boxes[:, :2]
+        corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+
+        # Position of labels. Below the frame if there is no space above it.
+        x = boxes[:, 0].tolist()
+        offset = round(10 * self.scale)
+        label_y = np.where(boxes[:, 1] - offset <= offset, boxes[:, 3] + round(30 * self.scale), boxes[:, 1] - offset).tolist()
+
+        for cls, (label, color, thickness) in AIVMD_OBJECT_STYLES.items():
+            index = np.flatnonzero(obj == cls)
+            if len(index) == 0:
+                continue
+            cv2.polylines(img, corners[index], True, color, thickness=max(1, round(thickness * self.scale)))
+
+            entry = self._get_label(cls)
+            if entry is not None:
+                for i in index.tolist():
+                    self._blit(img, entry, x[i], label_y[i])
+
+        return img
+
+
+_default_renderer = AivmdOverlayRenderer()
+
+
 def DrawAivmdRect(img, aivmd_result):
     '''
     This function draws recognition frames and texts on a given image according to the WV-XAE200WUX (AI-VMD) recognition result.
     WV-XAE200WUX (AI-VMD) 認識結果に従って、与えられた画像に認識枠とテキストを描画する。
 
+    The sizes of texts and lines are for 1920x1080. Use AivmdOverlayRenderer(scale) for a resized image.
+    テキストと線のサイズは 1920x1080 用。リサイズした画像には AivmdOverlayRenderer(scale) を使う。
+
     Args:
         img             [i] OpenCV image
         aivmd_result    [i] WV-XAE200WUX (aivmd) recognition result.
@@ -52,59 +189,7 @@ def DrawAivmdRect(img, aivmd_result):
     Raises
         None
     '''
-    img_width  = img.shape[1]
-    img_height = img.shape[0]
-    aivmd_image_width = aivmd_result['imageWidth']
-    aivmd_image_height = aivmd_result['imageHeight']
-
-    # Draw rectangles and labels.
-    if len(aivmd_result['detectResult']) != 0:
-        for result in aivmd_result['detectResult']:
-            pos_x = int(result['hstart'] * img_width  / aivmd_image_width)
-            pos_y = int(result['vstart'] * img_height / aivmd_image_height)
-            w     = int(result['hcnt']   * img_width  / aivmd_image_width)
-            h     = int(result['vcnt']   * img_height / aivmd_image_height)
-            obj   = int(result['almObj'])
-
-            label = ''
-            thickness = 3
-
-            if obj == 1:
-                # Person
-                label = 'Person'
-                color = (0,0,255)   # red
-            if obj == 2:
-                # Car
-                label = 'Car'
-                color = (255,0,0)   # blue
-            if obj == 3:
-                # Bike
-                label = 'Bike'
-                color = (0,255,0)   # green
-            if obj == 4:
-                # Future notification candidates
-                label = ''
-                color = (255,255,0) # sky blue
-                thickness = 1
-
-            # draw rectangles.
-            cv2.rectangle(img, (pos_x, pos_y), (pos_x + w, pos_y + h), color, thickness=thickness)
-
-            # draw text.
-            label_pos_x = pos_x
-            label_pos_y = pos_y - 10
-            if label_pos_y <= 10:
-                label_pos_y = pos_y + h + 30
-            cv2.putText(img,
-                text = label,
-                org = (label_pos_x, label_pos_y),
-                fontFace = cv2.FONT_HERSHEY_SIMPLEX,
-                fontScale = 1.0,
-                color = color,
-                thickness = 2,
-                lineType = cv2.LINE_AA)
-
-    return img
+    return _default_renderer.draw(img, aivmd_result)
 
 
 if __name__ == "__main__":
@@ -128,13 +213,14 @@ if __name__ == "__main__":
     # Extracts the recognition result of WV-XAE200WUX (AI-VMD) from the JPEG file.
     result, aivmd_result = ParseJpegFile(binaryData)
 
-    if result==True:
-        # Draws the recognition result on the received video.
-        img = DrawAivmdRect(img, aivmd_result)
-
     # Please modify the value to fit your PC screen size.
     resizedImage = cv2.resize(img, (1280, 720))
 
+    if result==True:
+        # Draws the recognition result on the resized image.
+        renderer = AivmdOverlayRenderer(scale=resizedImage.shape[1] / 1920)
+        resizedImage = renderer.draw(resizedImage, aivmd_result)
+
     # Display video.
     windowTitle = "AI-VMD detection result."
     cv2.imshow(windowTitle, resizedImage)
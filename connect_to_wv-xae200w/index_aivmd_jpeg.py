@@ -0,0 +1,302 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Index the AI-VMD (WV-XAE200WUX) recognition results of recorded JPEG files into SQLite, and search them.
+    録画した JPEG ファイルの AI-VMD (WV-XAE200WUX) 認識結果を SQLite にインデックスし、検索します。
+
+[Details]
+    This program walks a folder tree of JPEG files (ex. frames saved by connect_with_mjpeg_4.py or
+    connect_with_jpeg_4.py from WV-XAE200WUX), and extracts the recognition results with a process pool.
+    Each file is read through mmap, and only the pages up to the COM segment are read. The image data is not decoded.
+    The detections are written to SQLite with indexes on (almObj, detectArea, UTCClock) and UTCClock,
+    so searches like "Car in area 3 between 10:00 and 11:00" do not need to read the JPEG files again.
+    Files already in the database are skipped, so new files can be added by running this program again.
+
+    JPEG ファイルのフォルダツリー（例: WV-XAE200WUX から connect_with_mjpeg_4.py や connect_with_jpeg_4.py で保存したフレーム）
+    をたどり、プロセスプールで認識結果を取り出します。
+    各ファイルは mmap で読み、COM セグメントまでのページだけを読みます。画像データはデコードしません。
+    検知結果は (almObj, detectArea, UTCClock) と UTCClock のインデックス付きで SQLite に書き込むので、
+    「10:00 から 11:00 のエリア 3 の Car」のような検索で JPEG ファイルを読み直す必要はありません。
+    データベースにあるファイルはスキップするので、もう一度実行すると新しいファイルを追加できます。
+
+    Usage:
+        # Index.
+        python index_aivmd_jpeg.py --dir image --db aivmd.db
+
+        # Search.
+        python index_aivmd_jpeg.py --db aivmd.db --obj Car --area 3 --start "2022-08-01 10:00" --end "2022-08-01 11:00"
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "parse_jpeg.py" in the same location as this program.
+'''
+
+import argparse
+import datetime
+import mmap
+import multiprocessing as mp
+import os
+import sqlite3
+import struct
+import time
+
+from parse_jpeg import ParseJpegFile
+
+
+# almObj of each object class.
+OBJECT_CLASSES = {'Person': 1, 'Car': 2, 'Bike': 3, 'Candidate': 4}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS frames (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    UTCClock    INTEGER,
+    frameTime   INTEGER,
+    imageWidth  INTEGER,
+    imageHeight INTEGER
+);
+CREATE TABLE IF NOT EXISTS detections (
+    frame_id    INTEGER NOT NULL,
+    UTCClock    INTEGER NOT NULL,
+    almObj      INTEGER NOT NULL,
+    detectArea  INTEGER NOT NULL,
+    areaId      INTEGER NOT NULL,
+    almType     INTEGER NOT NULL,
+    Dir         INTEGER NOT NULL,
+    hstart      INTEGER NOT NULL,
+    vstart      INTEGER NOT NULL,
+    hcnt        INTEGER NOT NULL,
+    vcnt        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_obj_area_time ON detections (almObj, detectArea, UTCClock);
+CREATE INDEX IF NOT EXISTS detections_time ON detections (UTCClock);
+CREATE INDEX IF NOT EXISTS frames_time ON frames (UTCClock);
+'''
+
+
+def ReadAivmdResult(filename):
+    '''
+    Read the AI-VMD recognition result from a JPEG file through mmap.
+    mmap で JPEG ファイルから AI-VMD 認識結果を読む。
+
+    Only SOI, the markers up to COM and EOI are read from the disk.
+    ディスクから読むのは SOI、COM までのマーカー、EOI だけ。
+
+    Args:
+        filename        [i] JPEG file name.
+    Returns:
+        (filename, frame, detections)
+        frame           (UTCClock, frameTime, imageWidth, imageHeight). None if there is no recognition result.
+        detections      List of (UTCClock, almObj, detectArea, areaId, almType, Dir, hstart, vstart, hcnt, vcnt).
+                        None if the file cannot be read or the recognition result is broken.
+    Raises
+        None
+    '''
+    try:
+        with open(filename, 'rb') as fin:
+            if os.fstat(fin.fileno()).st_size < 4:
+                return filename, None, []
+            error = None
+            with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    result, aivmd_result = ParseJpegFile(mm, as_array=True)
+                except (struct.error, ValueError) as e:
+                    # Keep only the message. The traceback holds memoryviews of mm, and mm cannot be closed with them.
+                    # メッセージだけを残す。トレースバックは mm の memoryview を保持しており、その間 mm を閉じられない。
+                    error = str(e)
+            if error is not None:
+                print(f"[ERROR] {filename}: {error}")
+                return filename, None, None
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {filename}: {e}")
+        return filename, None, None
+
+    if result == False:
+        return filename, None, []
+
+    UTCClock = aivmd_result['UTCClock']
+    frame = (UTCClock, aivmd_result['frameTime'], aivmd_result['imageWidth'], aivmd_result['imageHeight'])
+    areas = aivmd_result['detectResult']
+    detections = [(UTCClock, *row) for row in zip(
+        areas['almObj'].tolist(), areas['detectArea'].tolist(), areas['areaId'].tolist(),
+        areas['almType'].tolist(), areas['Dir'].tolist(),
+        areas['hstart'].tolist(), areas['vstart'].tolist(), areas['hcnt'].tolist(), areas['vcnt'].tolist())]
+    return filename, frame, detections
+
+
+def OpenIndex(db_path):
+    '''
+    Open the index database. The tables are created if they do not exist.
+    インデックスのデータベースを開く。テーブルがなければ作成する。
+    '''
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def FindJpegFiles(top):
+    ''' Walk the folder tree and yield JPEG file names. '''
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(('.jpg', '.jpeg')):
+                yield os.path.join(dirpath, name)
+
+
+def BuildIndex(conn, top, processes=None, batch=1000):
+    '''
+    Index all JPEG files in the folder tree.
+    フォルダツリーの全 JPEG ファイルをインデックスする。
+
+    Args:
+        conn            [i] sqlite3 connection from OpenIndex().
+        top             [i] Top folder.
+        processes       [i] Number of processes. If None, the number of CPUs.
+        batch           [i] Number of files written in one transaction.
+    Returns:
+        (indexed files, files without recognition result, broken files, detections)
+        Broken files are not added to the index, so they are read again next time.
+    '''
+    known = set(path for path, in conn.execute('SELECT path FROM frames'))
+    files = [filename for filename in FindJpegFiles(top) if filename not in known]
+
+    indexed = 0
+    no_result = 0
+    broken = 0
+    detection_count = 0
+    frame_rows = []
+    detection_rows = []
+
+    def Flush():
+        with conn:
+            for (path, frame), detections in zip(frame_rows, detection_rows):
+                if frame is None:
+                    conn.execute('INSERT INTO frames (path) VALUES (?)', (path,))
+                    continue
+                cur = conn.execute('INSERT INTO frames (path, UTCClock, frameTime, imageWidth, imageHeight) VALUES (?,?,?,?,?)',
+                                   (path, *frame))
+                frame_id = cur.lastrowid
+                conn.executemany('INSERT INTO detections VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+                                 [(frame_id, *row) for row in detections])
+        frame_rows.clear()
+        detection_rows.clear()
+
+    with mp.Pool(processes) as pool:
+        for filename, frame, detections in pool.imap_unordered(ReadAivmdResult, files, chunksize=64):
+            if detections is None:
+                broken += 1
+                continue
+            frame_rows.append((filename, frame))
+            detection_rows.append(detections)
+            indexed += 1
+            if frame is None:
+                no_result += 1
+            detection_count += len(detections)
+            if len(frame_rows) >= batch:
+                Flush()
+                print(f"{indexed} / {len(files)} files")
+        Flush()
+
+    return indexed, no_result, broken, detection_count
+
+
+def QueryDetections(conn, obj=None, area=None, start=None, end=None):
+    '''
+    Search the detections.
+    検知結果を検索する。
+
+    Args:
+        conn            [i] sqlite3 connection from OpenIndex().
+        obj             [i] almObj. (1: Person, 2: Car, 3: Bike, 4: Candidate) None: all.
+        area            [i] detectArea. None: all.
+        start           [i] Start UTCClock. [sec] None: no limit.
+        end             [i] End UTCClock. [sec] (not included) None: no limit.
+    Returns:
+        List of (path, UTCClock, almObj, detectArea, areaId, hstart, vstart, hcnt, vcnt).
+    '''
+    conditions = []
+    params = []
+    if obj is not None:
+        conditions.append('d.almObj = ?')
+        params.append(obj)
+    if area is not None:
+        conditions.append('d.detectArea = ?')
+        params.append(area)
+    if start is not None:
+        conditions.append('d.UTCClock >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('d.UTCClock < ?')
+        params.append(end)
+    where = ('WHERE ' + ' AND '.join(conditions)) if len(conditions) > 0 else ''
+
+    sql = ('SELECT f.path, d.UTCClock, d.almObj, d.detectArea, d.areaId, d.hstart, d.vstart, d.hcnt, d.vcnt '
+           f'FROM detections d JOIN frames f ON f.id = d.frame_id {where} ORDER BY d.UTCClock')
+    return conn.execute(sql, params).fetchall()
+
+
+def ParseTime(text):
+    ''' Convert local time text (ex. "2022-08-01 10:00") to UTCClock. '''
+    if text is None:
+        return None
+    return int(datetime.datetime.fromisoformat(text).timestamp())
+
+
+if __name__ == "__main__":
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Index the AI-VMD recognition results of JPEG files into SQLite, and search them.')
+    parser.add_argument('--db', default='aivmd.db', help='SQLite database file.')
+    parser.add_argument('--dir', default=None, help='folder of JPEG files to index.')
+    parser.add_argument('--processes', type=int, default=None, help='number of processes. (default: number of CPUs)')
+    parser.add_argument('--obj', default=None, choices=list(OBJECT_CLASSES.keys()), help='object class to search.')
+    parser.add_argument('--area', type=int, default=None, help='detectArea to search.')
+    parser.add_argument('--start', default=None, help='start time to search. (local time, ex. "2022-08-01 10:00")')
+    parser.add_argument('--end', default=None, help='end time to search. (local time, not included)')
+    args = parser.parse_args()
+
+    conn = OpenIndex(args.db)
+
+    if args.dir is not None:
+        start = time.perf_counter()
+        indexed, no_result, broken, detection_count = BuildIndex(conn, args.dir, args.processes)
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {indexed} files ({no_result} without recognition result, {broken} broken), {detection_count} detections, "
+              f"{elapsed:.1f} sec ({indexed / elapsed if elapsed > 0 else 0:.0f} files/sec)")
+
+    if args.obj is not None or args.area is not None or args.start is not None or args.end is not None:
+        start = time.perf_counter()
+        rows = QueryDetections(conn,
+                               OBJECT_CLASSES[args.obj] if args.obj is not None else None,
+                               args.area, ParseTime(args.start), ParseTime(args.end))
+        elapsed = time.perf_counter() - start
+        for path, UTCClock, almObj, detectArea, areaId, hstart, vstart, hcnt, vcnt in rows:
+            print(f"{datetime.datetime.fromtimestamp(UTCClock)}  obj={almObj} area={detectArea} id={areaId} "
+                  f"({hstart}, {vstart}, {hcnt}, {vcnt})  {path}")
+        print(f"{len(rows)} detections, {elapsed * 1000:.1f} ms")
+
+    conn.close()
@@ -21,38 +21,116 @@ limitations under the License.
 
 [Details]
     This program has been confirmed to work with WV-XAE200WUX Ver. 2.20.
+
+    If as_array is True, aivmd_result['detectResult'] is a NumPy structured array (AIVMD_AREA_DTYPE)
+    instead of a list of dictionaries. All areas are decoded with one np.frombuffer() call,
+    so there is no per-object Python overhead on crowded scenes.
+    Each element can be used like the dictionary. (ex. detectResult[i]['hstart'])
+    Columns can be used directly. (ex. detectResult['almObj'] == 1)
+
+    as_array が True の場合、aivmd_result['detectResult'] は辞書のリストではなく NumPy の構造化配列 (AIVMD_AREA_DTYPE) になります。
+    全エリアを np.frombuffer() １回でデコードするので、物体が多いシーンでも物体毎の Python の処理がありません。
+    各要素は辞書と同じように使えます。(例: detectResult[i]['hstart'])
+    列をそのまま使うこともできます。(例: detectResult['almObj'] == 1)
     
 [Author]
     kinoshita hidetoshi (木下英俊)
 
 [Library install]
-
+    numpy:  pip install numpy
 '''
 
 import struct
+import numpy as np
+
+
+# Precompiled structures. (big endian)
+JPEG_MARKER     = struct.Struct('>HH')          # marker, length
+JPEG_SOI_EOI    = struct.Struct('>H')           # SOI (0xffd8), EOI (0xffd9)
+COMMENT_TAG     = struct.Struct('>HH')          # tag, data_length
+AIVMD_HEADER    = struct.Struct('>LBBHHHHHHH')  # UTCClock, timeZone, timeZoneMinute, frameTime,
+                                                # algorithmId, resultInfo, resultInfoLength,
+                                                # areaInfo, imageWidth, imageHeight
+AIVMD_AREA      = struct.Struct('>HHH2xHHHH')   # areaId, detectArea, alarm, hstart, vstart, hcnt, vcnt
+
+# Detection area in the JPEG comment. (big endian)
+AIVMD_AREA_NAMES    = ['areaId', 'detectArea', 'alarm', 'hstart', 'vstart', 'hcnt', 'vcnt']
+AIVMD_AREA_OFFSETS  = [0, 2, 4, 8, 10, 12, 14]
+
+# Detection area returned when as_array is True.
+AIVMD_AREA_DTYPE = np.dtype([
+    ('areaId',      np.uint16),
+    ('detectArea',  np.uint16),
+    ('almType',     np.uint8),      # 1:Intruders, 2:Loitering, 3:Direction, 4:Object, 5:Cross line, 8:AI
+    ('Dir',         np.uint8),      # 1:Up, 2:Up right, 3:Right, 4:Down right, 5:Down, 6:Down left, 7:Left, 8:Up left,
+                                    # 9:A→B, 10:B→A, 11:A⇔B
+    ('almObj',      np.uint8),      # 1: Person, 2: Car, 3: Bike, 4: Unknown
+    ('hstart',      np.uint16),
+    ('vstart',      np.uint16),
+    ('hcnt',        np.uint16),
+    ('vcnt',        np.uint16),
+])
+
+
+def ParseAivmdAreas(data, offset, areaNum, areaLength):
+    '''
+    Decode all detection areas into a NumPy structured array with one np.frombuffer() call.
+    全ての検知エリアを np.frombuffer() １回で NumPy の構造化配列にデコードする。
 
-
-def ParseAivmdResult(data):
+    Args:
+        data            [i] WV-XAE200WUX (aivmd) recognition result. (bytes or memoryview)
+        offset          [i] Offset of the first area.
+        areaNum         [i] Number of areas.
+        areaLength      [i] Length of one area. [bytes]
+    Returns:
+        areas           ndarray of AIVMD_AREA_DTYPE.
+    Raises
+        None
+    '''
+    if areaNum == 0:
+        return np.empty(0, dtype=AIVMD_AREA_DTYPE)
+
+    raw_dtype = np.dtype({
+        'names':    AIVMD_AREA_NAMES,
+        'formats':  ['>u2'] * len(AIVMD_AREA_NAMES),
+        'offsets':  AIVMD_AREA_OFFSETS,
+        'itemsize': areaLength,
+    })
+    raw = np.frombuffer(data, dtype=raw_dtype, count=areaNum, offset=offset)
+
+    areas = np.empty(areaNum, dtype=AIVMD_AREA_DTYPE)
+    for name in ['areaId', 'detectArea', 'hstart', 'vstart', 'hcnt', 'vcnt']:
+        areas[name] = raw[name]
+    alarm = raw['alarm']
+    areas['almType'] = (alarm >> 12) & 0x0f
+    areas['Dir']     = (alarm >> 8) & 0x0f
+    areas['almObj']  = alarm & 0xff
+    return areas
+
+
+def ParseAivmdResult(data, as_array=False):
     '''
     This function gets the recognition result in dictionary format from the WV-XAE200WUX (AI-VMD) recognition result.
     WV-XAE200W (AI-VMD) 認識結果から辞書形式の認識結果を取得する。
 
     Args:
-        data            [i] WV-XAE200WUX (aivmd) recognition result.
+        data            [i] WV-XAE200WUX (aivmd) recognition result. (bytes or memoryview)
+        as_array        [i] False:  detectResult is a list of dictionaries.
+                            True:   detectResult is ndarray of AIVMD_AREA_DTYPE.
     Returns:
-        result          True:   success
-                        False:  failure
         aivmd_result    the recognition result in dictionary format.
     Raises
-        None
+        ValueError      data is shorter than the header.
     '''
     result = {}
     result['detectResult'] = []
     length = len(data)
+    if length < AIVMD_HEADER.size:
+        raise ValueError(f"AI-VMD result is too short. ({length} bytes)")
 
-    UTCClock, timeZone, timeZoneMinute, frameTime   = struct.unpack('>LBBH', data[ 0: 8])
-    algorithmId, resultInfo, resultInfoLength       = struct.unpack('>HHH',  data[ 8:14])
-    areaInfo, imageWidth, imageHeight               = struct.unpack('>HHH',  data[14:20])
+    (UTCClock, timeZone, timeZoneMinute, frameTime,
+     algorithmId, resultInfo, resultInfoLength,
+     areaInfo, imageWidth, imageHeight) = AIVMD_HEADER.unpack_from(data, 0)
     areaNum = (areaInfo >> 10) & 0x3f
     areaLength = areaInfo & 0x3ff
     timeZoneDirection = (timeZone >> 6) & 0x01
@@ -81,10 +159,18 @@ def ParseAivmdResult(data):
 
     offset = length - resultInfoLength
 
-    if (algorithmId==0x0100) and (resultInfoLength == areaNum * areaLength):
+    valid = (algorithmId==0x0100) and (resultInfoLength == areaNum * areaLength) and (areaLength >= AIVMD_AREA.size) \
+        and (resultInfoLength <= length - AIVMD_HEADER.size)
+
+    if as_array:
+        if valid:
+            result['detectResult'] = ParseAivmdAreas(data, offset, areaNum, areaLength)
+        else:
+            result['detectResult'] = np.empty(0, dtype=AIVMD_AREA_DTYPE)
+
+    elif valid:
         for i in range(areaNum):
-            areaId, detectArea, alarm   = struct.unpack('>HHH10x', data[offset+areaLength*i:offset+areaLength*(i+1)])
-            hstart, vstart, hcnt, vcnt  = struct.unpack('>8xHHHH', data[offset+areaLength*i:offset+areaLength*(i+1)])
+            areaId, detectArea, alarm, hstart, vstart, hcnt, vcnt = AIVMD_AREA.unpack_from(data, offset + areaLength * i)
             almType = (alarm >> 12) & 0x0f      
             direction = (alarm >> 8) & 0x0f     
             almObj = (alarm & 0xff)             
@@ -106,13 +192,14 @@ def ParseAivmdResult(data):
     return result
 
 
-def ParseJpegComment(data):
+def ParseJpegComment(data, as_array=False):
     '''
     This function obtains the WV-XAE200WUX (aivmd) recognition result from the JPEG comment data.
     JPEG コメントデータから WV-XAE200WUX (aivmd) 認識結果を取得する。
 
     Args:
-        data            [i] JPEG comment data.
+        data            [i] JPEG comment data. (bytes or memoryview)
+        as_array        [i] If True, detectResult is ndarray of AIVMD_AREA_DTYPE.
     Returns:
         result          True:   success
                         False:  failure
@@ -120,44 +207,40 @@ def ParseJpegComment(data):
     Raises
         None
     '''
-    result = False
-    aivmd_result = None
+    data = memoryview(data)
     length = len(data)
+    offset = 0
 
-    while True:
-        if length >= 4:
-            tag, data_length = struct.unpack('>HH', data[0:4])
-            if data_length <= length:
-                data_interior = data[4: data_length]
-                data = data[data_length:]
-                length -= data_length
-
-                if tag == 0x002f:   # 0x002f means AI-VMD meta information.
-                    aivmd_result = ParseAivmdResult(data_interior)
-                    result = True
-                    break
-            else:
-                break
-        else:
+    # Walk the tags with an offset. The comment data is not copied.
+    # オフセットでタグをたどる。コメントデータはコピーしない。
+    while offset + COMMENT_TAG.size <= length:
+        tag, data_length = COMMENT_TAG.unpack_from(data, offset)
+        if data_length < COMMENT_TAG.size or offset + data_length > length:
             break
+
+        if tag == 0x002f:   # 0x002f means AI-VMD meta information.
+            return True, ParseAivmdResult(data[offset + COMMENT_TAG.size:offset + data_length], as_array)
+
+        offset += data_length
     
-    return result, aivmd_result
+    return False, None
 
 
-def ParseJpegHeadder(data):
+def ParseJpegHeadder(data, offset=0):
     '''
-    Get Tag, Length, Value (data_interior), the following data from JPEG header data.
-    JPEG ヘッダデータから Tag, Length, Value(data_interior), 次のデータ を取得する。
+    Get Tag, Length, Value (data_interior) and the offset of the next marker from JPEG header data.
+    JPEG ヘッダデータから Tag, Length, Value(data_interior), 次のマーカーのオフセット を取得する。
 
     Args:
-        data            [i] Data to be confirmed.
+        data            [i] Data to be confirmed. (bytes or memoryview)
+        offset          [i] Offset of the marker in data.
     Returns:
         result          True:   success
                         False:  failure
         tag             Tag
         length          Length
-        data_interior   Value. If it does not exist, it will be None.
-        data_next       The following data after data_interior. If it does not exist, it will be None.
+        data_interior   Value (memoryview, not copied). If it does not exist, it will be None.
+        next_offset     Offset of the next marker. If it does not exist, it will be None.
     Raises
         None
     '''
@@ -166,17 +249,17 @@ def ParseJpegHeadder(data):
     length = 0
     data_length = len(data)
     data_interior = None
-    data_next = None
+    next_offset = None
 
-    if data_length >= 4:
-        tag, length, = struct.unpack('>HH', data[0:4])
+    if offset + JPEG_MARKER.size <= data_length:
+        tag, length = JPEG_MARKER.unpack_from(data, offset)
         if tag & 0xff00 == 0xff00:
-            if length + 2 <= data_length:
-                data_interior = data[4:length+2]
-                data_next = data[length+2:data_length]
+            if offset + length + 2 <= data_length:
+                data_interior = memoryview(data)[offset + 4:offset + length + 2]
+                next_offset = offset + length + 2
                 result = True
 
-    return result, tag, length, data_interior, data_next
+    return result, tag, length, data_interior, next_offset
 
 
 def IsJpegFile(data):
@@ -196,21 +279,26 @@ def IsJpegFile(data):
 
     length = len(data)
     if length >= 4:
-        SOI, = struct.unpack('>H', data[0:2])
-        EOI, = struct.unpack('>H', data[length-2:length])
+        SOI, = JPEG_SOI_EOI.unpack_from(data, 0)
+        EOI, = JPEG_SOI_EOI.unpack_from(data, length - 2)
         if SOI == 0xffd8 and EOI == 0xffd9:
             result = True
 
     return result
 
 
-def ParseJpegFile(data):
+def ParseJpegFile(data, as_array=False):
     '''
     This function obtains the WV-XAE200WUX (aivmd) recognition results from the JPEG data.
     JPEG データから WV-XAE200WUX (aivmd) 認識結果を取得する。
 
+    The markers are walked with offsets into one memoryview, so the JPEG data is not copied.
+    The scan data after SOS is not read.
+    マーカーは１つの memoryview へのオフセットでたどるので、JPEG データはコピーしない。SOS 以降のスキャンデータは読まない。
+
     Args:
-        data            [i] Data to be confirmed.
+        data            [i] Data to be confirmed. (bytes, bytearray, memoryview or mmap)
+        as_array        [i] If True, detectResult is ndarray of AIVMD_AREA_DTYPE.
     Returns:
         result          True:   success
                         False:  failure
@@ -222,16 +310,18 @@ def ParseJpegFile(data):
     aivmd_result = None
 
     if IsJpegFile(data) == True:
-        next_data = data[2:]
+        data = memoryview(data)
+        offset = 2
         while True:
-            result, tag, length, data, next_data = ParseJpegHeadder(next_data)
+            result, tag, length, data_interior, offset = ParseJpegHeadder(data, offset)
 
             if tag == 0xffda:   # SOS (Start Of Scan)
+                result = False
                 break
             if result==False:
                 break
             if tag == 0xfffe:   # COM (Comment)
-                result, aivmd_result = ParseJpegComment(data)
+                result, aivmd_result = ParseJpegComment(data_interior, as_array)
                 break
 
     return result, aivmd_result
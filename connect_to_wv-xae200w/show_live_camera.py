@@ -23,20 +23,37 @@ limitations under the License.
 [Details]
     This program has been confirmed to work with WV-XAE200WUX Ver. 2.20.
 
+    If headless is True, the video is not displayed.
+    The recognition result is read from the JPEG comment (COM) before the scan data (SOS),
+    so the JPEG is not decoded. Only frames for which IsAlertTarget() returns True are decoded,
+    and they are saved as JPEG files with the recognition frames drawn.
+    This is useful for counting people and vehicles, or alerting, with many cameras.
+
+    headless が True の場合、映像を表示しません。
+    認識結果はスキャンデータ (SOS) より前にある JPEG コメント (COM) から読むので、JPEG をデコードしません。
+    IsAlertTarget() が True を返したフレームだけをデコードし、認識枠を描画して JPEG ファイルに保存します。
+    多数のカメラで人や車の数を数える、アラートを出す、などの用途に使えます。
+
 [Author]
     kinoshita hidetoshi (木下英俊)
 
 [library install]
     cv2:    pip install opencv-python
     numpy:  pip install numpy
+
+[Note]
+    You need to save "parse_jpeg.py", "draw_aivmd_rect.py" and "mjpeg_stream.py" in the same location as this program.
 '''
 
 import cv2
 import numpy as np
 import urllib.request as rq
 import urllib.error
+import os
+import time
 from parse_jpeg import ParseJpegFile
-from draw_aivmd_rect import DrawAivmdRect
+from draw_aivmd_rect import DrawAivmdRect, AivmdOverlayRenderer
+from mjpeg_stream import MjpegStreamReader
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -45,6 +62,8 @@ host        = "192.168.0.10"    # Change to match your camera setting
 winname     = "VIDEO"           # Window title
 resolution  = "1920x1080"       # Resolution
 framerate   =  15               # Frame rate
+headless    = False             # True: Do not display the video. Count the recognition results without decoding JPEG.
+pathOut     = 'alert'           # Folder to save the frames for which IsAlertTarget() returns True. (headless only)
 
 # URL
 url = f"http://{host}/cgi-bin/nphMotionJpeg?Resolution={resolution}&Quality=Standard&Framerate={framerate}"
@@ -79,6 +98,89 @@ def IsWindowVisible(winname):
         return False
 
 
+def IsAlertTarget(aivmd_result):
+    '''
+    [Abstract]
+        Predicate for the headless mode. Change this function to match your purpose.
+        headless モードの判定関数。用途に合わせて変更してください。
+    [Param]
+        aivmd_result :  WV-XAE200WUX (aivmd) recognition result. (as_array=True)
+    [Return]
+        True :          Decode the frame and save it.
+                        フレームをデコードして保存する。
+        False :         Do not decode the frame.
+                        フレームをデコードしない。
+    '''
+    almObj = aivmd_result['detectResult']['almObj']
+    return np.count_nonzero(almObj == 1) >= 3       # 3 or more persons.
+
+
+class AivmdMetadataMonitor():
+    '''
+    Count the AI-VMD recognition results without decoding JPEG.
+    Decode only the frames that match the predicate.
+    JPEG をデコードせずに AI-VMD 認識結果を数える。判定関数に一致したフレームだけをデコードする。
+    '''
+    LABELS = {1: 'Person', 2: 'Car', 3: 'Bike', 4: 'Candidate'}
+
+    def __init__(self, predicate, path_out, stats_interval=10.0):
+        '''
+        Constructor
+
+        Args:
+            predicate       [i] predicate(aivmd_result). If it returns True, the frame is decoded and saved.
+            path_out        [i] Folder to save the frames.
+            stats_interval  [i] Interval [sec] to print statistics.
+        '''
+        self.predicate = predicate
+        self.path_out = path_out
+        self.stats_interval = stats_interval
+
+        self.frames = 0             # Number of received frames.
+        self.decoded = 0            # Number of decoded frames.
+        self.counts = np.zeros(256, dtype=np.int64)     # Number of detections for each almObj.
+        self.parse_time = 0.0       # Total time [sec] to parse the recognition results.
+        self._last_print = time.perf_counter()
+
+        if not os.path.exists(path_out):
+            os.mkdir(path_out)
+
+    def process(self, jpg):
+        '''
+        Process one JPEG frame.
+
+        Args:
+            jpg             [i] JPEG data of one frame.
+        '''
+        self.frames += 1
+
+        start = time.perf_counter()
+        result, aivmd_result = ParseJpegFile(jpg, as_array=True)
+        self.parse_time += time.perf_counter() - start
+
+        if result == True:
+            self.counts += np.bincount(aivmd_result['detectResult']['almObj'], minlength=256)
+
+            if self.predicate(aivmd_result):
+                # Decode the frame only now.
+                self.decoded += 1
+                frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                frame = DrawAivmdRect(frame, aivmd_result)
+                filename = os.path.join(self.path_out, f"alert_{aivmd_result['UTCClock']}_{self.decoded:06d}.jpg")
+                cv2.imwrite(filename, frame)
+                print(filename)
+
+        if time.perf_counter() - self._last_print >= self.stats_interval:
+            self.print_stats()
+            self._last_print = time.perf_counter()
+
+    def print_stats(self):
+        ''' Print statistics. '''
+        counts = ", ".join(f"{label} = {self.counts[obj]}" for obj, label in self.LABELS.items())
+        parse_us = self.parse_time / self.frames * 1e6 if self.frames > 0 else 0.0
+        print(f"frames = {self.frames}, decoded = {self.decoded}, parse = {parse_us:.1f} us/frame, {counts}")
+
+
 def set_digest_auth(uri, user, passwd):
     '''
     [abstract]
@@ -105,29 +207,33 @@ if __name__ == "__main__":
         None
     '''
     connection = False
+    if headless == True:
+        monitor = AivmdMetadataMonitor(IsAlertTarget, pathOut)
+    else:
+        renderer = AivmdOverlayRenderer(scale=1280 / 1920)
+
     while True:
         try:
             if connection == False:
                 set_digest_auth(url, user_id, user_pw)
                 stream = rq.urlopen(url, timeout=10)
-                data = bytes()
+                reader = MjpegStreamReader(stream)
                 connection = True
 
-            temp = stream.read(1024)
+            # Get one JPEG frame (SOI ... EOI) from the stream.
+            jpg = reader.read_frame()
 
-            if len(temp) == 0:
+            if jpg is None:
                 # Probably not properly connected to the camera.
-                print("[ERROR] len(temp) == 0")
+                print("[ERROR] jpg is None")
                 stream.close()
                 connection = False
 
-            data += temp
-            a = data.find(b'\xff\xd8')     # SOI  (Start of Image)  0xFFD8
-            b = data.find(b'\xff\xd9')     # EOI  (End   of Image)  0xFFD9
-            if a != -1 and b != -1:
-                jpg = data[a:b+2]
-                data = data[b+2:]
+            elif headless == True:
+                # Count the recognition results without decoding JPEG.
+                monitor.process(jpg)
 
+            else:
                 # Convert binary data to ndarray type.
                 img_buf = np.frombuffer(jpg, dtype=np.uint8)
 
@@ -135,15 +241,15 @@ if __name__ == "__main__":
                 frame = cv2.imdecode(img_buf, cv2.IMREAD_UNCHANGED)
 
                 # Extracts the recognition result of WV-XAE200WUX (AI-VMD) from the JPEG file.
-                result, aivmd_result = ParseJpegFile(jpg)
-
-                if result==True:
-                    # Draws the recognition result on the received video.
-                    frame = DrawAivmdRect(frame, aivmd_result)
+                result, aivmd_result = ParseJpegFile(jpg, as_array=True)
 
                 # Please modify the value to fit your PC screen size.
                 frame2 = cv2.resize(frame, (1280, 720))
 
+                if result==True:
+                    # Draws the recognition result on the resized video.
+                    frame2 = renderer.draw(frame2, aivmd_result)
+
                 # Display video.
                 cv2.imshow(winname, frame2)
 
@@ -159,6 +265,8 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             # Press '[ctrl] + [c]' on the console to exit the program.
             print("KeyboardInterrupt")
+            if headless == True:
+                monitor.print_stats()
             break
 
         except TimeoutError:
@@ -0,0 +1,233 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Compare the JPEG snapshot rate with and without requests.Session.
+    requests.Session を使う場合と使わない場合で JPEG 取得レートを比較します。
+
+[Details]
+    This program starts a local stand-in camera that serves "/cgi-bin/camera" with digest authentication,
+    and measures frames/sec of the following two methods.
+
+    (1) requests.get(url, auth=HTTPDigestAuth(...)) for every frame. (connect_with_jpeg_1.py)
+        A new TCP connection and a 401 round trip are needed for every frame.
+    (2) session.get(url) with one requests.Session and one HTTPDigestAuth. (connect_with_jpeg_2.py - 6.py)
+        The TCP connection is kept alive and the digest nonce is reused with an incrementing nc.
+
+    このプログラムは Digest 認証付きで "/cgi-bin/camera" を応答するローカルの代替カメラを起動し、
+    下記２つの方法の frames/sec を計測します。
+
+    (1) フレーム毎に requests.get(url, auth=HTTPDigestAuth(...)) を呼ぶ。(connect_with_jpeg_1.py)
+        フレーム毎に新しい TCP 接続と 401 応答の往復が必要です。
+    (2) requests.Session と HTTPDigestAuth を１つずつ作成して session.get(url) を呼ぶ。(connect_with_jpeg_2.py - 6.py)
+        TCP 接続を維持し、Digest 認証の nonce を nc を増やしながら再利用します。
+
+    Usage:
+        python benchmark_jpeg_session.py --count 500 --jpeg image_000001.jpg --delay 0.002
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    requests:   pip install requests
+'''
+
+import argparse
+import hashlib
+import os
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.auth import HTTPDigestAuth
+
+
+user_id     = "user-id"         # User of the stand-in camera.
+user_pw     = "password"        # Password of the stand-in camera.
+realm       = "i-PRO stand-in camera"
+
+
+def md5_hex(text):
+    ''' Return MD5 of the text as a hex string. '''
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def ParseDigestParams(header):
+    '''
+    Get the parameters of the digest "Authorization" header in dictionary format.
+    Digest 認証の "Authorization" ヘッダのパラメータを辞書形式で取得する。
+
+    Args:
+        header          [i] Value of the "Authorization" header.
+    Returns:
+        Parameters in dictionary format. If the header is not digest, it will be None.
+    '''
+    if not header.lower().startswith('digest '):
+        return None
+    params = {}
+    for name, quoted, token in re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', header[7:]):
+        params[name.lower()] = quoted if quoted else token
+    return params
+
+
+class StandInCameraHandler(BaseHTTPRequestHandler):
+    '''
+    Stand-in camera that returns a JPEG image for "/cgi-bin/camera" with digest authentication.
+    Digest 認証付きで "/cgi-bin/camera" に JPEG 画像を応答する代替カメラ。
+    '''
+    protocol_version = 'HTTP/1.1'       # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_challenge(self, stale=False):
+        ''' Send 401 with a new nonce. '''
+        nonce = secrets.token_hex(16)
+        with self.server.lock:
+            self.server.nonces[nonce] = 0
+            self.server.challenges += 1
+        self.send_response(401)
+        self.send_header('WWW-Authenticate',
+            f'Digest realm="{realm}", nonce="{nonce}", qop="auth", algorithm=MD5' + (', stale=true' if stale else ''))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def check_auth(self):
+        '''
+        Check the "Authorization" header.
+
+        Returns:
+            0: OK,  1: no or wrong authorization,  2: stale nonce.
+        '''
+        params = ParseDigestParams(self.headers.get('Authorization', ''))
+        if params is None or params.get('username') != user_id:
+            return 1
+        nonce = params.get('nonce', '')
+        nc = int(params.get('nc', '0'), 16)
+        with self.server.lock:
+            last_nc = self.server.nonces.get(nonce)
+            if last_nc is None or nc <= last_nc:
+                return 2
+            self.server.nonces[nonce] = nc
+        ha1 = md5_hex(f"{user_id}:{realm}:{user_pw}")
+        ha2 = md5_hex(f"{self.command}:{params.get('uri', '')}")
+        expected = md5_hex(f"{ha1}:{nonce}:{params.get('nc', '')}:{params.get('cnonce', '')}:{params.get('qop', '')}:{ha2}")
+        if expected != params.get('response'):
+            return 1
+        return 0
+
+    def do_GET(self):
+        if not self.path.startswith('/cgi-bin/camera'):
+            self.send_error(404)
+            return
+        ret = self.check_auth()
+        if ret != 0:
+            self.send_challenge(stale=(ret == 2))
+            return
+        if self.server.delay > 0:
+            time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(self.server.jpeg)))
+        self.end_headers()
+        self.wfile.write(self.server.jpeg)
+
+
+def StartStandInCamera(jpeg, delay):
+    '''
+    Start the stand-in camera on a free local port.
+    空いているローカルポートで代替カメラを起動する。
+
+    Args:
+        jpeg            [i] JPEG data to return.
+        delay           [i] Time [sec] to create one image in the camera.
+    Returns:
+        server          ThreadingHTTPServer. Call server.shutdown() to stop it.
+    '''
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInCameraHandler)
+    server.daemon_threads = True
+    server.jpeg = jpeg
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.nonces = {}
+    server.connections = 0
+    server.challenges = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def RunBenchmark(server, name, get_image, count):
+    '''
+    Get 'count' images and print frames/sec, new connections and 401 responses.
+    'count' 枚の画像を取得し、frames/sec、新規接続数、401 応答数を表示する。
+    '''
+    connections = server.connections
+    challenges = server.challenges
+
+    start = time.perf_counter()
+    for i in range(count):
+        rs = get_image()
+        if rs.status_code != 200:
+            print(f"[ERROR] status_code = {rs.status_code}")
+            return
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:40s} {count / elapsed:8.1f} fps   "
+          f"connections = {server.connections - connections:5d}   401 = {server.challenges - challenges:5d}")
+
+
+if __name__ == '__main__':
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Compare the JPEG snapshot rate with and without requests.Session.')
+    parser.add_argument('--count', type=int, default=300, help='number of images for each method.')
+    parser.add_argument('--jpeg', default=None, help='JPEG file returned by the stand-in camera.')
+    parser.add_argument('--size', type=int, default=300*1024, help='image size [bytes] if --jpeg is not given.')
+    parser.add_argument('--delay', type=float, default=0.0, help='time [sec] to create one image in the stand-in camera.')
+    args = parser.parse_args()
+
+    if args.jpeg is not None:
+        with open(args.jpeg, 'rb') as fin:
+            jpeg = fin.read()
+    else:
+        jpeg = b'\xff\xd8' + os.urandom(args.size) + b'\xff\xd9'
+
+    server = StartStandInCamera(jpeg, args.delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/cgi-bin/camera?resolution=1920"
+
+    # (1) Before: requests.get() with a new HTTPDigestAuth for every frame.
+    RunBenchmark(server, "requests.get + new HTTPDigestAuth",
+        lambda: requests.get(url, auth=HTTPDigestAuth(user_id, user_pw), timeout=10), args.count)
+
+    # (2) After: one requests.Session and one HTTPDigestAuth.
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(user_id, user_pw)
+    RunBenchmark(server, "requests.Session + cached digest nonce",
+        lambda: session.get(url, timeout=10), args.count)
+
+    session.close()
+    server.shutdown()
@@ -88,10 +88,18 @@ def IsWindowVisible(winname):
         return False
 
 
+# Keep one session for all requests.
+# The TCP connection is kept alive and the digest nonce is reused with an incrementing nc,
+# so the 401 round trip is needed only for the first request.
+# セッションを１つだけ作成して全てのリクエストで使いまわします。
+# TCP 接続を維持し、Digest 認証の nonce を nc を増やしながら再利用するので、401 応答の往復は最初の１回だけになります。
+session = requests.Session()
+session.auth = HTTPDigestAuth(user_id, user_pw)
+
 while True:
     try:
         # Request and receive image from camera.
-        rs = requests.get(url, auth=HTTPDigestAuth(user_id, user_pw))
+        rs = session.get(url)
 
         # Convert from binary to ndarray.
         img_buf= np.frombuffer(rs.content, dtype=np.uint8)
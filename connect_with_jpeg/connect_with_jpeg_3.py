@@ -92,10 +92,15 @@ if __name__ == '__main__':
     [Abstract]
         main function
     '''
+    # Reuse one session as in connect_with_jpeg_2.py. Face detection does not change it.
+    # connect_with_jpeg_2.py と同じく、セッションを１つだけ使いまわす。
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(user_id, user_pw)
+
     while True:
         try:
             # Request and receive image from camera.
-            rs = requests.get(url, auth=HTTPDigestAuth(user_id, user_pw))
+            rs = session.get(url)
 
             # Convert from binary to ndarray.
             img_buf= np.frombuffer(rs.content, dtype=np.uint8)
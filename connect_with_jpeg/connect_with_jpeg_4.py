@@ -104,10 +104,15 @@ if __name__ == '__main__':
     if not os.path.exists(pathOut):
         os.mkdir(pathOut)
 
+    # Reuse one session as in connect_with_jpeg_2.py. The saved JPEG is rs.content as received.
+    # connect_with_jpeg_2.py と同じく、セッションを１つだけ使いまわす。保存する JPEG は受信した rs.content そのもの。
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(user_id, user_pw)
+
     while True:
         try:
             # Request and receive image from camera.
-            rs = requests.get(url, auth=HTTPDigestAuth(user_id, user_pw))
+            rs = session.get(url)
 
             # Save jpeg file.
             count += 1
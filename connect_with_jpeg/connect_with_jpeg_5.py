@@ -79,10 +79,15 @@ def IsWindowVisible(winname):
         return False
 
 
+# One session. If the connection is lost, the session connects again on the next get().
+# セッションは１つ。接続が切れた場合は、次の get() でセッションが再接続する。
+session = requests.Session()
+session.auth = HTTPDigestAuth(user_id, user_pw)
+
 while True:
     try:
         # Request and receive image from camera.
-        rs = requests.get(url, auth=HTTPDigestAuth(user_id, user_pw), timeout=10)
+        rs = session.get(url, timeout=10)
 
         # Convert from binary to ndarray.
         img_buf= np.frombuffer(rs.content, dtype=np.uint8)
@@ -31,6 +31,9 @@ limitations under the License.
 
 [Library install]
     PIL :   pip install pillow
+
+[Note]
+    You need to save "frame_display_scheduler.py" in the same location as this program.
 '''
 
 import tkinter as tk
@@ -42,6 +45,7 @@ import time
 import io
 import requests
 from requests.auth import HTTPDigestAuth
+from frame_display_scheduler import FrameDisplayScheduler     # Local module. See 'frame_display_scheduler.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -82,38 +86,49 @@ class Application(tk.Frame):
         # Create canvas.
         self.canvas = tk.Canvas(self.master)
 
+        # Create one image item. disp_image() updates it in place instead of adding a new item for every frame.
+        # 画像アイテムを１つだけ作成する。disp_image() は毎フレーム新しいアイテムを追加せず、これを更新する。
+        self.photo_image = None
+        self.image_id = self.canvas.create_image(0, 0)
+
         # Add mouse click event to canvas.
         self.canvas.bind('<Button-1>', self.canvas_click)
 
+        # Add resize event to canvas.
+        self.canvas.bind('<Configure>', self.canvas_resize)
+
         # Place canvas.
         self.canvas.pack(expand = True, fill = tk.BOTH)
 
-        # Create image receiving process and queue
-        self.imageQueue = mp.Queue()
+        # Create image receiving process and pipe
+        self.imageReceiver, self.imageSender = mp.Pipe(duplex=False)
         self.request = mp.Value('i', 0)     # -1 : Exit ReceiveImageProcess.
                                             #  0 : Normal.
                                             #  1 : Connect camera.
                                             #  2 : Release camera.
-        self.p = mp.Process(target=ReceiveImageProcess, args=(self.imageQueue, self.request))
+        self.canvas_size = mp.Array('i', [0, 0])   # Canvas size (width, height) for ReceiveImageProcess.
+        self.p = mp.Process(target=ReceiveImageProcess, args=(self.imageSender, self.request, self.canvas_size))
         self.p.start()
 
-        # Raise a video display event (disp_image) after 500m
-        self.disp_id = self.after(500, self.disp_image)
+        # Call disp_image only when a new image arrives through the pipe.
+        # パイプで新しい画像が届いた時だけ disp_image を呼び出す。
+        self.scheduler = FrameDisplayScheduler(self, self.imageReceiver, self.disp_image, fps=30)
+        self.scheduler.start()
 
     def on_closing_window(self):
         ''' Window closing event. '''
 
         if messagebox.askokcancel("QUIT", "Do you want to quit?"):
             # Request terminate process self.p.
+            self.scheduler.stop()
             self.request.value = -1
 
             # Waiting for process p to finish
             time.sleep(1)
 
             # Flash buffer.
-            # The program cannot complete p.join() unless the imageQueue is emptied.
-            for i in range(self.imageQueue.qsize()):
-                pil_image = self.imageQueue.get()
+            # The program cannot complete p.join() unless the pipe is emptied.
+            self.scheduler.drain()
 
             # Wait for process p to be terminated.
             self.p.join()
@@ -123,81 +138,97 @@ class Application(tk.Frame):
     def canvas_click(self, event):
         ''' Event handling with mouse clicks on canvas '''
 
-        if self.disp_id is None:
+        if not self.scheduler.running:
             # Connect camera.
             self.request.value = 1
             # Display image.
-            self.disp_image()
+            self.scheduler.start()
 
         else:
             # Release camera.
             self.request.value = 2
-            # Cancel scheduling
-            self.after_cancel(self.disp_id)
-            self.disp_id = None
-
-    def disp_image(self):
-        ''' Display image on Canvas '''
-
-        # If there is data in the imageQueue, the program receives the data and displays the video.
-        num = self.imageQueue.qsize()
-        if num > 0:
-            if (num > 5):
-                num -= 1
-            for i in range(num):
-                pil_image = self.imageQueue.get()
-
-            # Get canvas size.
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-
-            # Resize the image to the size of the canvas without changing the aspect ratio.
-            # アスペクトを維持したまま画像を Canvas と同じサイズにリサイズ
+            # Stop display. No CPU is used until the next click.
+            self.scheduler.stop()
+
+    def canvas_resize(self, event):
+        ''' Canvas resize event. Tell the new canvas size to the video receiving process. '''
+        with self.canvas_size.get_lock():
+            self.canvas_size[0] = event.width
+            self.canvas_size[1] = event.height
+
+    def disp_image(self, pil_image):
+        '''
+        Display image on Canvas.
+        FrameDisplayScheduler calls this function with the newest image.
+        '''
+
+        # Get canvas size.
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+
+        # The video receiving process has already resized the image to the size of the canvas.
+        # Resize it here only while the canvas size is changing.
+        # 映像受信プロセスで Canvas と同じサイズにリサイズ済み。Canvas のサイズが変わった直後だけここでリサイズする。
+        if pil_image.size != (canvas_width, canvas_height):
             pil_image = ImageOps.pad(pil_image, (canvas_width, canvas_height))
 
-            # Convert image from PIL.Image to PhotoImage
-            # PIL.Image から PhotoImage へ変換する
+        # Convert image from PIL.Image to PhotoImage
+        # PhotoImage is created only when the size is changed. Otherwise the pixels are updated in place.
+        # PhotoImage はサイズが変わった時だけ作成し、それ以外は画素をその場で更新する。
+        if self.photo_image is None or (self.photo_image.width(), self.photo_image.height()) != pil_image.size:
             self.photo_image = ImageTk.PhotoImage(image=pil_image)
-
-            # Display image on the canvas.
-            self.canvas.create_image(
-                canvas_width / 2,       # Image display position (center of the canvas)
-                canvas_height / 2,                   
-                image=self.photo_image  # image data
-                )
-            
+            self.canvas.itemconfig(self.image_id, image=self.photo_image)
         else:
-            pass
+            self.photo_image.paste(pil_image)
 
-        # Raise a video display event (disp_image) after 1ms.
-        self.disp_id = self.after(1, self.disp_image)
+        # Display image on the canvas.
+        # Move the image item to the center of the canvas.
+        self.canvas.coords(self.image_id, canvas_width / 2, canvas_height / 2)
 
 
-def ReceiveImageProcess(imageQueue, request):
+def ReceiveImageProcess(imageSender, request, canvas_size):
     '''
     Receive Image Process.
 
     Args:
-        imageQueue      [o] This process stores the received image data in the imageQueue.
+        imageSender     [o] This process sends (image, captured time) of the received image to the pipe.
         request         [i] Shared memory for receiving requests from the main process.
                             -1: Terminate process.
                              2: Do not get camera image.
                              *: At other values, the program gets the camera image.
+        canvas_size     [i] Shared memory of the canvas size (width, height) in the main process.
     Returns:
         None
     Raises
         None
     '''
 
+    # One session, used only by this receive process.
+    # セッションは１つだけで、この受信プロセスだけが使う。
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(user_id, user_pw)
+
     while request.value != -1:
         if request.value != 2:
             try:
                 # Request and receive image from camera.
-                rs = requests.get(url, auth=HTTPDigestAuth(user_id, user_pw), timeout=10)
-                if imageQueue.qsize() < 10:
-                    image_bin = io.BytesIO(rs.content)
-                    pil_image = Image.open(image_bin)
-                    imageQueue.put(pil_image)
+                rs = session.get(url, timeout=10)
+                captured_time = time.time()
+                image_bin = io.BytesIO(rs.content)
+                pil_image = Image.open(image_bin)
+
+                # Resize the image to the canvas size here to keep the GUI thread free.
+                # draft() lets the JPEG decoder skip pixels that are not needed for the canvas size.
+                # GUI スレッドの負荷を減らすため、ここで画像を Canvas のサイズにリサイズする。
+                # draft() により、JPEG デコーダは Canvas のサイズに不要な画素のデコードを省略する。
+                width, height = canvas_size[:]
+                if width > 1 and height > 1 and width * height < pil_image.width * pil_image.height:
+                    pil_image.draft('RGB', (width, height))
+                    pil_image = ImageOps.pad(pil_image, (width, height), method=Image.BOX)
+
+                # Send the image to the GUI process. The GUI process displays only the newest image.
+                # If the GUI process is busy, send() waits until the previous image is read.
+                imageSender.send((pil_image, captured_time))
 
             except requests.ConnectTimeout as e:
                 print(e)
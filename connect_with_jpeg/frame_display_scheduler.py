@@ -0,0 +1,168 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Display frames in tkinter only when a new frame arrives.
+    新しいフレームが届いた時だけ tkinter でフレームを表示します。
+
+[Details]
+    The video receiving process sends (frame, captured time) to the GUI process through mp.Pipe.
+    FrameDisplayScheduler registers the receiving end of the pipe to the Tk event loop with createfilehandler(),
+    so the display function is called only when data arrives, instead of polling with after(1) and qsize().
+    All frames in the pipe are read and only the newest one is displayed. (The others are counted as coalesced.)
+    On Windows, createfilehandler() is not available, so the pipe is checked with a timer of the stream frame rate.
+    Display frames/sec and latency (from capture to display) are printed at regular intervals.
+
+    映像受信プロセスは (フレーム, 受信時刻) を mp.Pipe で GUI プロセスに送ります。
+    FrameDisplayScheduler はパイプの受信側を createfilehandler() で Tk のイベントループに登録するので、
+    after(1) と qsize() でポーリングする代わりに、データが届いた時だけ表示関数を呼び出します。
+    パイプ内のフレームを全て読み、最新のフレームだけを表示します。（他は coalesced として数えます）
+    Windows では createfilehandler() を使えないので、ストリームのフレームレートのタイマーでパイプを確認します。
+    表示の frames/sec と遅延（受信から表示まで）を一定間隔で表示します。
+
+    Usage:
+        # GUI process.
+        receiver, sender = mp.Pipe(duplex=False)
+        scheduler = FrameDisplayScheduler(app, receiver, app.disp_image, fps=30)
+        scheduler.start()
+
+        # Video receiving process.
+        sender.send((frame, time.time()))
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    None
+'''
+
+import time
+import tkinter as tk
+
+
+class FrameDisplayScheduler():
+    '''
+    Call the display function only when a new frame arrives through the pipe.
+    パイプで新しいフレームが届いた時だけ表示関数を呼び出す。
+    '''
+
+    def __init__(self, widget, receiver, callback, fps=30, stats_interval=10.0):
+        '''
+        Constructor
+
+        Args:
+            widget          [i] tkinter widget. (Application)
+            receiver        [i] Receiving end of mp.Pipe. The sender sends (frame, captured time (time.time())).
+            callback        [i] Display function. callback(frame) is called with the newest frame.
+            fps             [i] Frame rate of the stream. Used only when createfilehandler() is not available.
+            stats_interval  [i] Interval [sec] to print statistics. If 0, statistics are not printed.
+        '''
+        self.widget = widget
+        self.receiver = receiver
+        self.callback = callback
+        self.period_ms = max(1, int(1000 / fps))
+        self.stats_interval = stats_interval
+        self.use_filehandler = hasattr(widget.tk, 'createfilehandler')
+        self.running = False
+        self._after_id = None
+
+        # Statistics.
+        self.displayed = 0          # Number of displayed frames.
+        self.coalesced = 0          # Number of frames skipped because a newer frame had already arrived.
+        self._stats_time = time.perf_counter()
+        self._stats_count = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+
+    def start(self):
+        ''' Start waiting for frames. '''
+        if self.running:
+            return
+        self.running = True
+        if self.use_filehandler:
+            self.widget.tk.createfilehandler(self.receiver, tk.READABLE, self._on_readable)
+        else:
+            self._after_id = self.widget.after(self.period_ms, self._on_timer)
+
+    def stop(self):
+        ''' Stop waiting for frames. No CPU is used while stopped. '''
+        if not self.running:
+            return
+        self.running = False
+        if self.use_filehandler:
+            self.widget.tk.deletefilehandler(self.receiver)
+        elif self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def drain(self):
+        ''' Discard all frames in the pipe. '''
+        while self.receiver.poll():
+            self.receiver.recv()
+
+    def print_stats(self):
+        ''' Print statistics since the last call and reset them. '''
+        now = time.perf_counter()
+        elapsed = now - self._stats_time
+        fps = self._stats_count / elapsed if elapsed > 0 else 0.0
+        latency_avg = self._latency_sum / self._stats_count if self._stats_count > 0 else 0.0
+        print(f"display fps = {fps:.1f}, displayed = {self.displayed}, coalesced = {self.coalesced}, "
+              f"latency avg = {latency_avg*1000:.1f} ms, max = {self._latency_max*1000:.1f} ms")
+
+        self._stats_time = now
+        self._stats_count = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+
+    def _on_readable(self, fileobj, mask):
+        ''' Called by Tk when the pipe is readable. '''
+        self._deliver()
+
+    def _on_timer(self):
+        ''' Called by the timer when createfilehandler() is not available. '''
+        self._after_id = None
+        self._deliver()
+        if self.running:
+            self._after_id = self.widget.after(self.period_ms, self._on_timer)
+
+    def _deliver(self):
+        ''' Read all frames in the pipe and display only the newest one. '''
+        item = None
+        count = 0
+        try:
+            while self.receiver.poll():
+                item = self.receiver.recv()
+                count += 1
+        except EOFError:
+            # The sender was closed.
+            self.stop()
+        if item is None:
+            return
+
+        frame, captured_time = item
+        self.coalesced += count - 1
+        self.callback(frame)
+
+        latency = time.time() - captured_time
+        self.displayed += 1
+        self._stats_count += 1
+        self._latency_sum += latency
+        if latency > self._latency_max:
+            self._latency_max = latency
+
+        if self.stats_interval > 0 and time.perf_counter() - self._stats_time >= self.stats_interval:
+            self.print_stats()
@@ -0,0 +1,381 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Get JPEG images from many i-PRO cameras at the same time with asyncio.
+    asyncio を使って多数の i-PRO カメラから同時に JPEG 画像を取得します。
+
+[Details]
+    One asyncio task polls "/cgi-bin/camera" of one camera at the target rate of the camera.
+    All cameras share one aiohttp session, so TCP connections are kept alive and reused.
+    The digest response is calculated locally from the cached challenge (nonce), and the 401 round trip
+    is needed only for the first request or when the nonce becomes stale.
+    The number of requests in progress is limited by max_concurrency.
+    Received images are returned by "async for", and latency statistics are recorded for each camera.
+
+    カメラ１台につき asyncio タスク１つで、カメラ毎の目標レートで "/cgi-bin/camera" を取得します。
+    全カメラで aiohttp のセッションを１つ共有するので、TCP 接続は維持され再利用されます。
+    Digest 認証の応答値はキャッシュした challenge (nonce) からローカルで計算し、401 応答の往復は
+    最初のリクエストと nonce が古くなった時だけになります。
+    同時に実行するリクエスト数は max_concurrency で制限します。
+    受信した画像は "async for" で返し、カメラ毎に遅延の統計を記録します。
+
+    Usage:
+        async with AsyncSnapshotPoller(cameras) as poller:
+            async for name, jpeg, captured_time in poller:
+                ...
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    aiohttp:    pip install aiohttp
+'''
+
+import asyncio
+import hashlib
+import re
+import secrets
+import time
+
+import aiohttp
+
+
+# Hash functions for the digest "algorithm" parameter.
+DIGEST_ALGORITHMS = {
+    'MD5':      hashlib.md5,
+    'SHA-256':  hashlib.sha256,
+}
+
+
+class DigestAuth():
+    '''
+    Calculate the digest "Authorization" header locally from the cached challenge.
+    キャッシュした challenge から Digest 認証の "Authorization" ヘッダをローカルで計算する。
+    '''
+
+    def __init__(self, user, password):
+        '''
+        Constructor
+
+        Args:
+            user            [i] user-id for camera.
+            password        [i] user-password for camera.
+        '''
+        self.user = user
+        self.password = password
+        self.challenge = None       # Parameters of "WWW-Authenticate".
+        self.nc = 0                 # Nonce count.
+
+    def update_challenge(self, www_authenticate):
+        '''
+        Cache the challenge of the 401 response.
+        401 応答の challenge をキャッシュする。
+
+        Args:
+            www_authenticate    [i] Value of the "WWW-Authenticate" header.
+        Returns:
+            True:   success
+            False:  the header is not digest.
+        '''
+        if not www_authenticate or not www_authenticate.lower().startswith('digest '):
+            return False
+        params = {}
+        for name, quoted, token in re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', www_authenticate[7:]):
+            params[name.lower()] = quoted if quoted else token
+        self.challenge = params
+        self.nc = 0
+        return True
+
+    def build_header(self, method, uri):
+        '''
+        Build the "Authorization" header.
+        "Authorization" ヘッダを作成する。
+
+        Args:
+            method          [i] HTTP method. (ex. 'GET')
+            uri             [i] Path and query of the request. (ex. '/cgi-bin/camera?resolution=1920')
+        Returns:
+            Value of the "Authorization" header. If there is no challenge yet, it will be None.
+        '''
+        if self.challenge is None:
+            return None
+
+        algorithm = self.challenge.get('algorithm', 'MD5')
+        hash_func = DIGEST_ALGORITHMS.get(algorithm.upper(), hashlib.md5)
+        H = lambda text: hash_func(text.encode()).hexdigest()
+
+        realm = self.challenge.get('realm', '')
+        nonce = self.challenge.get('nonce', '')
+        ha1 = H(f"{self.user}:{realm}:{self.password}")
+        ha2 = H(f"{method}:{uri}")
+
+        header = f'Digest username="{self.user}", realm="{realm}", nonce="{nonce}", uri="{uri}", algorithm={algorithm}'
+        qop = self.challenge.get('qop')
+        if qop is not None and 'auth' in [q.strip() for q in qop.split(',')]:
+            self.nc += 1
+            nc = f"{self.nc:08x}"
+            cnonce = secrets.token_hex(8)
+            response = H(f"{ha1}:{nonce}:{nc}:{cnonce}:auth:{ha2}")
+            header += f', qop=auth, nc={nc}, cnonce="{cnonce}"'
+        else:
+            response = H(f"{ha1}:{nonce}:{ha2}")
+        header += f', response="{response}"'
+
+        if 'opaque' in self.challenge:
+            header += f', opaque="{self.challenge["opaque"]}"'
+        return header
+
+
+class CameraSetting():
+    '''
+    Connection setting of one camera.
+    カメラ１台の接続設定。
+    '''
+
+    def __init__(self, name, host, user, password, resolution=1920, rate=2.0):
+        '''
+        Constructor
+
+        Args:
+            name            [i] Name to identify the camera.
+            host            [i] IP address (or host:port) of the camera.
+            user            [i] user-id for camera.
+            password        [i] user-password for camera.
+            resolution      [i] Resolution. (ex. 1920, 1280, 640)
+            rate            [i] Target frame rate [fps].
+        '''
+        self.name = name
+        self.host = host
+        self.user = user
+        self.password = password
+        self.resolution = resolution
+        self.rate = rate
+
+    @property
+    def path(self):
+        return f"/cgi-bin/camera?resolution={self.resolution}"
+
+    @property
+    def url(self):
+        return f"http://{self.host}{self.path}"
+
+
+class CameraStats():
+    '''
+    Statistics of one camera.
+    カメラ１台の統計。
+    '''
+
+    def __init__(self):
+        self.count = 0              # Number of received images.
+        self.errors = 0             # Number of failed requests.
+        self.dropped = 0            # Number of images dropped because the output queue was full.
+        self.latency_sum = 0.0      # Sum of latency [sec].
+        self.latency_max = 0.0      # Max latency [sec].
+        self.start_time = time.perf_counter()
+
+    def add(self, latency):
+        ''' Record one received image. '''
+        self.count += 1
+        self.latency_sum += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    @property
+    def latency_avg(self):
+        return self.latency_sum / self.count if self.count > 0 else 0.0
+
+    @property
+    def fps(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"fps = {self.fps:6.2f}, count = {self.count}, errors = {self.errors}, dropped = {self.dropped}, "
+                f"latency avg = {self.latency_avg*1000:7.1f} ms, max = {self.latency_max*1000:7.1f} ms")
+
+
+class AsyncSnapshotPoller():
+    '''
+    Poll JPEG images from many cameras with asyncio.
+    asyncio で多数のカメラから JPEG 画像を取得する。
+    '''
+
+    def __init__(self, cameras, max_concurrency=16, queue_size=100, timeout=10):
+        '''
+        Constructor
+
+        Args:
+            cameras         [i] List of CameraSetting.
+            max_concurrency [i] Max number of requests in progress for all cameras.
+            queue_size      [i] Max number of images waiting for the consumer.
+                                If the queue is full, the oldest image is dropped.
+            timeout         [i] Timeout [sec] of one request.
+        '''
+        self.cameras = cameras
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.stats = {camera.name: CameraStats() for camera in cameras}
+        self._session = None
+        self._semaphore = None
+        self._queue = None
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        '''
+        Return (camera name, JPEG data (bytes), captured time (time.time())).
+        (カメラ名, JPEG データ (bytes), 取得時刻 (time.time())) を返す。
+        '''
+        if self._queue is None:
+            raise StopAsyncIteration
+        return await self._queue.get()
+
+    async def start(self):
+        ''' Start polling all cameras. '''
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._poll(camera)) for camera in self.cameras]
+
+    async def stop(self):
+        ''' Stop polling and close all connections. '''
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def print_stats(self):
+        ''' Print statistics of all cameras. '''
+        for name, stats in self.stats.items():
+            print(f"{name:20s} {stats}")
+
+    async def _get(self, camera, auth):
+        '''
+        Get one JPEG image. If the camera returns 401, update the challenge and retry once.
+
+        Returns:
+            JPEG data (bytes). If it fails, it will be None.
+        '''
+        for retry in range(2):
+            headers = {}
+            authorization = auth.build_header('GET', camera.path)
+            if authorization is not None:
+                headers['Authorization'] = authorization
+
+            async with self._session.get(camera.url, headers=headers) as rs:
+                if rs.status == 401:
+                    auth.update_challenge(rs.headers.get('WWW-Authenticate'))
+                    await rs.read()
+                    continue
+                if rs.status != 200:
+                    print(f"[ERROR] {camera.name}: status = {rs.status}")
+                    return None
+                return await rs.read()
+        return None
+
+    def _put(self, stats, item):
+        ''' Put the image to the queue. If the queue is full, drop the oldest image. '''
+        if self._queue.full():
+            self._queue.get_nowait()
+            stats.dropped += 1
+        self._queue.put_nowait(item)
+
+    async def _poll(self, camera):
+        ''' Polling task of one camera. '''
+        auth = DigestAuth(camera.user, camera.password)
+        stats = self.stats[camera.name]
+        period = 1.0 / camera.rate
+        next_time = time.perf_counter()
+
+        while True:
+            # Wait for the next polling time.
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_time += period
+            if next_time < time.perf_counter():
+                # Too late. Do not try to catch up with the missed frames.
+                next_time = time.perf_counter()
+
+            try:
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    jpeg = await self._get(camera, auth)
+                    latency = time.perf_counter() - start
+
+                if jpeg is None:
+                    stats.errors += 1
+                    continue
+
+                stats.add(latency)
+                self._put(stats, (camera.name, jpeg, time.time()))
+
+            except asyncio.CancelledError:
+                raise
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                stats.errors += 1
+                print(f"[ERROR] {camera.name}: {e!r}")
+
+
+async def main():
+    '''
+    [Abstract]
+        Poll the cameras and print statistics every 5 seconds.
+        カメラから画像を取得し、５秒毎に統計を表示する。
+    '''
+    # Change to match your camera settings.
+    cameras = [
+        CameraSetting(f"camera{i:02d}", f"192.168.0.{10 + i}", "user-id", "password", resolution=1920, rate=2.0)
+        for i in range(4)
+    ]
+
+    async with AsyncSnapshotPoller(cameras, max_concurrency=16) as poller:
+        last_print = time.perf_counter()
+        async for name, jpeg, captured_time in poller:
+            # Process the JPEG data here.
+            # 受信した JPEG データの処理をここに書きます。
+
+            if time.perf_counter() - last_print >= 5.0:
+                poller.print_stats()
+                last_print = time.perf_counter()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Press '[ctrl] + [c]' on the console to exit the program.
+        print("KeyboardInterrupt")
@@ -31,12 +31,16 @@ limitations under the License.
 
 [Library install]
     cv2:    pip install opencv-python
+
+[Note]
+    You need to save "mjpeg_stream.py" in the same location as this program.
 '''
 
 import cv2
 import numpy as np
 import os
 import urllib.request as rq
+from mjpeg_stream import MjpegStreamReader
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -122,46 +126,46 @@ if __name__ == '__main__':
     set_digest_auth(url, user_id, user_pw)
     stream = rq.urlopen(url)
 
-    bytes = bytes()
+    reader = MjpegStreamReader(stream)
     while True:
         try:
-            bytes += stream.read(1024)
-            a = bytes.find(b'\xff\xd8')     # SOI (Start of Image)  0xFFD8
-            b = bytes.find(b'\xff\xd9')     # EOI (End   of Image)  0xFFD9
-            if a != -1 and b != -1:
-                jpg = bytes[a:b+2]
-                bytes = bytes[b+2:]
-
-                # Save jpeg file.
-                count += 1
-                filename = os.path.join(pathOut, 'image_{:06d}.jpg'.format(count))
-                SaveBinaryData(jpg, filename)
-
-                # Convert binary data to ndarray type.
-                img_buf = np.frombuffer(jpg, dtype=np.uint8)
-
-                # Decode ndarray data to OpenCV format image data.
-                frame = cv2.imdecode(img_buf, cv2.IMREAD_UNCHANGED)
-
-                # Please modify the value to fit your PC screen size.
-                frame2 = cv2.resize(frame, (1280, 720))
-
-                # Display video.
-                cv2.imshow(winname, frame2)
-
-                if windowInitialized==False:
-                    # Specify window position only once at startup.
-                    cv2.moveWindow(winname, 100, 100)
-                    windowInitialized = True
-
-                # Press the "q" key to finish.
-                k = cv2.waitKey(1) & 0xff   # necessary to display the video by imshow ()
-                if k == ord("q"):
-                    break
-
-                # Exit the program if there is no specified window.
-                if not IsWindowVisible(winname):
-                    break
+            # Get one JPEG frame (SOI ... EOI) from the stream.
+            jpg = reader.read_frame()
+            if jpg is None:
+                # The connection was closed by the camera.
+                print("[ERROR] The stream was closed.")
+                break
+
+            # Save jpeg file.
+            count += 1
+            filename = os.path.join(pathOut, 'image_{:06d}.jpg'.format(count))
+            SaveBinaryData(jpg, filename)
+
+            # Convert binary data to ndarray type.
+            img_buf = np.frombuffer(jpg, dtype=np.uint8)
+
+            # Decode ndarray data to OpenCV format image data.
+            frame = cv2.imdecode(img_buf, cv2.IMREAD_UNCHANGED)
+
+            # Please modify the value to fit your PC screen size.
+            frame2 = cv2.resize(frame, (1280, 720))
+
+            # Display video.
+            cv2.imshow(winname, frame2)
+
+            if windowInitialized==False:
+                # Specify window position only once at startup.
+                cv2.moveWindow(winname, 100, 100)
+                windowInitialized = True
+
+            # Press the "q" key to finish.
+            k = cv2.waitKey(1) & 0xff   # necessary to display the video by imshow ()
+            if k == ord("q"):
+                break
+
+            # Exit the program if there is no specified window.
+            if not IsWindowVisible(winname):
+                break
 
         except KeyboardInterrupt:
             # Press '[ctrl] + [c]' on the console to exit the program.
@@ -0,0 +1,255 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Split an MJPEG(Motion JPEG) stream into JPEG frames.
+    MJPEG(Motion JPEG) ストリームを JPEG フレームに分割します。
+
+[Details]
+    The received data is stored in one bytearray, and the position where the last search stopped is remembered.
+    Each byte is searched only once, so the processing time per frame does not grow with the frame size.
+    If the camera sends a multipart header with "Content-Length", the frame is cut out by the length
+    without searching for SOI/EOI. In this case the rest of the frame is received with one readinto(),
+    so the number of read calls per frame is only a few. 0xFFD9 in a thumbnail or an APP segment is
+    not mistaken for EOI.
+    Each JPEG frame is returned as a memoryview of the buffer (no copy).
+
+    受信データを１つの bytearray に格納し、前回の検索を終えた位置を記憶します。
+    各バイトの検索は１回だけなので、フレームサイズが大きくなっても１フレームあたりの処理時間は増えません。
+    カメラが "Content-Length" 付きのマルチパートヘッダを送信する場合、SOI/EOI を検索せずに長さでフレームを切り出します。
+    この場合フレームの残りを１回の readinto() で受信するので、１フレームあたりの読み込み回数は数回になります。
+    サムネイルや APP セグメント中の 0xFFD9 を EOI と誤認することもありません。
+    各 JPEG フレームはバッファの memoryview として（コピーせずに）返します。
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    There should be no libraries that require installation.
+    インストールを必要とするライブラリはないはずです。
+
+[Note]
+    The memoryview returned by read_frame() is valid until the next call of read_frame().
+    Use bytes(frame) if you want to keep the frame longer.
+
+    read_frame() が返す memoryview は次に read_frame() を呼び出すまで有効です。
+    フレームをそれ以上保持したい場合は bytes(frame) でコピーしてください。
+'''
+
+SOI = b'\xff\xd8'               # SOI (Start of Image)  0xFFD8
+EOI = b'\xff\xd9'               # EOI (End   of Image)  0xFFD9
+HEADER_END = b'\r\n\r\n'        # End of multipart header.
+MAX_HEADER_SIZE = 4096          # Data without header or SOI beyond this size is discarded.
+
+# Parser state.
+STATE_HEADER    = 0             # Waiting for a multipart header or SOI.
+STATE_LENGTH    = 1             # Waiting for "Content-Length" bytes.
+STATE_SCAN      = 2             # Searching for EOI.
+
+
+def ParseContentLength(header):
+    '''
+    Get the value of "Content-Length" from the multipart header.
+    マルチパートヘッダから "Content-Length" の値を取得する。
+
+    Args:
+        header          [i] multipart header (bytes-like object).
+    Returns:
+        Content-Length. If it does not exist, it will be None.
+    Raises
+        None
+    '''
+    for line in bytes(header).split(b'\r\n'):
+        name, sep, value = line.partition(b':')
+        if sep and name.strip().lower() == b'content-length':
+            try:
+                return int(value.strip())
+            except ValueError:
+                return None
+    return None
+
+
+class MjpegStreamReader():
+    '''
+    Split an MJPEG stream into JPEG frames.
+    MJPEG ストリームを JPEG フレームに分割する。
+    '''
+
+    def __init__(self, stream, chunk_size=1024, buffer_size=512*1024, bulk_read=True):
+        '''
+        Constructor
+
+        Args:
+            stream          [i] Stream object that has readinto(). (ex. return value of urllib.request.urlopen())
+            chunk_size      [i] Number of bytes to read at one time while searching for a header or EOI.
+            buffer_size     [i] Initial buffer size. The buffer grows automatically if a frame does not fit.
+            bulk_read       [i] True:  If "Content-Length" is known, read the rest of the frame at once.
+                                False: Always read chunk_size bytes at one time.
+        '''
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bulk_read = bulk_read
+        self._buf = bytearray(max(buffer_size, chunk_size))
+        self._view = memoryview(self._buf)
+        self._start = 0                 # Start of unprocessed data.
+        self._end = 0                   # End of received data.
+        self._scan = 0                  # Position to resume the search.
+        self._frame_start = 0           # Start of the current frame.
+        self._frame_end = 0             # End of the current frame. (STATE_LENGTH only)
+        self._state = STATE_HEADER
+
+    def __iter__(self):
+        '''
+        Return JPEG frames until the end of the stream.
+        ストリームの終わりまで JPEG フレームを返す。
+        '''
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                break
+            yield frame
+
+    def read_frame(self):
+        '''
+        Read one JPEG frame.
+        JPEG フレームを１つ読み込む。
+
+        Returns:
+            JPEG data (memoryview). If the stream is closed, it will be None.
+        '''
+        while True:
+            frame = self._next_frame()
+            if frame is not None:
+                return frame
+            if not self._fill():
+                return None
+
+    def _next_frame(self):
+        '''
+        Cut out one JPEG frame from the received data.
+        If there is not enough data, return None.
+        '''
+        buf = self._buf
+
+        if self._state == STATE_HEADER:
+            soi = buf.find(SOI, self._scan, self._end)
+            header_end = buf.find(HEADER_END, self._scan, self._end)
+
+            if header_end != -1 and (soi == -1 or header_end < soi):
+                # Multipart header.
+                length = ParseContentLength(self._view[self._start:header_end])
+                self._frame_start = header_end + len(HEADER_END)
+                if length is not None:
+                    self._frame_end = self._frame_start + length
+                    self._state = STATE_LENGTH
+                else:
+                    self._scan = self._frame_start
+                    self._state = STATE_SCAN
+            elif soi != -1:
+                # JPEG data without multipart header.
+                self._frame_start = soi
+                self._scan = soi + len(SOI)
+                self._state = STATE_SCAN
+            else:
+                # A part of the marker may be at the end of the data.
+                self._scan = max(self._start, self._end - len(HEADER_END) + 1)
+                if self._scan - self._start > MAX_HEADER_SIZE:
+                    # Discard unknown data.
+                    self._start = self._scan
+                return None
+
+        if self._state == STATE_LENGTH:
+            if self._end < self._frame_end:
+                return None
+            if buf[self._frame_start:self._frame_start + len(SOI)] != SOI:
+                # "Content-Length" does not match the data. Search for the next header or SOI.
+                self._start = self._frame_start
+                self._scan = self._frame_start
+                self._state = STATE_HEADER
+                return self._next_frame()
+            return self._cut_frame(self._frame_end)
+
+        if self._state == STATE_SCAN:
+            eoi = buf.find(EOI, self._scan, self._end)
+            if eoi == -1:
+                self._scan = max(self._scan, self._end - len(EOI) + 1)
+                return None
+            return self._cut_frame(eoi + len(EOI))
+
+        return None
+
+    def _cut_frame(self, frame_end):
+        ''' Return the frame [self._frame_start:frame_end] and go to the next header. '''
+        frame = self._view[self._frame_start:frame_end]
+        self._start = frame_end
+        self._scan = frame_end
+        self._state = STATE_HEADER
+        return frame
+
+    def _reserve(self, size):
+        '''
+        Make room for receiving at least 'size' bytes after self._end.
+        Data before self._start is discarded.
+        '''
+        if self._end + size <= len(self._buf):
+            return
+
+        remain = self._end - self._start
+        required = remain + size
+        if self._state == STATE_LENGTH:
+            required = max(required, self._frame_end - self._start)
+
+        if required <= len(self._buf):
+            # Move unprocessed data to the top of the buffer.
+            # The size of the buffer does not change, so memoryview returned before is not broken.
+            self._buf[0:remain] = self._buf[self._start:self._end]
+        else:
+            # Allocate a larger buffer.
+            new_size = len(self._buf)
+            while new_size < required:
+                new_size *= 2
+            new_buf = bytearray(new_size)
+            new_buf[0:remain] = self._view[self._start:self._end]
+            self._buf = new_buf
+            self._view = memoryview(new_buf)
+
+        offset = self._start
+        self._start = 0
+        self._end = remain
+        self._scan -= offset
+        self._frame_start -= offset
+        self._frame_end -= offset
+
+    def _fill(self):
+        '''
+        Receive data from the stream.
+
+        Returns:
+            True:   success
+            False:  end of stream
+        '''
+        size = self.chunk_size
+        if self.bulk_read and self._state == STATE_LENGTH:
+            # Read exactly the rest of the frame.
+            size = self._frame_end - self._end
+
+        self._reserve(size)
+        n = self.stream.readinto(self._view[self._end:self._end + size])
+        if not n:
+            return False
+        self._end += n
+        return True
@@ -0,0 +1,264 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Pass images between processes with shared memory instead of mp.Queue.
+    mp.Queue の代わりに共有メモリでプロセス間の画像受け渡しを行います。
+
+[Details]
+    When an ndarray is put into mp.Queue, the image (about 6MB for 1920x1080x3) is pickled and copied through a pipe.
+    SharedFrameRing has a fixed number of frame slots in multiprocessing.shared_memory.
+    The producer writes pixels into a slot only once, and the consumer maps the slot as an ndarray without copying.
+    Only the sequence number of the frame (a small int) goes through mp.Queue.
+
+    Each slot has a sequence number used as a seqlock.
+    The producer sets it to -1 while writing and to the sequence number of the frame after writing.
+    The consumer checks it before and after using the slot, so a frame overwritten by the producer is detected.
+    There is only one producer for one ring.
+
+    mp.Queue に ndarray を入れると、画像（1920x1080x3 で約 6MB）は pickle されパイプを通してコピーされます。
+    SharedFrameRing は multiprocessing.shared_memory 上に固定数のフレームスロットを持ちます。
+    生成側は画素をスロットに１回だけ書き込み、利用側はスロットをコピーせずに ndarray としてマップします。
+    mp.Queue を通すのはフレームのシーケンス番号（小さな int）だけです。
+
+    各スロットは seqlock として使うシーケンス番号を持ちます。
+    生成側は書き込み中は -1、書き込み後はフレームのシーケンス番号を設定します。
+    利用側はスロットを使う前後でこの値を確認するので、生成側に上書きされたフレームを検出できます。
+    １つのリングに対して生成側は１つだけです。
+
+    Usage:
+        # Main process.
+        ring = SharedFrameRing(slots=4, max_shape=(1080, 1920, 3))
+        p = mp.Process(target=Producer, args=(ring, queue))
+
+        # Producer process.
+        seq = ring.put(frame)
+        queue.put(seq)
+
+        # Consumer process.
+        seq = queue.get()
+        frame = ring.get(seq)           # ndarray (no copy) or None if overwritten.
+        ...
+        if ring.is_valid(seq): ...      # The frame was not overwritten while it was used.
+
+        # Main process.
+        ring.close()
+        ring.unlink()
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    numpy:  pip install numpy
+'''
+
+import numpy as np
+from multiprocessing import shared_memory
+
+
+# Header of each slot. (int64)
+SLOT_SEQ    = 0             # Sequence number of the frame. -1: writing,  0: empty.
+SLOT_HEIGHT = 1
+SLOT_WIDTH  = 2
+SLOT_DEPTH  = 3
+SLOT_HEADER = 4             # Number of int64 values in the header of each slot.
+
+# Header of the ring. (int64)
+RING_SEQ    = 0             # Sequence number of the last frame written.
+RING_HEADER = 1
+
+
+def AttachSharedMemory(name):
+    '''
+    Attach to existing shared memory.
+    The resource tracker of Python 3.13 or later is not used, because the creator unlinks it.
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12 or earlier.
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing():
+    '''
+    Ring buffer of image frames in shared memory.
+    共有メモリ上の画像フレームのリングバッファ。
+    '''
+
+    def __init__(self, slots=4, max_shape=(1080, 1920, 3), dtype=np.uint8):
+        '''
+        Constructor. Create the shared memory.
+
+        Args:
+            slots           [i] Number of frame slots.
+            max_shape       [i] Max shape of a frame. (height, width, depth)
+            dtype           [i] Data type of pixels.
+        '''
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(self.max_shape)) * self.dtype.itemsize
+
+        header_bytes = (RING_HEADER + SLOT_HEADER * slots) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + self.slot_bytes * slots)
+        self._owner = True
+        self._map()
+        self._header[:] = 0
+
+    def __getstate__(self):
+        ''' Only the name of the shared memory is passed to the other process. '''
+        return {
+            'name':         self.shm.name,
+            'slots':        self.slots,
+            'max_shape':    self.max_shape,
+            'dtype':        self.dtype.str,
+        }
+
+    def __setstate__(self, state):
+        ''' Attach to the shared memory created by the other process. '''
+        self.slots = state['slots']
+        self.max_shape = state['max_shape']
+        self.dtype = np.dtype(state['dtype'])
+        self.slot_bytes = int(np.prod(self.max_shape)) * self.dtype.itemsize
+        self.shm = AttachSharedMemory(state['name'])
+        self._owner = False
+        self._map()
+
+    def _map(self):
+        ''' Create ndarray views of the header and the slots. '''
+        header_count = RING_HEADER + SLOT_HEADER * self.slots
+        self._header = np.ndarray((header_count,), dtype=np.int64, buffer=self.shm.buf)
+        self._ring = self._header[:RING_HEADER]
+        self._slot_header = self._header[RING_HEADER:].reshape(self.slots, SLOT_HEADER)
+        self._data = np.ndarray((self.slots, self.slot_bytes), dtype=np.uint8,
+                                buffer=self.shm.buf, offset=header_count * 8)
+        self._writing = None
+
+    @property
+    def last_seq(self):
+        ''' Sequence number of the last frame written. 0 if nothing is written. '''
+        return int(self._ring[RING_SEQ])
+
+    def _slot_view(self, index, shape):
+        ''' ndarray view of the slot with the given shape. '''
+        count = int(np.prod(shape))
+        return self._data[index, :count * self.dtype.itemsize].view(self.dtype).reshape(shape)
+
+    def begin_put(self, shape):
+        '''
+        Reserve the next slot and return it as an ndarray to write pixels directly.
+        (ex. cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=slot))
+        Call end_put() after writing.
+        次のスロットを確保し、画素を直接書き込むための ndarray として返す。書き込み後に end_put() を呼ぶこと。
+
+        Args:
+            shape           [i] Shape of the frame.
+        Returns:
+            ndarray view of the slot.
+        Raises
+            ValueError:     The frame is larger than max_shape.
+        '''
+        shape = tuple(shape)
+        if int(np.prod(shape)) * self.dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"The frame {shape} is larger than max_shape {self.max_shape}.")
+
+        seq = self.last_seq + 1
+        index = seq % self.slots
+        header = self._slot_header[index]
+        header[SLOT_SEQ] = -1           # writing
+        header[SLOT_HEIGHT:SLOT_HEIGHT + len(shape)] = shape
+        header[SLOT_HEIGHT + len(shape):SLOT_HEADER] = 0
+        self._writing = seq
+        return self._slot_view(index, shape)
+
+    def end_put(self):
+        '''
+        Publish the frame written after begin_put().
+        begin_put() の後に書き込んだフレームを公開する。
+
+        Returns:
+            Sequence number of the frame.
+        '''
+        seq = self._writing
+        self._writing = None
+        self._slot_header[seq % self.slots, SLOT_SEQ] = seq
+        self._ring[RING_SEQ] = seq
+        return seq
+
+    def put(self, frame):
+        '''
+        Copy the frame into the next slot.
+        フレームを次のスロットにコピーする。
+
+        Args:
+            frame           [i] ndarray.
+        Returns:
+            Sequence number of the frame.
+        '''
+        slot = self.begin_put(frame.shape)
+        np.copyto(slot, frame, casting='unsafe')
+        return self.end_put()
+
+    def get(self, seq=None, copy=False):
+        '''
+        Get the frame of the sequence number.
+        シーケンス番号のフレームを取得する。
+
+        Args:
+            seq             [i] Sequence number. If None, the newest frame.
+            copy            [i] False: Return a view of the shared memory. Check is_valid(seq) after using it.
+                                True:  Return a copy. The copy is checked with is_valid(seq).
+        Returns:
+            ndarray. If the frame does not exist or was overwritten, it will be None.
+        '''
+        if seq is None:
+            seq = self.last_seq
+        if seq <= 0:
+            return None
+
+        header = self._slot_header[seq % self.slots]
+        if header[SLOT_SEQ] != seq:
+            return None
+        shape = tuple(int(v) for v in header[SLOT_HEIGHT:SLOT_HEADER] if v != 0)
+        frame = self._slot_view(seq % self.slots, shape)
+
+        if copy:
+            frame = frame.copy()
+            if not self.is_valid(seq):
+                return None
+        return frame
+
+    def is_valid(self, seq):
+        '''
+        Check that the frame of the sequence number is not overwritten.
+        シーケンス番号のフレームが上書きされていないことを確認する。
+        '''
+        return seq > 0 and self._slot_header[seq % self.slots, SLOT_SEQ] == seq
+
+    def close(self):
+        ''' Close the shared memory in this process. '''
+        self._header = None
+        self._ring = None
+        self._slot_header = None
+        self._data = None
+        self.shm.close()
+
+    def unlink(self):
+        ''' Free the shared memory. Call this only in the process that created the ring. '''
+        if self._owner:
+            self.shm.unlink()
@@ -0,0 +1,152 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Compare passing images through mp.Queue with SharedFrameRing.
+    mp.Queue と SharedFrameRing による画像受け渡しを比較します。
+
+[Details]
+    A producer process sends 1920x1080x3 images to a consumer process with the following two methods,
+    and this program prints frames/sec and CPU time of each process.
+
+    (1) mp.Queue:           imageQueue.put(frame)           (the current samples)
+    (2) SharedFrameRing:    ring.put(frame), imageQueue.put(seq)
+
+    生成プロセスから利用プロセスへ下記２つの方法で 1920x1080x3 の画像を送り、
+    frames/sec と各プロセスの CPU 時間を表示します。
+
+    Usage:
+        python benchmark_shared_frame_ring.py --count 300
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "shared_frame_ring.py" in the same location as this program.
+'''
+
+import argparse
+import multiprocessing as mp
+import time
+
+import numpy as np
+from shared_frame_ring import SharedFrameRing
+
+
+def ProducerProcess(imageQueue, ring, count, shape, resultQueue):
+    ''' Send 'count' images. If ring is None, send images through imageQueue. '''
+    frame = np.random.randint(0, 255, shape, dtype=np.uint8)
+    cpu_start = time.process_time()
+
+    for i in range(count):
+        frame[0, 0, 0] = i % 256
+        if ring is None:
+            imageQueue.put(frame)
+        else:
+            imageQueue.put(ring.put(frame))
+    imageQueue.put(-1)
+
+    resultQueue.put(('producer', time.process_time() - cpu_start))
+    if ring is not None:
+        ring.close()
+
+
+def ConsumerProcess(imageQueue, ring, resultQueue):
+    ''' Receive images until -1. '''
+    received = 0
+    overwritten = 0
+    cpu_start = time.process_time()
+    start = None
+
+    while True:
+        item = imageQueue.get()
+        if start is None:
+            start = time.perf_counter()
+        if type(item) == int and item == -1:
+            break
+
+        if ring is None:
+            frame = item
+        else:
+            frame = ring.get(item)
+
+        if frame is None:
+            overwritten += 1
+            continue
+
+        # Touch the image.
+        int(frame[0, 0, 0])
+        if ring is not None and not ring.is_valid(item):
+            overwritten += 1
+            continue
+        received += 1
+
+    elapsed = time.perf_counter() - start
+    frame = None
+    resultQueue.put(('consumer', time.process_time() - cpu_start, received, overwritten, elapsed))
+    if ring is not None:
+        ring.close()
+
+
+def RunBenchmark(name, use_ring, count, shape, slots):
+    ''' Run one method and print the result. '''
+    ring = SharedFrameRing(slots=slots, max_shape=shape) if use_ring else None
+
+    # The queue is bounded, so the producer never overwrites a frame that is not consumed yet.
+    imageQueue = mp.Queue(maxsize=max(1, slots - 2))
+    resultQueue = mp.Queue()
+
+    consumer = mp.Process(target=ConsumerProcess, args=(imageQueue, ring, resultQueue))
+    producer = mp.Process(target=ProducerProcess, args=(imageQueue, ring, count, shape, resultQueue))
+    consumer.start()
+    producer.start()
+
+    results = {}
+    for i in range(2):
+        result = resultQueue.get()
+        results[result[0]] = result[1:]
+    producer.join()
+    consumer.join()
+
+    if ring is not None:
+        ring.close()
+        ring.unlink()
+
+    producer_cpu, = results['producer']
+    consumer_cpu, received, overwritten, elapsed = results['consumer']
+    print(f"{name:18s} {received / elapsed:8.1f} fps   "
+          f"CPU producer = {producer_cpu:6.2f} s, consumer = {consumer_cpu:6.2f} s   overwritten = {overwritten}")
+
+
+if __name__ == '__main__':
+    '''
+    [Abstract]
+        main function
+    '''
+    parser = argparse.ArgumentParser(description='Compare passing images through mp.Queue with SharedFrameRing.')
+    parser.add_argument('--count', type=int, default=300, help='number of images.')
+    parser.add_argument('--width', type=int, default=1920, help='image width.')
+    parser.add_argument('--height', type=int, default=1080, help='image height.')
+    parser.add_argument('--slots', type=int, default=4, help='number of slots of SharedFrameRing.')
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    RunBenchmark("mp.Queue",        False, args.count, shape, args.slots)
+    RunBenchmark("SharedFrameRing", True,  args.count, shape, args.slots)
@@ -33,9 +33,13 @@ limitations under the License.
     Get the file "haarcascade_frontalface_alt2.xml" from the URL below.
     下記URLからファイル "haarcascade_frontalface_alt2.xml" を入手するしてください。
     https://github.com/opencv/opencv/tree/master/data/haarcascades
+
+[Note]
+    You need to save "latest_frame_capture.py" in the same location as this program.
 '''
 
 import cv2
+from latest_frame_capture import LatestFrameCapture    # Local module. See 'latest_frame_capture.py'.
 
 user_id     = "user-id"         # Change to match your camera setting
 user_pw     = "password"        # Change to match your camera setting
@@ -115,7 +119,9 @@ if __name__ == '__main__':
     [Abstract]
         main function
     '''
-    cap = cv2.VideoCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1")
+    # Receive video on a dedicated thread and always get the newest frame.
+    # Frames that arrive while the detection is running are grabbed but not retrieved (decode_on_demand).
+    cap = LatestFrameCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1", decode_on_demand=True)
 
     #
     windowInitialized = False
@@ -161,5 +167,6 @@ if __name__ == '__main__':
             print("KeyboardInterrupt")
             break
 
+    cap.print_stats()
     cap.release()
     cv2.destroyAllWindows()
@@ -31,22 +31,28 @@ limitations under the License.
 
 [Library install]
     cv2:    pip install opencv-python
+    numpy:  pip install numpy
 
 [OpenCV]
     Get the file "haarcascade_frontalface_alt2.xml" from the URL below.
     下記URLからファイル "haarcascade_frontalface_alt2.xml" を入手するしてください。
     https://github.com/opencv/opencv/tree/master/data/haarcascades
+
+[Note]
+    You need to save "shared_frame_ring.py" in the same location as this program.
 '''
 
 import cv2
 import multiprocessing as mp
 from queue import Empty
+from shared_frame_ring import SharedFrameRing     # Local module. See 'shared_frame_ring.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
 user_pw     = "password"        # Change to match your camera setting
 host        = "192.168.0.10"    # Change to match your camera setting
 winname     = "VIDEO"           # Window title
+frame_shape = (1080, 1920, 3)   # Max image size (height, width, depth). Change to match your camera setting
 
 # haarcascade file for opencv cascade classification.
 cascade_file = "haarcascade_frontalface_alt2.xml"       # face
@@ -105,24 +111,35 @@ def DetectFaces(cascade, image):
     return face_list
 
 
-def DetectFacesProcess(q1, q2):
+def DetectFacesProcess(q1, q2, demand, ring):
     '''
     [Abstract]
         Face detection process.
     [Param]
-        q1 :        [i] Queue to save the image to detect the face.
+        q1 :        [i] Queue to save the sequence number of the image to detect the face.
         q2 :        [o] Queue to save the result of face detection.
+        demand :    [o] Event set when this process is ready for the next image.
+                        次の画像を受け取れる時にセットするイベント。
+        ring :      [i] Image data. (shared memory)
     [Return]
         無し
     '''
     while True:
         try:
-            image = q1.get(True, 10)
+            # Request the next image from the main process.
+            demand.set()
+            seq = q1.get(True, 10)
+
+            # Termination check: If the value is -1, it ends.
+            if seq == -1:
+                break
 
-            # Termination check: If type(image) is "int" and the value is -1, it ends.
-            if type(image) == int:
-                if image == -1:
-                    break
+            # Get the image from shared memory without copying.
+            # The main process writes the next image only after this process requests it.
+            # メイン処理は本プロセスが要求した後にだけ次の画像を書き込むので、コピーせずに使う。
+            image = ring.get(seq)
+            if image is None:
+                continue
 
             # Face detection.
             face_list = DetectFaces(cascade, image)
@@ -131,6 +148,7 @@ def DetectFacesProcess(q1, q2):
         except Empty: # timeout of q1.get()
             print("Timeout happen.(3)")
 
+    ring.close()
     print("Finish DetectFacesProcess()")    
 
 
@@ -164,8 +182,13 @@ if __name__ == '__main__':
 
     q1 = mp.Queue()
     q2 = mp.Queue()
+    demand = mp.Event()
+
+    # The image is passed through shared memory, and q1 passes only the sequence number.
+    # 画像は共有メモリで渡し、q1 はシーケンス番号だけを渡す。
+    ring = SharedFrameRing(slots=3, max_shape=frame_shape)
 
-    p = mp.Process(target=DetectFacesProcess, args=(q1, q2))
+    p = mp.Process(target=DetectFacesProcess, args=(q1, q2, demand, ring))
     p.daemon = True
     p.start()
 
@@ -175,9 +198,11 @@ if __name__ == '__main__':
         try:
             ret, frame = cap.read()
             if ret == True:
-                # Pass the image to the face detection process.
-                if (q1.qsize() <= 1) and (q2.qsize() <= 1):
-                    q1.put(frame)
+                # Pass the image to the face detection process only when the process requests it.
+                # 顔検知プロセスが要求した時だけ画像を渡す。
+                if demand.is_set():
+                    demand.clear()
+                    q1.put(ring.put(frame))
 
                 # Receive results from face detection processing.
                 if q2.qsize() != 0:
@@ -217,6 +242,8 @@ if __name__ == '__main__':
     q1.put(-1)
     # Waiting for process p to finish
     p.join()
+    ring.close()
+    ring.unlink()
 
     print("Finish main()")
     cap.release()
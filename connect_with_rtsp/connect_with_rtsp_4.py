@@ -36,11 +36,15 @@ limitations under the License.
     ファイル保存の処理が追い付かなくなってバッファが満杯になり、
     ファイル保存が間引かれる場合があります。
 
+    You need to save "shared_frame_ring.py" in the same location as this program.
+    このプログラムと同じ場所に "shared_frame_ring.py" を保存してください。
+
 [Author]
     kinoshita hidetoshi (木下英俊)
 
 [Library install]
     cv2:    pip install opencv-python
+    numpy:  pip install numpy
 '''
 
 import cv2
@@ -48,6 +52,7 @@ import multiprocessing as mp
 from queue import Empty
 import os
 import datetime
+from shared_frame_ring import SharedFrameRing     # Local module. See 'shared_frame_ring.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -57,6 +62,7 @@ winname     = "VIDEO"           # Window title
 pathOut     = 'image'           # Image file save folder name
 queue_max   = 30                # Maximum number of queues
 save_max    = 100               # Number of files to save
+frame_shape = (1080, 1920, 3)   # Max image size (height, width, depth). Change to match your camera setting
 
 
 # Exception 定義
@@ -88,30 +94,37 @@ def IsWindowVisible(winname):
         return False
 
 
-def SaveImageProcess(imageQueue):
+def SaveImageProcess(imageQueue, ring):
     '''
     [Abstract]
         Image file save task
     [Param]
-        imageQueue :    [i] Queue to store images to save.
+        imageQueue :    [i] Queue to store sequence numbers of images to save.
+        ring :          [i] Image data. (shared memory)
     [Return]
         None
     '''
     while True:
         try:
-            image, filename = imageQueue.get(True, 10)  # timeout 10 sec.
+            seq, filename = imageQueue.get(True, 10)    # timeout 10 sec.
 
-            # Termination check: If type(image) is "int" and the value is -1, it ends.
-            if type(image) == int:
-                if image == -1:
-                    break
+            # Termination check: If the value is -1, it ends.
+            if seq == -1:
+                break
 
             # Save image file.
-            cv2.imwrite(filename, image)
+            # The image in shared memory is saved without copying.
+            image = ring.get(seq)
+            if image is not None:
+                cv2.imwrite(filename, image)
+            if not ring.is_valid(seq):
+                print(f"[ERROR] The image was overwritten before it was saved. {filename}")
 
         except Empty: # timeout of q1.get()
             print("Timeout happen.")
 
+    image = None
+    ring.close()
     print("Finish SaveImageProcess()")
 
 
@@ -130,7 +143,13 @@ if __name__ == '__main__':
     imageQueue = mp.Queue()
     starttime = datetime.datetime.now()
 
-    p = mp.Process(target=SaveImageProcess, args=(imageQueue,))
+    # The images are passed through shared memory, and imageQueue passes only sequence numbers.
+    # The ring has more slots than queue_max, so images waiting in imageQueue are not overwritten.
+    # 画像は共有メモリで渡し、imageQueue はシーケンス番号だけを渡す。
+    # リングのスロット数を queue_max より多くするので、imageQueue で待っている画像は上書きされない。
+    ring = SharedFrameRing(slots=queue_max + 2, max_shape=frame_shape)
+
+    p = mp.Process(target=SaveImageProcess, args=(imageQueue, ring))
     p.start()
 
     while True:
@@ -146,7 +165,7 @@ if __name__ == '__main__':
                         count += 1
                         filename = os.path.join(pathOut, 'image_{:06d}.jpg'.format(count))
                         print(filename)
-                        imageQueue.put([frame, filename])
+                        imageQueue.put([ring.put(frame), filename])
                         if count >= save_max:
                             break
 
@@ -179,6 +198,8 @@ if __name__ == '__main__':
     imageQueue.put([-1,-1])
     print("Wait for process p to finish")
     p.join()
+    ring.close()
+    ring.unlink()
     print("Finish main()")
 
     cap.release()
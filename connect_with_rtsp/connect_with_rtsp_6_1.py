@@ -66,6 +66,11 @@ class Application(tk.Frame):
         # Create canvas.
         self.canvas = tk.Canvas(self.master)
 
+        # Create one image item. disp_image() updates it in place instead of adding a new item for every frame.
+        # 画像アイテムを１つだけ作成する。disp_image() は毎フレーム新しいアイテムを追加せず、これを更新する。
+        self.photo_image = None
+        self.image_id = self.canvas.create_image(0, 0)
+
         # Add mouse click event to canvas.
         self.canvas.bind('<Button-1>', self.canvas_click)
 
@@ -124,14 +129,17 @@ class Application(tk.Frame):
             pil_image = ImageOps.pad(pil_image, (canvas_width, canvas_height))
 
             # (3) Convert image from PIL.Image to PhotoImage
-            self.photo_image = ImageTk.PhotoImage(image=pil_image)
+            # PhotoImage is created only when the size is changed. Otherwise the pixels are updated in place.
+            # PhotoImage はサイズが変わった時だけ作成し、それ以外は画素をその場で更新する。
+            if self.photo_image is None or (self.photo_image.width(), self.photo_image.height()) != pil_image.size:
+                self.photo_image = ImageTk.PhotoImage(image=pil_image)
+                self.canvas.itemconfig(self.image_id, image=self.photo_image)
+            else:
+                self.photo_image.paste(pil_image)
 
             # Display image on the canvas.
-            self.canvas.create_image(
-                canvas_width / 2,       # Image display position (center of the canvas)
-                canvas_height / 2,                   
-                image=self.photo_image  # image data
-                )
+            # Move the image item to the center of the canvas.
+            self.canvas.coords(self.image_id, canvas_width / 2, canvas_height / 2)
             
         else:
             print("cap.read() return False.")
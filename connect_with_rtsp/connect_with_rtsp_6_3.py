@@ -28,7 +28,7 @@ limitations under the License.
 
     BGR → RGB
     numpy.ndarray → PIL.Image → ImageTk.PhotoImage
-    (1) BGR → RGB
+    (1) Resize to the canvas size, BGR → RGB    (video receiving process)
     (2) numpy.ndarray → PIL.Image
     (3) PIL.Image → ImageTk.PhotoImage
     
@@ -38,6 +38,10 @@ limitations under the License.
 [Library install]
     cv2:    pip install opencv-python
     PIL :   pip install pillow
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "shared_frame_ring.py" and "frame_display_scheduler.py" in the same location as this program.
 '''
 
 import cv2
@@ -46,6 +50,8 @@ import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk, ImageOps
 import multiprocessing as mp
+from shared_frame_ring import SharedFrameRing     # Local module. See 'shared_frame_ring.py'.
+from frame_display_scheduler import FrameDisplayScheduler     # Local module. See 'frame_display_scheduler.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -53,6 +59,7 @@ user_pw     = "password"        # Change to match your camera setting
 host        = "192.168.0.10"    # Change to match your camera setting
 winname     = "VIDEO"           # Window title
 url         = f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1"
+frame_shape = (1080, 1920, 3)   # Max image size (height, width, depth). Change to match your camera setting
 
 
 class Application(tk.Frame):
@@ -85,111 +92,173 @@ class Application(tk.Frame):
         # Create canvas.
         self.canvas = tk.Canvas(self.master)
 
+        # Create one image item. disp_image() updates it in place instead of adding a new item for every frame.
+        # 画像アイテムを１つだけ作成する。disp_image() は毎フレーム新しいアイテムを追加せず、これを更新する。
+        self.photo_image = None
+        self.image_id = self.canvas.create_image(0, 0)
+
         # Add mouse click event to canvas.
         self.canvas.bind('<Button-1>', self.canvas_click)
 
+        # Add resize event to canvas.
+        self.canvas.bind('<Configure>', self.canvas_resize)
+
         # Place canvas.
         self.canvas.pack(expand = True, fill = tk.BOTH)
 
-        # Create image receiving process and queue
-        self.imageQueue = mp.Queue()
+        # Create image receiving process and pipe
+        # The images are passed through shared memory (self.ring), and the pipe passes only sequence numbers.
+        # 画像は共有メモリ (self.ring) で渡し、パイプはシーケンス番号だけを渡す。
+        self.ring = SharedFrameRing(slots=4, max_shape=frame_shape)
+        self.imageReceiver, self.imageSender = mp.Pipe(duplex=False)
         self.request = mp.Value('i', 0)     # -1 : Exit ReceiveImageProcess.
                                             #  0 : Normal.
                                             #  1 : Connect camera.
                                             #  2 : Release camera.
-        self.p = mp.Process(target=ReceiveImageProcess, args=(self.imageQueue, self.request))
+        self.canvas_size = mp.Array('i', [0, 0])   # Canvas size (width, height) for ReceiveImageProcess.
+        self.p = mp.Process(target=ReceiveImageProcess, args=(self.imageSender, self.ring, self.request, self.canvas_size))
         self.p.start()
 
-        # Raise a video display event (disp_image) after 500m
-        self.disp_id = self.after(500, self.disp_image)
+        # Call disp_image only when a new image arrives through the pipe.
+        # パイプで新しい画像が届いた時だけ disp_image を呼び出す。
+        self.scheduler = FrameDisplayScheduler(self, self.imageReceiver, self.disp_image, fps=30)
+        self.scheduler.start()
 
     def on_closing_window(self):
         ''' Window closing event. '''
 
         if messagebox.askokcancel("QUIT", "Do you want to quit?"):
             # Request terminate process self.p.
+            self.scheduler.stop()
             self.request.value = -1
 
             # Waiting for process p to finish
             time.sleep(1)
 
             # Flash buffer.
-            # The program cannot complete p.join() unless the imageQueue is emptied.
-            for i in range(self.imageQueue.qsize()):
-                pil_image = self.imageQueue.get()
+            # The program cannot complete p.join() unless the pipe is emptied.
+            self.scheduler.drain()
 
             # Wait for process p to be terminated.
             self.p.join()
+
+            # Free shared memory.
+            self.ring.close()
+            self.ring.unlink()
             self.master.destroy()
             print("Finish Application.")
 
     def canvas_click(self, event):
         ''' Event handling with mouse clicks on canvas '''
 
-        if self.disp_id is None:
+        if not self.scheduler.running:
             # Connect camera.
             self.request.value = 1
             # Display image.
-            self.disp_image()
+            self.scheduler.start()
 
         else:
             # Release camera.
             self.request.value = 2
-            # Cancel scheduling
-            self.after_cancel(self.disp_id)
-            self.disp_id = None
-
-    def disp_image(self):
-        ''' Display image on Canvas '''
-
-        # If there is data in the imageQueue, the program receives the data and displays the video.
-        num = self.imageQueue.qsize()
-        if num > 0:
-            if (num > 5):
-                num -= 1
-            for i in range(num):
-                cv_image = self.imageQueue.get()
-
-            # (2) Convert image from ndarray to PIL.Image.
-            pil_image = Image.fromarray(cv_image)
-
-            # Get canvas size.
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-
-            # Resize the image to the size of the canvas without changing the aspect ratio.
-            # アスペクトを維持したまま画像を Canvas と同じサイズにリサイズ
+            # Stop display. No CPU is used until the next click.
+            self.scheduler.stop()
+
+    def canvas_resize(self, event):
+        ''' Canvas resize event. Tell the new canvas size to the video receiving process. '''
+        with self.canvas_size.get_lock():
+            self.canvas_size[0] = event.width
+            self.canvas_size[1] = event.height
+
+    def disp_image(self, seq):
+        '''
+        Display image on Canvas.
+        FrameDisplayScheduler calls this function with the sequence number of the newest image.
+        '''
+
+        # Get the image from shared memory without copying.
+        cv_image = self.ring.get(seq)
+        if cv_image is None:
+            # The image has already been overwritten. Wait for the next image.
+            return
+
+        # (2) Convert image from ndarray to PIL.Image.
+        pil_image = Image.fromarray(cv_image)
+        cv_image = None
+        if not self.ring.is_valid(seq):
+            # The image was overwritten while it was converted. Wait for the next image.
+            return
+
+        # Get canvas size.
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+
+        # The video receiving process has already resized the image to the size of the canvas.
+        # Resize it here only while the canvas size is changing.
+        # 映像受信プロセスで Canvas と同じサイズにリサイズ済み。Canvas のサイズが変わった直後だけここでリサイズする。
+        if pil_image.size != (canvas_width, canvas_height):
             pil_image = ImageOps.pad(pil_image, (canvas_width, canvas_height))
 
-            # (3) Convert image from PIL.Image to PhotoImage
-            # PIL.Image から PhotoImage へ変換する
+        # (3) Convert image from PIL.Image to PhotoImage
+        # PhotoImage is created only when the size is changed. Otherwise the pixels are updated in place.
+        # PhotoImage はサイズが変わった時だけ作成し、それ以外は画素をその場で更新する。
+        if self.photo_image is None or (self.photo_image.width(), self.photo_image.height()) != pil_image.size:
             self.photo_image = ImageTk.PhotoImage(image=pil_image)
-
-            # Display image on the canvas.
-            self.canvas.create_image(
-                canvas_width / 2,       # Image display position (center of the canvas)
-                canvas_height / 2,                   
-                image=self.photo_image  # image data
-                )
-            
+            self.canvas.itemconfig(self.image_id, image=self.photo_image)
         else:
-            pass
+            self.photo_image.paste(pil_image)
+
+        # Display image on the canvas.
+        # Move the image item to the center of the canvas.
+        self.canvas.coords(self.image_id, canvas_width / 2, canvas_height / 2)
 
-        # Raise a video display event (disp_image) after 1ms.
-        self.disp_id = self.after(1, self.disp_image)
 
+def LetterboxImage(image, width, height, dst):
+    '''
+    Resize the image to fit (width, height) without changing the aspect ratio, convert it from BGR to RGB,
+    and write it to the center of dst. The margin is filled with black.
+    アスペクトを維持したまま画像を (width, height) に収まるようにリサイズし、BGR から RGB に変換して dst の中央に書き込む。
+    余白は黒で埋める。
 
-def ReceiveImageProcess(imageQueue, request):
+    Args:
+        image           [i] Image in OpenCV format. (BGR)
+        width           [i] Width of dst.
+        height          [i] Height of dst.
+        dst             [o] ndarray of (height, width, 3). (RGB)
+    Returns:
+        None
+    '''
+    h, w = image.shape[:2]
+    scale = min(width / w, height / h)
+    resized_width = max(1, round(w * scale))
+    resized_height = max(1, round(h * scale))
+    x = (width - resized_width) // 2
+    y = (height - resized_height) // 2
+
+    # Fill the margin with black.
+    dst[:y] = 0
+    dst[y + resized_height:] = 0
+    dst[y:y + resized_height, :x] = 0
+    dst[y:y + resized_height, x + resized_width:] = 0
+
+    # INTER_AREA is good for shrinking images.
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (resized_width, resized_height), interpolation=interpolation)
+    cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=dst[y:y + resized_height, x:x + resized_width])
+
+
+def ReceiveImageProcess(imageSender, ring, request, canvas_size):
     '''
     Receive Image Process.
 
     Args:
-        imageQueue      [o] This process stores the received image data in the imageQueue.
+        imageSender     [o] This process sends (sequence number, captured time) of the received image to the pipe.
+        ring            [o] This process stores the received image data in the ring. (shared memory)
         request         [i] Shared memory for receiving requests from the main process.
                             -1: Terminate process.
                              0: Nothing.
                              1: Connect camera.
                              2: Release camera connection.
+        canvas_size     [i] Shared memory of the canvas size (width, height) in the main process.
     Returns:
         None
     Raises
@@ -203,13 +272,24 @@ def ReceiveImageProcess(imageQueue, request):
         if cap != None:
             # Get frame.
             ret, frame = cap.read()
+            captured_time = time.time()
 
             if ret == True:
-                # (1) Convert image from BGR to RGB.
-                cv_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                if imageQueue.qsize() < 10:
-                    imageQueue.put(cv_image)
+                # (1) Resize the image to the canvas size and convert it from BGR to RGB.
+                # The result is written directly into shared memory.
+                # Resizing here keeps the GUI thread free and makes the image passed to the GUI smaller.
+                # 画像を Canvas のサイズにリサイズし、BGR から RGB に変換する。変換結果は共有メモリに直接書き込む。
+                # ここでリサイズすることで GUI スレッドの負荷を減らし、GUI に渡す画像も小さくなる。
+                width, height = canvas_size[:]
+                if width > 1 and height > 1 and width * height < frame.shape[0] * frame.shape[1]:
+                    LetterboxImage(frame, width, height, ring.begin_put((height, width, 3)))
+                else:
+                    # The canvas is not ready or larger than the image. Pass the image without resizing.
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=ring.begin_put(frame.shape))
+                seq = ring.end_put()
+
+                # Notify the GUI process. The GUI process displays only the newest image.
+                imageSender.send((seq, captured_time))
 
             else:
                 print("cap.read() return False.")
@@ -241,6 +321,7 @@ def ReceiveImageProcess(imageQueue, request):
             cap = None
             request.value = 0
 
+    ring.close()
     print("Terminate SaveImageProcess().")
 
 
@@ -29,6 +29,10 @@ limitations under the License.
 [Library install]
     cv2 :   pip install opencv-python
     PIL :   pip install pillow
+    numpy:  pip install numpy
+
+[Note]
+    You need to save "shared_frame_ring.py" and "frame_display_scheduler.py" in the same location as this program.
 '''
 
 import cv2
@@ -39,6 +43,8 @@ from PIL import Image, ImageTk, ImageOps
 import multiprocessing as mp
 from queue import Empty
 from classification_vgg import ImagenetClassificationVgg    # Local module. See 'classification_vgg.py'.
+from shared_frame_ring import SharedFrameRing               # Local module. See 'shared_frame_ring.py'.
+from frame_display_scheduler import FrameDisplayScheduler   # Local module. See 'frame_display_scheduler.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -46,6 +52,7 @@ user_pw     = "password"        # Change to match your camera setting
 host        = "192.168.0.10"    # Change to match your camera setting
 winname     = "VIDEO"           # Window title
 url         = f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1"
+frame_shape = (1080, 1920, 3)   # Max image size (height, width, depth). Change to match your camera setting
 
 
 class Application(tk.Frame):
@@ -93,37 +100,56 @@ class Application(tk.Frame):
         # Create canvas.
         self.canvas = tk.Canvas(self.master)
 
+        # Create one image item. disp_image() updates it in place instead of adding a new item for every frame.
+        # 画像アイテムを１つだけ作成する。disp_image() は毎フレーム新しいアイテムを追加せず、これを更新する。
+        self.photo_image = None
+        self.image_id = self.canvas.create_image(0, 0)
+
         # Add mouse click event to canvas.
         self.canvas.bind('<Button-1>', self.canvas_click)
 
+        # Add resize event to canvas.
+        self.canvas.bind('<Configure>', self.canvas_resize)
+
         # Place canvas.
         self.canvas.pack(expand = True, fill = tk.BOTH)
 
-        # Create queue and value for image receive process.
-        self.imageQueue = mp.Queue()
+        # Create pipe and value for image receive process.
+        # The images are passed through shared memory (self.ring, self.ring2), and the pipe and queue pass only sequence numbers.
+        # 画像は共有メモリ (self.ring, self.ring2) で渡し、パイプとキューはシーケンス番号だけを渡す。
+        self.ring = SharedFrameRing(slots=4, max_shape=frame_shape)     # for display.
+        self.ring2 = SharedFrameRing(slots=3, max_shape=frame_shape)    # for image classification.
+        self.imageReceiver, self.imageSender = mp.Pipe(duplex=False)
         self.request = mp.Value('i', 0)     # -1 : Exit ReceiveImageProcess.
                                             #  0 : Normal.
                                             #  1 : Connect camera.
                                             #  2 : Release camera.
+        self.canvas_size = mp.Array('i', [0, 0])   # Canvas size (width, height) for ReceiveImageProcess.
 
-        # Create queue for classification process.
+        # Create queue and pipe for classification process.
         self.imageQueue2 = mp.Queue()
-        self.resultQueue = mp.Queue()
+        self.resultReceiver, self.resultSender = mp.Pipe(duplex=False)
 
         # Create processes.
-        self.imageReceiveProcess = mp.Process(target=ReceiveImageProcess, args=(self.imageQueue, self.imageQueue2, self.request))
-        self.classificationProcess = mp.Process(target=ImageClassificationProcess, args=(self.imageQueue2, self.resultQueue))
+        self.imageReceiveProcess = mp.Process(target=ReceiveImageProcess, args=(self.imageSender, self.imageQueue2, self.ring, self.ring2, self.request, self.canvas_size))
+        self.classificationProcess = mp.Process(target=ImageClassificationProcess, args=(self.imageQueue2, self.ring2, self.resultSender))
         self.imageReceiveProcess.start()
         self.classificationProcess.start()
 
-        # Raise a video display event (disp_image) after 500m
-        self.disp_id = self.after(500, self.disp_image)
+        # Call disp_image (disp_result) only when a new image (result) arrives through the pipe.
+        # パイプで新しい画像（結果）が届いた時だけ disp_image (disp_result) を呼び出す。
+        self.scheduler = FrameDisplayScheduler(self, self.imageReceiver, self.disp_image, fps=30)
+        self.resultScheduler = FrameDisplayScheduler(self, self.resultReceiver, self.disp_result, fps=10, stats_interval=0)
+        self.scheduler.start()
+        self.resultScheduler.start()
 
     def on_closing_window(self):
         ''' Window closing event. '''
 
         if messagebox.askokcancel("QUIT", "Do you want to quit?"):
             # Request terminate process.
+            self.scheduler.stop()
+            self.resultScheduler.stop()
             self.request.value = -1
             self.imageQueue2.put(-1)
 
@@ -132,95 +158,145 @@ class Application(tk.Frame):
 
             # Flash queue.
             # The program cannot complete processes unless the queue is emptied.
-            for i in range(self.imageQueue.qsize()):
-                image = self.imageQueue.get()
+            self.scheduler.drain()
             for i in range(self.imageQueue2.qsize()):
                 image = self.imageQueue2.get()
-            for i in range(self.resultQueue.qsize()):
-                result = self.resultQueue.get()
+            self.resultScheduler.drain()
 
             # Wait for process to be terminated.
             self.imageReceiveProcess.join()
             self.classificationProcess.join()
+
+            # Free shared memory.
+            self.ring.close()
+            self.ring.unlink()
+            self.ring2.close()
+            self.ring2.unlink()
             self.master.destroy()
             print("Finish Application.")
 
     def canvas_click(self, event):
         ''' Event handling with mouse clicks on canvas '''
 
-        if self.disp_id is None:
+        if not self.scheduler.running:
             # Connect camera.
             self.request.value = 1
             # Display image.
-            self.disp_image()
+            self.scheduler.start()
 
         else:
             # Release camera.
             self.request.value = 2
-            # Cancel scheduling
-            self.after_cancel(self.disp_id)
-            self.disp_id = None
-
-    def disp_image(self):
-        ''' Display image on Canvas '''
-
-        # If there is data in the imageQueue, the program receives the data and displays the video.
-        num = self.imageQueue.qsize()
-        if num > 0:
-            if (num > 5):
-                num -= 1
-            for i in range(num):
-                cv_image = self.imageQueue.get()
-
-            # (2) Convert image from ndarray to PIL.Image.
-            pil_image = Image.fromarray(cv_image)
-
-            # Get canvas size.
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
-
-            # Resize the image to the size of the canvas without changing the aspect ratio.
-            # アスペクトを維持したまま画像を Canvas と同じサイズにリサイズ
+            # Stop display. No CPU is used until the next click.
+            self.scheduler.stop()
+
+    def canvas_resize(self, event):
+        ''' Canvas resize event. Tell the new canvas size to the image receiving process. '''
+        with self.canvas_size.get_lock():
+            self.canvas_size[0] = event.width
+            self.canvas_size[1] = event.height
+
+    def disp_image(self, seq):
+        '''
+        Display image on Canvas.
+        FrameDisplayScheduler calls this function with the sequence number of the newest image.
+        '''
+
+        # (2) Convert image from ndarray to PIL.Image.
+        # The image in shared memory is used without copying, and checked after the conversion.
+        # 共有メモリ上の画像をコピーせずに使い、変換後に上書きされていないか確認する。
+        cv_image = self.ring.get(seq)
+        if cv_image is None:
+            return
+        pil_image = Image.fromarray(cv_image)
+        cv_image = None
+        if not self.ring.is_valid(seq):
+            # The image was overwritten while it was converted.
+            return
+
+        # Get canvas size.
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+
+        # The image receiving process has already resized the image to the size of the canvas.
+        # Resize it here only while the canvas size is changing.
+        # 画像受信プロセスで Canvas と同じサイズにリサイズ済み。Canvas のサイズが変わった直後だけここでリサイズする。
+        if pil_image.size != (canvas_width, canvas_height):
             pil_image = ImageOps.pad(pil_image, (canvas_width, canvas_height))
 
-            # (3) Convert image from PIL.Image to PhotoImage
-            # PIL.Image から PhotoImage へ変換する
+        # (3) Convert image from PIL.Image to PhotoImage
+        # PhotoImage is created only when the size is changed. Otherwise the pixels are updated in place.
+        # PhotoImage はサイズが変わった時だけ作成し、それ以外は画素をその場で更新する。
+        if self.photo_image is None or (self.photo_image.width(), self.photo_image.height()) != pil_image.size:
             self.photo_image = ImageTk.PhotoImage(image=pil_image)
-
-            # Display image on the canvas.
-            self.canvas.create_image(
-                canvas_width / 2,       # Image display position (center of the canvas)
-                canvas_height / 2,                   
-                image=self.photo_image  # image data
-                )
+            self.canvas.itemconfig(self.image_id, image=self.photo_image)
         else:
-            pass
-
-        # Update GUI Label.
-        result_num = self.resultQueue.qsize()
-        if result_num > 0:
-            for i in range(result_num):
-                label, score = self.resultQueue.get()
-            self.class_text.set(label)
-            score = '{:.4f}'.format(score)
-            self.score_text.set(score)
-            
-        # Raise a video display event (disp_image) after 1ms.
-        self.disp_id = self.after(1, self.disp_image)
-
-
-def ReceiveImageProcess(imageQueue, imageQueue2, request):
+            self.photo_image.paste(pil_image)
+
+        # Display image on the canvas.
+        # Move the image item to the center of the canvas.
+        self.canvas.coords(self.image_id, canvas_width / 2, canvas_height / 2)
+
+    def disp_result(self, result):
+        '''
+        Update GUI Label.
+        FrameDisplayScheduler calls this function with the newest classification result.
+        '''
+        label, score = result
+        self.class_text.set(label)
+        score = '{:.4f}'.format(score)
+        self.score_text.set(score)
+
+
+def LetterboxImage(image, width, height, dst):
+    '''
+    Resize the image to fit (width, height) without changing the aspect ratio, convert it from BGR to RGB,
+    and write it to the center of dst. The margin is filled with black.
+    アスペクトを維持したまま画像を (width, height) に収まるようにリサイズし、BGR から RGB に変換して dst の中央に書き込む。
+    余白は黒で埋める。
+
+    Args:
+        image           [i] Image in OpenCV format. (BGR)
+        width           [i] Width of dst.
+        height          [i] Height of dst.
+        dst             [o] ndarray of (height, width, 3). (RGB)
+    Returns:
+        None
+    '''
+    h, w = image.shape[:2]
+    scale = min(width / w, height / h)
+    resized_width = max(1, round(w * scale))
+    resized_height = max(1, round(h * scale))
+    x = (width - resized_width) // 2
+    y = (height - resized_height) // 2
+
+    # Fill the margin with black.
+    dst[:y] = 0
+    dst[y + resized_height:] = 0
+    dst[y:y + resized_height, :x] = 0
+    dst[y:y + resized_height, x + resized_width:] = 0
+
+    # INTER_AREA is good for shrinking images.
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (resized_width, resized_height), interpolation=interpolation)
+    cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=dst[y:y + resized_height, x:x + resized_width])
+
+
+def ReceiveImageProcess(imageSender, imageQueue2, ring, ring2, request, canvas_size):
     '''
     Receive Image Process.
 
     Args:
-        imageQueue      [o] Image data for display.
-        imageQueue2     [o] Image data for image classification.
+        imageSender     [o] (Sequence number, captured time) of the image for display. (pipe)
+        imageQueue2     [o] (Sequence number, captured time) of the image for image classification.
+        ring            [o] Image data for display. (shared memory)
+        ring2           [o] Image data for image classification. (shared memory)
         request         [i] Shared memory for receiving requests from the main process.
                             -1: Terminate process.
                              0: Nothing.
                              1: Connect camera.
                              2: Release camera connection.
+        canvas_size     [i] Shared memory of the canvas size (width, height) in the main process.
     Returns:
         None
     Raises
@@ -234,18 +310,28 @@ def ReceiveImageProcess(imageQueue, imageQueue2, request):
         if cap != None:
             # Get frame.
             ret, frame = cap.read()
+            captured_time = time.time()
 
             if ret == True:
                 # (1) Convert image from BGR to RGB.
-                cv_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # The result is written directly into shared memory.
 
                 # for display.
-                if imageQueue.qsize() < 10:
-                    imageQueue.put(cv_image)
+                # Resize the image to the canvas size here to keep the GUI thread free.
+                # The GUI process displays only the newest image.
+                # GUI スレッドの負荷を減らすため、ここで画像を Canvas のサイズにリサイズする。
+                # GUI プロセスは最新の画像だけを表示する。
+                width, height = canvas_size[:]
+                if width > 1 and height > 1 and width * height < frame.shape[0] * frame.shape[1]:
+                    LetterboxImage(frame, width, height, ring.begin_put((height, width, 3)))
+                else:
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=ring.begin_put(frame.shape))
+                imageSender.send((ring.end_put(), captured_time))
                 
                 # for image classification.
                 if imageQueue2.qsize() <= 1:
-                    imageQueue2.put(cv_image)
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=ring2.begin_put(frame.shape))
+                    imageQueue2.put((ring2.end_put(), captured_time))
 
             else:
                 print("cap.read() return False.")
@@ -277,16 +363,19 @@ def ReceiveImageProcess(imageQueue, imageQueue2, request):
             cap = None
             request.value = 0
 
+    ring.close()
+    ring2.close()
     print("Terminate ReceiveImageProcess().")
 
 
-def ImageClassificationProcess(imageQueue, resultQueue):
+def ImageClassificationProcess(imageQueue, ring, resultSender):
     '''
     Image classification process.
 
     Args:
-        imageQueue :        [i] Image for image classification.
-        resultQueue :       [o] Save classification result labels and scores.
+        imageQueue :        [i] (Sequence number, captured time) of the image for image classification.
+        ring :              [i] Image data. (shared memory)
+        resultSender :      [o] Send ((label, score), captured time) of the classification result. (pipe)
     Returns:
         None
     '''
@@ -294,12 +383,19 @@ def ImageClassificationProcess(imageQueue, resultQueue):
 
     while True:
         try:
-            image = imageQueue.get(True, 10)
+            item = imageQueue.get(True, 10)
+
+            # If item is -1, then this process is terminated.
+            if item == -1:
+                break
+            seq, captured_time = item
 
-            # If type(image) is 'int' and image is -1, then this process is terminated.
-            if type(image) == int:
-                if image == -1:
-                    break
+            # Copy the image from shared memory, because classification takes a long time.
+            # 分類には時間がかかるので、共有メモリから画像をコピーする。
+            image = ring.get(seq, copy=True)
+            if image is None:
+                # The image was overwritten. Wait for the next image.
+                continue
 
             # Image classification
             pilImage = Image.fromarray(image)   # convert from OpenCV image to PIL.Image
@@ -307,14 +403,15 @@ def ImageClassificationProcess(imageQueue, resultQueue):
 
             if score > 0.15:
                 print(result, score)
-                resultQueue.put((result, score))
+                resultSender.send(((result, score), captured_time))
             else:
                 print('None')
-                resultQueue.put(('None', 0.0))
+                resultSender.send((('None', 0.0), captured_time))
 
         except Empty: # timeout of imageQueue.get()
             print("Timeout happen.(3)")
 
+    ring.close()
     print("Finish ImageClassificationProcess()")    
 
 
@@ -33,11 +33,15 @@ limitations under the License.
     numpy :         pip install numpy
     PIL :           pip install pillow
     json :          Built-in module in Python, you don’t need to install it with pip.
+
+[Note]
+    You need to save "latest_frame_capture.py" in the same location as this program.
 '''
 
 import cv2
 from PIL import Image
 from classification_vgg import ImagenetClassificationVgg    # Local module. See 'classification_vgg.py'.
+from latest_frame_capture import LatestFrameCapture    # Local module. See 'latest_frame_capture.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -102,8 +106,9 @@ if __name__ == '__main__':
     # Create an instance of class ImagenetClassificationVgg.
     imagenetClassifigationVgg = ImagenetClassificationVgg('./data/imagenet_class_index.json')
 
-    # Create an instance of class cv2.VideoCapture
-    cap = cv2.VideoCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1")
+    # Receive video on a dedicated thread and always get the newest frame.
+    # Frames that arrive while the image classification is running are grabbed but not retrieved (decode_on_demand).
+    cap = LatestFrameCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1", decode_on_demand=True)
 
     # 
     windowInitialized = False
@@ -157,5 +162,6 @@ if __name__ == '__main__':
             break
 
     print("Finish main()")
+    cap.print_stats()
     cap.release()
     cv2.destroyAllWindows()
@@ -34,6 +34,9 @@ limitations under the License.
     PIL :           pip install pillow
     json, multiprocessing, queue :
                     Built-in module in Python, you don’t need to install it with pip.
+
+[Note]
+    You need to save "latest_frame_capture.py" in the same location as this program.
 '''
 
 import cv2
@@ -41,6 +44,7 @@ import multiprocessing as mp
 from queue import Empty
 from PIL import Image
 from classification_vgg import ImagenetClassificationVgg    # Local module. See 'classification_vgg.py'.
+from latest_frame_capture import LatestFrameCapture    # Local module. See 'latest_frame_capture.py'.
 
 
 user_id     = "user-id"         # Change to match your camera setting
@@ -139,8 +143,8 @@ def ImageClassificationProcess(q):
     __main__
 '''
 if __name__ == '__main__':
-    # Create an instance of class cv2.VideoCapture
-    cap = cv2.VideoCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1")
+    # Receive video on a dedicated thread and always get the newest frame.
+    cap = LatestFrameCapture(f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1")
 
     #
     windowInitialized = False
@@ -199,5 +203,6 @@ if __name__ == '__main__':
     p.join()
 
     print("Finish main()")
+    cap.print_stats()
     cap.release()
     cv2.destroyAllWindows()
@@ -0,0 +1,199 @@
+'''
+Copyright 2022 i-PRO Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''
+[Abstract]
+    Receive video with cv2.VideoCapture on a dedicated thread and keep only the newest frame.
+    専用スレッドで cv2.VideoCapture から映像を受信し、最新のフレームだけを保持します。
+
+[Details]
+    If cap.read() is called in the same loop as slow processing (face detection, AI, etc.),
+    the internal buffer of OpenCV fills up and the displayed video falls seconds behind the live video.
+    LatestFrameCapture reads frames continuously on a dedicated thread, and read() always returns the newest frame.
+    Frames that were not read by the consumer are discarded and counted as dropped frames.
+
+    If decode_on_demand is True, the thread calls cap.grab() for every frame and cap.retrieve() only
+    while the consumer is waiting in read(). Frames that nobody asked for are not converted to images.
+
+    cap.read() を遅い処理（顔検知、AI など）と同じループで呼び出すと、OpenCV の内部バッファが溜まり、
+    表示する映像がライブ映像より数秒遅れてしまいます。
+    LatestFrameCapture は専用スレッドでフレームを読み続け、read() は常に最新のフレームを返します。
+    利用側が読まなかったフレームは破棄し、ドロップしたフレームとして数えます。
+
+    decode_on_demand が True の場合、スレッドは全フレームで cap.grab() を呼び、利用側が read() で
+    待っている間だけ cap.retrieve() を呼びます。誰も要求していないフレームは画像に変換しません。
+
+    Usage:
+        cap = LatestFrameCapture(url)
+        while True:
+            ret, frame = cap.read()
+            ...
+        cap.release()
+
+[Author]
+    kinoshita hidetoshi (木下英俊)
+
+[Library install]
+    cv2:    pip install opencv-python
+'''
+
+import cv2
+import threading
+import time
+
+
+class LatestFrameCapture():
+    '''
+    cv2.VideoCapture that always returns the newest frame.
+    常に最新のフレームを返す cv2.VideoCapture。
+    '''
+
+    def __init__(self, url, reconnect_wait=1.0, decode_on_demand=False):
+        '''
+        Constructor
+
+        Args:
+            url             [i] URL of the video stream. (RTSP, MJPEG, etc.)
+            reconnect_wait  [i] Wait time [sec] before reconnecting when cap.read() fails.
+            decode_on_demand [i] True:  Call cap.retrieve() only for frames requested by read().
+                                 False: Call cap.read() for every frame.
+        '''
+        self.url = url
+        self.reconnect_wait = reconnect_wait
+        self.decode_on_demand = decode_on_demand
+
+        # Information of the frame returned by the last read().
+        self.frame_seq = 0          # Sequence number. (1, 2, 3, ...)
+        self.frame_time = 0.0       # Capture time. (time.time())
+
+        # Statistics.
+        self.captured = 0           # Number of frames received from the camera.
+        self.delivered = 0          # Number of frames returned by read().
+        self.dropped = 0            # Number of frames discarded without being read.
+        self.skipped = 0            # Number of frames grabbed but not retrieved. (decode_on_demand only)
+        self.latency_sum = 0.0      # Sum of end-to-end latency [sec].
+        self.latency_max = 0.0      # Max end-to-end latency [sec].
+
+        self._frame = None
+        self._seq = 0
+        self._time = 0.0
+        self._waiting = 0           # Number of read() calls waiting for a frame. (demand signal)
+        self._condition = threading.Condition()
+        self._running = True
+
+        self.cap = cv2.VideoCapture(url)
+        self._thread = threading.Thread(target=self._capture_thread, daemon=True)
+        self._thread.start()
+
+    def isOpened(self):
+        ''' Same as cv2.VideoCapture.isOpened(). '''
+        return self.cap.isOpened()
+
+    def read(self, timeout=10.0):
+        '''
+        Wait for a frame newer than the last one and return it.
+        前回より新しいフレームを待って返す。
+
+        The end-to-end latency of the previous frame (from capture to the next call of read())
+        is recorded when this function is called.
+        前回のフレームのエンドツーエンド遅延（受信から次に read() を呼ぶまで）をこの関数の呼び出し時に記録する。
+
+        Args:
+            timeout         [i] Timeout [sec].
+        Returns:
+            ret             True:   success
+                            False:  timeout or released.
+            frame           Image in OpenCV format. If ret is False, it will be None.
+        '''
+        now = time.time()
+        if self.frame_seq > 0:
+            latency = now - self.frame_time
+            self.latency_sum += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+
+        with self._condition:
+            self._waiting += 1
+            try:
+                ready = self._condition.wait_for(lambda: self._seq > self.frame_seq or not self._running, timeout)
+            finally:
+                self._waiting -= 1
+            if not ready:
+                return False, None
+            if self._frame is None:
+                return False, None
+
+            frame = self._frame
+            self.frame_seq = self._seq
+            self.frame_time = self._time
+            self._frame = None
+            self.delivered += 1
+
+        return True, frame
+
+    @property
+    def latency_avg(self):
+        ''' Average end-to-end latency [sec]. '''
+        count = self.delivered - 1 if self.delivered > 1 else 1
+        return self.latency_sum / count
+
+    def print_stats(self):
+        ''' Print statistics. '''
+        print(f"captured = {self.captured}, delivered = {self.delivered}, dropped = {self.dropped}, skipped = {self.skipped}, "
+              f"latency avg = {self.latency_avg*1000:.1f} ms, max = {self.latency_max*1000:.1f} ms")
+
+    def release(self):
+        ''' Stop the thread and release the camera. '''
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        self.cap.release()
+
+    def _capture_thread(self):
+        ''' Read frames continuously and keep only the newest one. '''
+        while self._running:
+            if self.decode_on_demand:
+                ret = self.cap.grab()
+                if ret == True and (self._waiting == 0 or self._frame is not None):
+                    # Nobody is waiting for this frame. Do not retrieve it.
+                    self.captured += 1
+                    self.skipped += 1
+                    continue
+                if ret == True:
+                    ret, frame = self.cap.retrieve()
+            else:
+                ret, frame = self.cap.read()
+
+            if ret == True:
+                with self._condition:
+                    if self._frame is not None:
+                        # The previous frame was not read.
+                        self.dropped += 1
+                    self._frame = frame
+                    self._seq += 1
+                    self._time = time.time()
+                    self.captured += 1
+                    self._condition.notify_all()
+
+            else:
+                print("cap.read() return False.")
+                time.sleep(self.reconnect_wait)
+
+                # Reconnect
+                self.cap.release()
+                if self._running:
+                    self.cap = cv2.VideoCapture(self.url)
@@ -32,6 +32,9 @@ limitations under the License.
 [Library install]
     cv2:        pip install opencv-python
     pytorch:    pip install torch torchvision torchaudio
+
+[Note]
+    You need to save "latest_frame_capture.py" in the same location as this program.
 '''
 
 import cv2
@@ -39,6 +42,7 @@ import torch
 from torchvision.models.detection import ssdlite320_mobilenet_v3_large, SSDLite320_MobileNet_V3_Large_Weights
 from torchvision.transforms.functional import convert_image_dtype
 from torchvision import transforms
+from latest_frame_capture import LatestFrameCapture    # Local module. See 'latest_frame_capture.py'.
 
 
 # Initialize variables.
@@ -60,7 +64,9 @@ preprocess = weights.transforms()
 # Capture from camera.
 url = f"rtsp://{user_id}:{user_pw}@{host}/MediaInput/stream_1"  # H.264/H.265
 #url = f"http://{user_id}:{user_pw}@{host}/cgi-bin/nphMotionJpeg?Resolution={resolution}&Quality=Standard&Framerate={framerate}"    # MJPEG
-cap = cv2.VideoCapture(url)
+# Receive video on a dedicated thread and always get the newest frame.
+# Frames that arrive while the detection is running are grabbed but not retrieved (decode_on_demand).
+cap = LatestFrameCapture(url, decode_on_demand=True)
 
 # Exception definition.
 BackendError = type('BackendError', (Exception,), {})
@@ -147,5 +153,6 @@ while True:
     if not IsWindowVisible(winname):
         break
 
+cap.print_stats()
 cap.release()
 cv2.destroyAllWindows()
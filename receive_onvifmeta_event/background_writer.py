@@ -0,0 +1,167 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# バックグラウンドファイル書き込み
+# Background File Writer
+#
+#   ファイルの作成・書き込み・クローズを専用スレッドで行い、受信処理がディスクI/Oで止まらないようにする
+#       * 書き込み中は "ファイル名.part" に書き、クローズ時に名前を変更するので、書きかけのファイルは残らない
+#       * 書き込み待ちのデータが上限を超えた場合は、そのファイルを破棄する (受信処理を止めない)
+#   Create, write and close files on a dedicated thread, so the receive loop never stalls on disk I/O.
+#       * Data is written to "filename.part" and renamed on close, so no partially written file is left.
+#       * If the data waiting to be written exceeds the limit, the file is dropped instead of blocking the receiver.
+#
+#   Usage:
+#       writer = BackgroundFileWriter()
+#       handle = writer.open("image/a.jpg")
+#       writer.write(handle, data)
+#       writer.close(handle)        # writer.abort(handle) で破棄
+#       ...
+#       writer.stop()
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import os
+import queue
+import threading
+
+
+##########
+#   書き込み中のファイル
+##########
+class _FileHandle:
+    def __init__(self, path):
+        self.path = path
+        self.dropped = False        # True : 書き込み待ちの上限を超えたので破棄した
+        self.fd = None              # 書き込みスレッドのみが使用する
+
+
+##########
+#   バックグラウンドファイル書き込み
+#
+#   Note:
+#       max_pending_bytes : 書き込み待ちデータの上限 [byte]
+##########
+class BackgroundFileWriter:
+    def __init__(self, max_pending_bytes=64 * 1024 * 1024):
+        self.max_pending_bytes = max_pending_bytes
+
+        # 統計情報
+        self.written = 0            # 保存したファイル数
+        self.dropped = 0            # 書き込み待ちの上限を超えて破棄したファイル数
+        self.errors = 0             # 書き込みエラー数
+
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    ##########
+    #   ファイルを開く (実際に開くのは書き込みスレッド)
+    #
+    #   Note:
+    #       戻り値 : write(), close(), abort() に渡すハンドル
+    ##########
+    def open(self, path):
+        handle = _FileHandle(path)
+        self._queue.put(("open", handle, None))
+        return handle
+
+    ##########
+    #   データを書き込む
+    #
+    #   Note:
+    #       data : bytes (書き込みスレッドに渡すので、呼び出し後に変更しないこと)
+    ##########
+    def write(self, handle, data):
+        if (handle.dropped):
+            return
+        with self._lock:
+            if (self._pending_bytes + len(data) > self.max_pending_bytes):
+                # ディスクが追いつかないので、このファイルは破棄する
+                handle.dropped = True
+                self.dropped += 1
+            else:
+                self._pending_bytes += len(data)
+        if (handle.dropped):
+            self._queue.put(("abort", handle, None))
+        else:
+            self._queue.put(("write", handle, data))
+
+    ##########
+    #   ファイルを閉じる
+    ##########
+    def close(self, handle):
+        if (not handle.dropped):
+            self._queue.put(("close", handle, None))
+
+    ##########
+    #   書きかけのファイルを破棄する
+    ##########
+    def abort(self, handle):
+        if (not handle.dropped):
+            handle.dropped = True
+            self._queue.put(("abort", handle, None))
+
+    ##########
+    #   書き込み待ちのデータを全て書き込んでからスレッドを終了する
+    ##########
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    @property
+    def pending_bytes(self):
+        return self._pending_bytes
+
+    ##########
+    #   書き込みスレッド
+    ##########
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if (item is None):
+                break
+            command, handle, data = item
+            try:
+                if (command == "open"):
+                    handle.fd = open(handle.path + ".part", "wb")
+                elif (command == "write"):
+                    with self._lock:
+                        self._pending_bytes -= len(data)
+                    if (handle.fd is not None):
+                        handle.fd.write(data)
+                elif (command == "close"):
+                    if (handle.fd is not None):
+                        handle.fd.close()
+                        handle.fd = None
+                        os.replace(handle.path + ".part", handle.path)
+                        self.written += 1
+                elif (command == "abort"):
+                    if (handle.fd is not None):
+                        handle.fd.close()
+                        handle.fd = None
+                        os.remove(handle.path + ".part")
+            except OSError as e:
+                print(f"write error : {handle.path} : {e}")
+                self.errors += 1
+                if (handle.fd is not None):
+                    handle.fd.close()
+                    handle.fd = None
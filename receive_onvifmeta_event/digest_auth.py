@@ -0,0 +1,106 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# Digest認証
+# Digest Authentication
+#
+#   401応答の challenge (WWW-Authenticate) をキャッシュし、Authorization ヘッダをローカルで計算する
+#   Cache the challenge (WWW-Authenticate) of the 401 response, and calculate the Authorization header locally.
+#
+#   Usage:
+#       auth = DigestAuth(user, password)
+#       auth.update_challenge(response.headers["WWW-Authenticate"])     # 401応答を受信した時
+#       header = auth.build_header("GET", "/cgi-bin/getinfo?FILE=1")
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import hashlib
+import re
+import secrets
+
+# "algorithm" パラメータのハッシュ関数
+DIGEST_ALGORITHMS = {
+    "MD5":      hashlib.md5,
+    "SHA-256":  hashlib.sha256,
+}
+
+
+##########
+#   Digest認証
+##########
+class DigestAuth:
+    def __init__(self, user, password):
+        self.user = user
+        self.password = password
+        self.challenge = None       # "WWW-Authenticate" のパラメータ
+        self.nc = 0                 # nonce count
+
+    ##########
+    #   401応答の challenge をキャッシュする
+    #
+    #   Note:
+    #       www_authenticate : "WWW-Authenticate" ヘッダの値
+    #       戻り値 : True : 成功  False : Digest ではない
+    ##########
+    def update_challenge(self, www_authenticate):
+        if (not www_authenticate or not www_authenticate.lower().startswith("digest ")):
+            return False
+        params = {}
+        for name, quoted, token in re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', www_authenticate[7:]):
+            params[name.lower()] = quoted if quoted else token
+        self.challenge = params
+        self.nc = 0
+        return True
+
+    ##########
+    #   Authorization ヘッダを作成する
+    #
+    #   Note:
+    #       method : HTTPメソッド (例 "GET")
+    #       uri : リクエストのパスとクエリ (例 "/cgi-bin/getinfo?FILE=1")
+    #       戻り値 : "Authorization" ヘッダの値  challenge がない場合は None
+    ##########
+    def build_header(self, method, uri):
+        if (self.challenge is None):
+            return None
+
+        algorithm = self.challenge.get("algorithm", "MD5")
+        hash_func = DIGEST_ALGORITHMS.get(algorithm.upper(), hashlib.md5)
+        H = lambda text: hash_func(text.encode()).hexdigest()
+
+        realm = self.challenge.get("realm", "")
+        nonce = self.challenge.get("nonce", "")
+        ha1 = H(f"{self.user}:{realm}:{self.password}")
+        ha2 = H(f"{method}:{uri}")
+
+        header = f'Digest username="{self.user}", realm="{realm}", nonce="{nonce}", uri="{uri}", algorithm={algorithm}'
+        qop = self.challenge.get("qop")
+        if (qop is not None and "auth" in [q.strip() for q in qop.split(",")]):
+            self.nc += 1
+            nc = f"{self.nc:08x}"
+            cnonce = secrets.token_hex(8)
+            response = H(f"{ha1}:{nonce}:{nc}:{cnonce}:auth:{ha2}")
+            header += f', qop=auth, nc={nc}, cnonce="{cnonce}"'
+        else:
+            response = H(f"{ha1}:{nonce}:{ha2}")
+        header += f', response="{response}"'
+
+        if ("opaque" in self.challenge):
+            header += f', opaque="{self.challenge["opaque"]}"'
+        return header
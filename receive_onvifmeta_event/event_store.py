@@ -0,0 +1,381 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# ONVIFメタデータ イベントストア
+# ONVIF Metadata Event Store
+#
+#   受信したイベントと画像を追記型のセグメントファイルに保存し、SQLite のインデックスで検索できるようにする
+#       * 画像はセグメントファイル (segment_000001.seg ...) に追記する。1ファイル毎に保存しないので、
+#         同じ時刻のイベントが上書きされることはなく、ファイル数も増えない
+#       * インデックス (index.db) には時刻、カメラ、トピック、オブジェクト種別と、画像の位置 (セグメント、オフセット、長さ) を保存する
+#       * 書き込みは専用スレッドで行い、batch_size 件、または batch_interval 秒毎に1つのトランザクションで登録する
+#       * 書き込み待ちのデータが上限を超えた場合は、イベントを破棄する (受信処理を止めない)
+#   Store received events and images in append-only segment files, and make them searchable by an SQLite index.
+#       * Images are appended to segment files (segment_000001.seg ...). No file is created per image, so events
+#         in the same second never overwrite each other and the number of files does not grow.
+#       * The index (index.db) holds the time, camera, topic, object classes and the image location
+#         (segment, offset, length).
+#       * Writing is done on a dedicated thread, and events are committed in one transaction per batch_size events
+#         or batch_interval seconds.
+#       * If the data waiting to be written exceeds the limit, the event is dropped instead of blocking the receiver.
+#
+#   Usage:
+#       store = EventStore("events")
+#       store.append("camera00", event)     # OnvifMetaParser のイベント (image_writer=None)
+#       ...
+#       store.stop()
+#
+#       for row in store.query(camera="camera00", object_class="Human", start="2023-01-24T10:00:00"):
+#           jpg = store.read_image(row)
+#
+#       # コマンドラインで検索する
+#       # Search from the command line
+#       python event_store.py --dir events --topic tns1:RuleEngine/Test --start 2023-01-24T10:00:00 --extract out
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# オブジェクト種別として登録する SimpleItem の名前
+CLASS_ITEM_NAMES = ("ObjectType", "ObjectClass", "ClassTypes", "Class", "Type")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY,
+    UtcTime     TEXT,
+    camera      TEXT,
+    topic       TEXT,
+    operation   TEXT,
+    source      TEXT,
+    data        TEXT,
+    segment     INTEGER,
+    offset      INTEGER,
+    length      INTEGER
+);
+CREATE TABLE IF NOT EXISTS classes (
+    event_id    INTEGER,
+    class       TEXT,
+    PRIMARY KEY (event_id, class)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_time ON events (UtcTime);
+CREATE INDEX IF NOT EXISTS events_camera ON events (camera, UtcTime);
+CREATE INDEX IF NOT EXISTS events_topic ON events (topic, UtcTime);
+CREATE INDEX IF NOT EXISTS classes_class ON classes (class, event_id);
+"""
+
+
+##########
+#   イベントのオブジェクト種別を取り出す
+#
+#   Note:
+#       CLASS_ITEM_NAMES の SimpleItem の値 (カンマ、空白区切りで複数可)
+##########
+def event_classes(event):
+    classes = []
+    for section in ("data", "source", "key"):
+        for name, value in event.get(section, {}).items():
+            if (name in CLASS_ITEM_NAMES and value):
+                for item in value.replace(",", " ").split():
+                    if (item not in classes):
+                        classes.append(item)
+    return classes
+
+
+##########
+#   イベントストア
+#
+#   Note:
+#       directory : 保存先フォルダ
+#       segment_size : セグメントファイルの最大サイズ [byte]  超える場合は次のファイルに書く
+#       batch_size : 1つのトランザクションで登録する最大イベント数
+#       batch_interval : 登録までの最大待ち時間 [sec]
+#       max_pending_bytes : 書き込み待ちデータの上限 [byte]
+##########
+class EventStore:
+    def __init__(self, directory, segment_size=256 * 1024 * 1024, batch_size=500, batch_interval=1.0,
+                 max_pending_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_pending_bytes = max_pending_bytes
+
+        # 統計情報
+        self.stored = 0             # 登録したイベント数
+        self.dropped = 0            # 書き込み待ちの上限を超えて破棄したイベント数
+        self.commits = 0            # トランザクション数
+        self.errors = 0             # 書き込みエラー数
+
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "index.db")
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        last = conn.execute("SELECT MAX(id), MAX(segment) FROM events").fetchone()
+        conn.close()
+        self._next_id = (last[0] or 0) + 1
+        self._segment = last[1] or 1
+        self._segment_file = None
+
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    ##########
+    #   イベントを追加する
+    #
+    #   Note:
+    #       camera : カメラ名
+    #       event : OnvifMetaParser の "event" (画像は event["image"] の bytes)
+    #       戻り値 : True : 登録待ちに追加  False : 破棄した
+    ##########
+    def append(self, camera, event):
+        image = event.get("image") or b""
+        with self._lock:
+            if (self._pending_bytes + len(image) > self.max_pending_bytes):
+                # ディスクが追いつかないので、このイベントは破棄する
+                self.dropped += 1
+                return False
+            self._pending_bytes += len(image)
+        self._queue.put((camera, event, image))
+        return True
+
+    ##########
+    #   登録待ちのイベントを全て登録してからスレッドを終了する
+    ##########
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    @property
+    def pending_bytes(self):
+        return self._pending_bytes
+
+    ##########
+    #   イベントを検索する
+    #
+    #   Note:
+    #       camera, topic, object_class : None の場合は全て
+    #       start, end : UtcTime の範囲 (ISO 8601 文字列、end は含まない)  None の場合は制限なし
+    #       戻り値 : dict のリスト (時刻順)
+    #       書き込み中でも検索できる (登録済みのイベントのみ)
+    ##########
+    def query(self, camera=None, topic=None, object_class=None, start=None, end=None, limit=None):
+        conditions = []
+        params = []
+        if (camera is not None):
+            conditions.append("e.camera = ?")
+            params.append(camera)
+        if (topic is not None):
+            conditions.append("e.topic = ?")
+            params.append(topic)
+        if (object_class is not None):
+            conditions.append("e.id IN (SELECT event_id FROM classes WHERE class = ?)")
+            params.append(object_class)
+        if (start is not None):
+            conditions.append("e.UtcTime >= ?")
+            params.append(start)
+        if (end is not None):
+            conditions.append("e.UtcTime < ?")
+            params.append(end)
+        where = ("WHERE " + " AND ".join(conditions)) if len(conditions) > 0 else ""
+        sql = ("SELECT e.id, e.UtcTime, e.camera, e.topic, e.operation, e.source, e.data, e.segment, e.offset, e.length, "
+               "(SELECT GROUP_CONCAT(class, ' ') FROM classes c WHERE c.event_id = e.id) "
+               f"FROM events e {where} ORDER BY e.UtcTime, e.id")
+        if (limit is not None):
+            sql += f" LIMIT {int(limit)}"
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "id": row[0],
+                "UtcTime": row[1],
+                "camera": row[2],
+                "topic": row[3],
+                "PropertyOperation": row[4],
+                "source": json.loads(row[5]),
+                "data": json.loads(row[6]),
+                "segment": row[7],
+                "offset": row[8],
+                "length": row[9],
+                "classes": row[10].split() if row[10] else [],
+            }
+            for row in rows
+        ]
+
+    ##########
+    #   検索結果の画像を読み出す
+    #
+    #   Note:
+    #       戻り値 : JPEG画像 (bytes)  画像がない場合は None
+    ##########
+    def read_image(self, row):
+        if (row["length"] == 0):
+            return None
+        with open(self._segment_path(row["segment"]), "rb") as f:
+            f.seek(row["offset"])
+            return f.read(row["length"])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment_{segment:06d}.seg")
+
+    ##########
+    #   画像をセグメントファイルに追記する
+    #
+    #   Note:
+    #       戻り値 : (セグメント番号, オフセット)
+    ##########
+    def _write_image(self, image):
+        if (self._segment_file is not None and self._segment_file.tell() > 0 and
+                self._segment_file.tell() + len(image) > self.segment_size):
+            # 次のセグメントファイルに切り替える
+            self._segment_file.close()
+            self._segment_file = None
+            self._segment += 1
+        if (self._segment_file is None):
+            self._segment_file = open(self._segment_path(self._segment), "ab")
+        offset = self._segment_file.tell()
+        self._segment_file.write(image)
+        return self._segment, offset
+
+    ##########
+    #   登録待ちのイベントを1つのトランザクションで登録する
+    #
+    #   Note:
+    #       画像をセグメントファイルに書いてからインデックスを登録するので、
+    #       インデックスが画像のない位置を指すことはない
+    ##########
+    def _commit(self, conn, batch):
+        events = []
+        classes = []
+        written = 0
+        for camera, event, image in batch:
+            written += len(image)
+            segment, offset = self._write_image(image) if len(image) > 0 else (0, 0)
+            event_id = self._next_id
+            self._next_id += 1
+            events.append((
+                event_id, event.get("UtcTime"), camera, event.get("topic"), event.get("PropertyOperation"),
+                json.dumps(event.get("source", {})), json.dumps(event.get("data", {})), segment, offset, len(image)))
+            for name in event_classes(event):
+                classes.append((event_id, name))
+        if (self._segment_file is not None):
+            self._segment_file.flush()
+
+        with conn:
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+            conn.executemany("INSERT INTO classes VALUES (?, ?)", classes)
+        self.stored += len(events)
+        self.commits += 1
+        with self._lock:
+            self._pending_bytes -= written
+
+    ##########
+    #   書き込みスレッド
+    ##########
+    def _run(self):
+        conn = self._connect()
+        running = True
+        while running:
+            item = self._queue.get()
+            if (item is None):
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if (timeout <= 0):
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if (item is None):
+                    running = False
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(conn, batch)
+            except (OSError, sqlite3.Error) as e:
+                print(f"event store error : {e}")
+                self.errors += 1
+                with self._lock:
+                    self._pending_bytes -= sum(len(image) for camera, event, image in batch)
+
+        if (self._segment_file is not None):
+            self._segment_file.close()
+            self._segment_file = None
+        conn.close()
+
+    def __str__(self):
+        return f"stored = {self.stored}, dropped = {self.dropped}, commits = {self.commits}, errors = {self.errors}"
+
+
+##########
+#   Main処理 (検索)
+##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the ONVIF metadata event store.")
+    parser.add_argument("--dir", default="events", help="event store folder")
+    parser.add_argument("--camera", default=None, help="camera name")
+    parser.add_argument("--topic", default=None, help="topic (e.g. tns1:RuleEngine/...)")
+    parser.add_argument("--class", dest="object_class", default=None, help="object class")
+    parser.add_argument("--start", default=None, help="start UtcTime (e.g. 2023-01-24T10:00:00)")
+    parser.add_argument("--end", default=None, help="end UtcTime (not included)")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of events")
+    parser.add_argument("--extract", default=None, help="folder to save the images of the found events")
+    args = parser.parse_args()
+
+    if (not os.path.exists(os.path.join(args.dir, "index.db"))):
+        print(f"not exist event store : {args.dir}")
+        raise SystemExit(1)
+
+    store = EventStore(args.dir)
+    rows = store.query(camera=args.camera, topic=args.topic, object_class=args.object_class,
+                       start=args.start, end=args.end, limit=args.limit)
+    store.stop()
+
+    if (args.extract is not None):
+        os.makedirs(args.extract, exist_ok=True)
+    for row in rows:
+        print(f"{row['UtcTime']}  {row['camera']}  {row['topic']}  {' '.join(row['classes'])}  {row['length']} bytes")
+        if (args.extract is not None and row["length"] > 0):
+            name = f"{row['camera']}_{row['UtcTime']}_{row['id']}".replace(":", "-")
+            path = os.path.join(args.extract, name + ".jpg")
+            with open(path, "wb") as f:
+                f.write(store.read_image(row))
+    print(f"{len(rows)} events")
@@ -0,0 +1,481 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# ONVIFメタデータ 擬似カメラ (RTSP over WebSocket)
+# Fake ONVIF Metadata Camera (RTSP over WebSocket)
+#
+#   AIカメラの代わりにローカルで動作し、ws_metarcv.py / ws_metarcv_async.py の動作確認と負荷試験に使用する
+#       * Digest認証付きの /cgi-bin/getinfo と /rtsp-over-websocket を提供する
+#       * OPTIONS/DESCRIBE/SETUP/PLAY/GET_PARAMETER/TEARDOWN に応答する。SETUP応答の Session には timeout を付け、
+#         その間にリクエストがない場合は切断する
+#       * PLAY後、ONVIF MetaDataStream (VideoAnalytics の Frame と、base64 の JPEG画像付きの Event) を
+#         指定したレートでインターリーブRTPパケットとして送信する
+#       * RTPペイロードの大きさ、1メッセージに入れるパケット数、メッセージの分割、パケットロスを指定できる
+#   Run locally instead of an AI camera, to test and load-test ws_metarcv.py / ws_metarcv_async.py.
+#       * Provide /cgi-bin/getinfo and /rtsp-over-websocket protected by digest authentication.
+#       * Answer OPTIONS/DESCRIBE/SETUP/PLAY/GET_PARAMETER/TEARDOWN. The Session of the SETUP response has a timeout,
+#         and the connection is closed if no request arrives within it.
+#       * After PLAY, send ONVIF MetaDataStream documents (a VideoAnalytics Frame and an Event with a base64 JPEG image)
+#         at the given rate as interleaved RTP packets.
+#       * The RTP payload size, the packets per message, splitting of messages and packet loss can be specified.
+#
+#   Requirements:
+#       aiohttp     https://docs.aiohttp.org/
+#         pip3 install aiohttp
+#
+#   Usage:
+#       python fake_meta_camera.py --port 8080 --rate 50 --image-size 30000
+#
+#       ws_metarcv.py の _cam_ip を "127.0.0.1:8080" に変更して実行する
+#       Change _cam_ip of ws_metarcv.py to "127.0.0.1:8080" and run it.
+#       ws_metarcv_async.py の場合は MetaCameraSetting("camera00", "127.0.0.1:8080", "user-id", "password") を
+#       必要な台数だけ指定する (接続毎に独立したセッションになる)
+#       For ws_metarcv_async.py, give MetaCameraSetting("camera00", "127.0.0.1:8080", "user-id", "password")
+#       as many times as needed. Each connection is an independent session.
+#
+#   Note:
+#       実際のカメラと同様に、/rtsp-over-websocket の Authorization は getinfo の uri で計算したものも受け付ける
+#       As real cameras do, the Authorization of /rtsp-over-websocket calculated for the getinfo uri is accepted.
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import argparse
+import asyncio
+import base64
+import random
+import re
+import secrets
+import struct
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from digest_auth import DIGEST_ALGORITHMS
+
+RTP_HEADER = struct.Struct(">BBHLL")
+INTERLEAVED_HEADER = struct.Struct(">BBH")
+
+# メタデータの RTP payload type と clock rate
+META_PAYLOAD_TYPE = 107
+META_CLOCK_RATE = 90000
+
+NAMESPACES = (
+    'xmlns:tt="http://www.onvif.org/ver10/schema" '
+    'xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2" '
+    'xmlns:tns1="http://www.onvif.org/ver10/topics" '
+    'xmlns:xsd="http://www.w3.org/2001/XMLSchema"'
+)
+
+
+##########
+#   送信するJPEG画像を作成する
+#
+#   Note:
+#       OpenCV がある場合はノイズ画像を image_size [byte] 程度にエンコードする
+#       ない場合は SOI/EOI で挟んだダミーデータ (デコードはできない)
+##########
+def make_jpeg(image_size):
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        return b"\xff\xd8" + bytes(random.getrandbits(8) for _ in range(max(image_size - 4, 0))) + b"\xff\xd9"
+
+    rng = np.random.default_rng(0)
+    width, height = 640, 360
+    quality = 90
+    while True:
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        ret, jpg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if (len(jpg) <= image_size or width <= 16):
+            return jpg.tobytes()
+        # 大きすぎる場合は画像を小さくする
+        width = width * 3 // 4
+        height = height * 3 // 4
+
+
+##########
+#   RTSP応答の文字列を作成する
+##########
+def rtsp_response(cseq, status="200 OK", headers=(), body=""):
+    text = f"RTSP/1.0 {status}\r\nCSeq: {cseq}\r\n"
+    for header in headers:
+        text += header + "\r\n"
+    if (body != ""):
+        text += f"Content-Length: {len(body.encode())}\r\n"
+    return text + "\r\n" + body
+
+
+##########
+#   擬似カメラの設定
+#
+#   Note:
+#       rate : 1接続あたりのイベント数 [events/sec]
+#       image : イベントに付けるJPEG画像 (bytes)
+#       objects : 1フレームのオブジェクト数
+#       classes : オブジェクト種別 (順番に使用する)
+#       payload_size : RTPペイロードの最大サイズ [byte]
+#       packets_per_message : 1つのWebSocketメッセージに入れるRTPパケット数
+#       split : WebSocketメッセージを分割する大きさ [byte]  0 の場合は分割しない
+#       loss : パケットロスの確率 (0.0 - 1.0)
+#       session_timeout : SETUP応答の Session timeout [sec]
+#       nonce_lifetime : nonce を変更する周期 [sec]  0 の場合は変更しない
+##########
+class FakeMetaCameraSetting:
+    def __init__(self, user="user-id", password="password", rate=10.0, image=None, objects=1,
+                 classes=("Human", "Car", "Bike"), payload_size=1400, packets_per_message=1, split=0, loss=0.0,
+                 session_timeout=60, nonce_lifetime=0):
+        self.user = user
+        self.password = password
+        self.rate = rate
+        self.image = image if image is not None else make_jpeg(30000)
+        self.objects = objects
+        self.classes = classes
+        self.payload_size = payload_size
+        self.packets_per_message = packets_per_message
+        self.split = split
+        self.loss = loss
+        self.session_timeout = session_timeout
+        self.nonce_lifetime = nonce_lifetime
+
+
+##########
+#   擬似カメラ
+##########
+class FakeMetaCamera:
+    def __init__(self, setting=None):
+        self.setting = setting if setting is not None else FakeMetaCameraSetting()
+        self.realm = "fake-camera"
+        self._nonce = secrets.token_hex(16)
+        self._nonce_time = time.monotonic()
+        # base64 の画像は全イベントで共通なので1回だけ変換する
+        self._image_b64 = base64.b64encode(self.setting.image)
+
+        # 統計情報
+        self.connections = 0        # WebSocket接続数
+        self.active = 0             # 接続中のセッション数
+        self.auth_failures = 0      # 認証失敗 (401応答) の数
+        self.requests = {}          # RTSPメソッド毎のリクエスト数
+        self.events = 0             # 送信したイベント数
+        self.packets = 0            # 送信したRTPパケット数
+        self.lost = 0               # わざと送信しなかったRTPパケット数
+        self.bytes = 0              # 送信したバイト数
+
+        self._runner = None
+
+    ##########
+    #   aiohttp アプリケーションを作成する
+    ##########
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/cgi-bin/getinfo", self._getinfo)
+        app.router.add_get("/rtsp-over-websocket", self._rtsp_over_websocket)
+        return app
+
+    ##########
+    #   サーバを開始する
+    ##########
+    async def start(self, host="127.0.0.1", port=8080):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    ##########
+    #   サーバを終了する
+    ##########
+    async def stop(self):
+        if (self._runner is not None):
+            await self._runner.cleanup()
+            self._runner = None
+
+    def __str__(self):
+        return f"connections = {self.connections}, active = {self.active}, auth_failures = {self.auth_failures}, " + \
+               f"events = {self.events}, packets = {self.packets}, lost = {self.lost}, bytes = {self.bytes}, " + \
+               f"requests = {self.requests}"
+
+    ##########
+    #   Digest認証
+    ##########
+    @property
+    def nonce(self):
+        lifetime = self.setting.nonce_lifetime
+        if (lifetime > 0 and time.monotonic() - self._nonce_time >= lifetime):
+            self._nonce = secrets.token_hex(16)
+            self._nonce_time = time.monotonic()
+        return self._nonce
+
+    def _unauthorized(self, stale=False):
+        self.auth_failures += 1
+        challenge = f'Digest realm="{self.realm}", nonce="{self.nonce}", qop="auth", algorithm=MD5'
+        if (stale):
+            challenge += ", stale=true"
+        return web.Response(status=401, headers={"WWW-Authenticate": challenge})
+
+    ##########
+    #   Authorization ヘッダを検証する
+    #
+    #   Note:
+    #       戻り値 : None : 成功  web.Response : 401応答
+    ##########
+    def _check_auth(self, request):
+        header = request.headers.get("Authorization", "")
+        if (not header.lower().startswith("digest ")):
+            return self._unauthorized()
+        params = {}
+        for name, quoted, token in re.findall(r'(\w+)=(?:"([^"]*)"|([^\s,]*))', header[7:]):
+            params[name.lower()] = quoted if quoted else token
+
+        hash_func = DIGEST_ALGORITHMS.get(params.get("algorithm", "MD5").upper())
+        if (hash_func is None or params.get("username") != self.setting.user or params.get("realm") != self.realm):
+            return self._unauthorized()
+        H = lambda text: hash_func(text.encode()).hexdigest()
+        ha1 = H(f"{self.setting.user}:{self.realm}:{self.setting.password}")
+        ha2 = H(f"{request.method}:{params.get('uri', '')}")
+        if (params.get("qop") == "auth"):
+            expected = H(f"{ha1}:{params.get('nonce')}:{params.get('nc')}:{params.get('cnonce')}:auth:{ha2}")
+        else:
+            expected = H(f"{ha1}:{params.get('nonce')}:{ha2}")
+        if (params.get("response") != expected):
+            return self._unauthorized()
+        if (params.get("nonce") != self.nonce):
+            # パスワードは正しいが nonce が古い
+            return self._unauthorized(stale=True)
+        return None
+
+    async def _getinfo(self, request):
+        error = self._check_auth(request)
+        if (error is not None):
+            return error
+        return web.Response(text="Fake camera\r\n")
+
+    ##########
+    #   RTSP over WebSocket
+    ##########
+    async def _rtsp_over_websocket(self, request):
+        error = self._check_auth(request)
+        if (error is not None):
+            return error
+
+        ws = web.WebSocketResponse(protocols=["binary"], max_msg_size=0)
+        await ws.prepare(request)
+        self.connections += 1
+        self.active += 1
+
+        session_id = f"{random.getrandbits(32):08X}"
+        sender = None
+        last_request = time.monotonic()
+        watchdog = asyncio.create_task(self._watchdog(ws, lambda: last_request))
+        try:
+            async for msg in ws:
+                if (msg.type != web.WSMsgType.TEXT):
+                    continue
+                last_request = time.monotonic()
+                lines = msg.data.split("\r\n")
+                method, uri = lines[0].split(" ")[:2]
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if (sep != ""):
+                        headers[name.strip().lower()] = value.strip()
+                cseq = headers.get("cseq", "0")
+                self.requests[method] = self.requests.get(method, 0) + 1
+
+                if (method == "OPTIONS"):
+                    await ws.send_str(rtsp_response(
+                        cseq, headers=["Public: OPTIONS, DESCRIBE, SETUP, PLAY, GET_PARAMETER, TEARDOWN"]))
+                elif (method == "DESCRIBE"):
+                    base = uri.split("?")[0] + "/"
+                    sdp = ("v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=Fake camera\r\nt=0 0\r\n"
+                           f"m=application 0 RTP/AVP {META_PAYLOAD_TYPE}\r\n"
+                           f"a=rtpmap:{META_PAYLOAD_TYPE} vnd.onvif.metadata/{META_CLOCK_RATE}\r\n"
+                           "a=control:trackID=4\r\n")
+                    await ws.send_str(rtsp_response(
+                        cseq, headers=[f"Content-Base: {base}", "Content-Type: application/sdp"], body=sdp))
+                elif (method == "SETUP"):
+                    await ws.send_str(rtsp_response(cseq, headers=[
+                        "Transport: RTP/AVP/TCP;unicast;interleaved=0-1",
+                        f"Session: {session_id};timeout={self.setting.session_timeout}"]))
+                elif (method == "PLAY"):
+                    await ws.send_str(rtsp_response(cseq, headers=[f"Session: {session_id}"]))
+                    if (sender is None):
+                        sender = asyncio.create_task(self._send_metadata(ws))
+                elif (method == "GET_PARAMETER"):
+                    await ws.send_str(rtsp_response(cseq, headers=[f"Session: {session_id}"]))
+                elif (method == "TEARDOWN"):
+                    await ws.send_str(rtsp_response(cseq, headers=[f"Session: {session_id}"]))
+                    break
+                else:
+                    await ws.send_str(rtsp_response(cseq, status="405 Method Not Allowed"))
+        finally:
+            watchdog.cancel()
+            if (sender is not None):
+                sender.cancel()
+            self.active -= 1
+            await ws.close()
+        return ws
+
+    ##########
+    #   Session timeout の間にリクエストがない場合は切断する
+    ##########
+    async def _watchdog(self, ws, last_request):
+        timeout = self.setting.session_timeout
+        while True:
+            remain = last_request() + timeout - time.monotonic()
+            if (remain <= 0):
+                print("session timeout")
+                await ws.close()
+                return
+            await asyncio.sleep(remain)
+
+    ##########
+    #   MetaDataStream 文書を作成する
+    ##########
+    def _make_document(self, index):
+        now = datetime.now(timezone.utc)
+        utc_time = now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+        objects = ""
+        for i in range(self.setting.objects):
+            object_class = self.setting.classes[(index + i) % len(self.setting.classes)]
+            left = (i % 4) * 0.25
+            objects += (
+                f'<tt:Object ObjectId="{index * self.setting.objects + i}"><tt:Appearance><tt:Shape>'
+                f'<tt:BoundingBox left="{left:.2f}" top="0.25" right="{left + 0.2:.2f}" bottom="0.75"/></tt:Shape>'
+                f'<tt:Class><tt:Type Likelihood="0.9">{object_class}</tt:Type></tt:Class></tt:Appearance></tt:Object>')
+        object_class = self.setting.classes[index % len(self.setting.classes)]
+        head = (
+            f'<?xml version="1.0" encoding="UTF-8"?><tt:MetaDataStream {NAMESPACES}>'
+            f'<tt:VideoAnalytics><tt:Frame UtcTime="{utc_time}">{objects}</tt:Frame></tt:VideoAnalytics>'
+            '<tt:Event><wsnt:NotificationMessage>'
+            '<wsnt:Topic Dialect="http://www.onvif.org/ver10/tev/topicExpression/ConcreteSet">'
+            'tns1:RuleEngine/FakeCamera/ObjectDetection</wsnt:Topic>'
+            f'<wsnt:Message><tt:Message UtcTime="{utc_time}" PropertyOperation="Changed">'
+            '<tt:Source><tt:SimpleItem Name="VideoSourceConfigurationToken" Value="0"/></tt:Source>'
+            f'<tt:Key><tt:SimpleItem Name="EventId" Value="{index}"/></tt:Key>'
+            f'<tt:Data><tt:SimpleItem Name="ObjectType" Value="{object_class}"/>'
+            '<tt:ElementItem Name="Image"><xsd:base64Binary>'
+        )
+        tail = ('</xsd:base64Binary></tt:ElementItem></tt:Data></tt:Message></wsnt:Message>'
+                '</wsnt:NotificationMessage></tt:Event></tt:MetaDataStream>')
+        return head.encode() + self._image_b64 + tail.encode()
+
+    ##########
+    #   文書をインターリーブRTPパケットに分割する
+    ##########
+    def _packetize(self, document, seq, timestamp, ssrc):
+        packets = []
+        size = self.setting.payload_size
+        for pos in range(0, len(document), size):
+            marker = 0x80 if pos + size >= len(document) else 0
+            rtp = RTP_HEADER.pack(0x80, marker | META_PAYLOAD_TYPE, seq & 0xFFFF, timestamp, ssrc)
+            payload = document[pos:pos + size]
+            packets.append(INTERLEAVED_HEADER.pack(0x24, 0, len(rtp) + len(payload)) + rtp + payload)
+            seq += 1
+        return packets, seq
+
+    ##########
+    #   PLAY後、メタデータを送信する
+    ##########
+    async def _send_metadata(self, ws):
+        setting = self.setting
+        seq = random.getrandbits(16)
+        ssrc = random.getrandbits(32)
+        start = time.monotonic()
+        index = 0
+        try:
+            while True:
+                # レートを一定に保つため、開始時刻からの経過時間で待つ
+                delay = start + index / setting.rate - time.monotonic()
+                if (delay > 0):
+                    await asyncio.sleep(delay)
+                timestamp = int((time.monotonic() - start) * META_CLOCK_RATE) & 0xFFFFFFFF
+                packets, seq = self._packetize(self._make_document(index), seq, timestamp, ssrc)
+                if (setting.loss > 0):
+                    sent = [packet for packet in packets if random.random() >= setting.loss]
+                    self.lost += len(packets) - len(sent)
+                    packets = sent
+
+                for i in range(0, len(packets), setting.packets_per_message):
+                    message = b"".join(packets[i:i + setting.packets_per_message])
+                    if (setting.split > 0):
+                        for pos in range(0, len(message), setting.split):
+                            await ws.send_bytes(message[pos:pos + setting.split])
+                    else:
+                        await ws.send_bytes(message)
+                    self.bytes += len(message)
+                self.packets += len(packets)
+                self.events += 1
+                index += 1
+        except ConnectionError:
+            # 切断済み
+            pass
+
+
+##########
+#   Main処理
+#
+#   Note:
+#       5秒毎に統計を表示する
+##########
+async def main(args):
+    image = None
+    if (args.image is not None):
+        with open(args.image, "rb") as f:
+            image = f.read()
+    else:
+        image = make_jpeg(args.image_size)
+
+    setting = FakeMetaCameraSetting(
+        user=args.user, password=args.password, rate=args.rate, image=image, objects=args.objects,
+        payload_size=args.payload_size, packets_per_message=args.packets_per_message, split=args.split,
+        loss=args.loss, session_timeout=args.session_timeout, nonce_lifetime=args.nonce_lifetime)
+    camera = FakeMetaCamera(setting)
+    await camera.start(args.host, args.port)
+    print(f"fake camera : http://{args.host}:{args.port}/  image = {len(image)} bytes  rate = {args.rate} events/sec")
+    try:
+        while True:
+            await asyncio.sleep(5.0)
+            print(camera)
+    finally:
+        await camera.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake ONVIF metadata camera (RTSP over WebSocket).")
+    parser.add_argument("--host", default="127.0.0.1", help="listen address")
+    parser.add_argument("--port", type=int, default=8080, help="listen port")
+    parser.add_argument("--user", default="user-id", help="digest user")
+    parser.add_argument("--password", default="password", help="digest password")
+    parser.add_argument("--rate", type=float, default=10.0, help="events per second per connection")
+    parser.add_argument("--image", default=None, help="JPEG file attached to events")
+    parser.add_argument("--image-size", type=int, default=30000, help="size of the generated JPEG [byte]")
+    parser.add_argument("--objects", type=int, default=1, help="objects per frame")
+    parser.add_argument("--payload-size", type=int, default=1400, help="maximum RTP payload size [byte]")
+    parser.add_argument("--packets-per-message", type=int, default=1, help="RTP packets per WebSocket message")
+    parser.add_argument("--split", type=int, default=0, help="split WebSocket messages into this size [byte]")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--session-timeout", type=int, default=60, help="RTSP session timeout [sec]")
+    parser.add_argument("--nonce-lifetime", type=float, default=0, help="change the digest nonce every N sec")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        # Ctrl+C で終了する
+        print("KeyboardInterrupt")
@@ -0,0 +1,155 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# RTSPキープアライブのスケジューラ
+# Scheduler of RTSP keepalives
+#
+#   1つのスレッドと時刻順のヒープで、全セッションのキープアライブ (GET_PARAMETER) を送信する
+#       * 周期毎に threading.Timer を起動しないので、セッション数や再接続回数が増えてもスレッドは増えない
+#       * 周期は SETUP 応答の Session ヘッダの timeout から決める (session_keepalive_interval)
+#       * セッションを閉じた時に cancel() すると、それ以降は送信しない
+#   Send keepalives (GET_PARAMETER) of all sessions with one thread and a heap ordered by time.
+#       * threading.Timer is not started for every period, so threads do not increase with sessions or reconnects.
+#       * The period is decided from the timeout of the Session header of the SETUP response.
+#       * After cancel() is called when the session is closed, no more keepalives are sent.
+#
+#   Usage:
+#       scheduler = KeepaliveScheduler()
+#       interval = session_keepalive_interval("12345678;timeout=60")     # 30 sec
+#       scheduler.schedule(key, interval, callback)     # callback() が False を返すと終了
+#       scheduler.cancel(key)
+#       scheduler.stop()
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import heapq
+import itertools
+import threading
+import time
+
+# Session ヘッダに timeout がない場合の値 [sec] (RFC 2326 の既定値)
+DEFAULT_SESSION_TIMEOUT = 60
+
+
+##########
+#   SETUP 応答の Session ヘッダからキープアライブの周期を求める
+#
+#   Note:
+#       session : Session ヘッダの値 (例 "12345678;timeout=60")
+#       戻り値 : timeout の半分 [sec]
+##########
+def session_keepalive_interval(session, default_timeout=DEFAULT_SESSION_TIMEOUT):
+    timeout = default_timeout
+    for param in session.split(";")[1:]:
+        name, sep, value = param.strip().partition("=")
+        if (name.lower() == "timeout" and value.isdigit() and int(value) > 0):
+            timeout = int(value)
+    return timeout / 2
+
+
+##########
+#   キープアライブのスケジューラ
+##########
+class KeepaliveScheduler:
+    def __init__(self):
+        self._heap = []             # [次回時刻, 登録順, キー]
+        self._entries = {}          # キー -> (周期, callback, 登録順)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    ##########
+    #   キープアライブを登録する (同じキーが登録済みの場合は置き換える)
+    #
+    #   Note:
+    #       key : セッションを識別する値
+    #       interval : 周期 [sec]
+    #       callback : 送信処理 callback()  False を返すと登録を解除する
+    ##########
+    def schedule(self, key, interval, callback):
+        with self._condition:
+            order = next(self._counter)
+            self._entries[key] = (interval, callback, order)
+            heapq.heappush(self._heap, (time.monotonic() + interval, order, key))
+            self._condition.notify()
+
+    ##########
+    #   キープアライブを解除する
+    ##########
+    def cancel(self, key):
+        with self._condition:
+            # ヒープからは取り除かず、取り出した時に無視する
+            self._entries.pop(key, None)
+
+    ##########
+    #   スケジューラを終了する
+    ##########
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._entries.clear()
+            self._condition.notify()
+        self._thread.join()
+
+    def __len__(self):
+        return len(self._entries)
+
+    ##########
+    #   スケジューラのスレッド
+    ##########
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if (not self._running):
+                        return
+                    if (len(self._heap) > 0):
+                        due, order, key = self._heap[0]
+                        entry = self._entries.get(key)
+                        if (entry is None or entry[2] != order):
+                            # 解除済み、または置き換え済み
+                            heapq.heappop(self._heap)
+                            continue
+                        delay = due - time.monotonic()
+                        if (delay <= 0):
+                            heapq.heappop(self._heap)
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                interval, callback, order = entry
+
+            # 送信はロックの外で行う
+            try:
+                result = callback()
+            except Exception as e:
+                print(f"keepalive error : {e!r}")
+                result = False
+
+            with self._condition:
+                entry = self._entries.get(key)
+                if (entry is None or entry[2] != order):
+                    continue
+                if (result is False):
+                    del self._entries[key]
+                else:
+                    # 遅れた場合は、遅れを取り戻すために連続して送信しない
+                    heapq.heappush(self._heap, (max(due + interval, time.monotonic()), order, key))
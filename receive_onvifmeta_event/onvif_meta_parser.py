@@ -0,0 +1,279 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# ONVIF MetaDataStream ストリーミングパーサ
+# ONVIF MetaDataStream Streaming Parser
+#
+#   RTPペイロードが届く度に xml.parsers.expat に入力し、要素が閉じた時点で構造化したイベントを通知する
+#       * XML文書全体を組み立てたり、文字列検索を繰り返したりしない
+#       * メモリと遅延は文書全体ではなく、要素の大きさに比例する
+#       * 画像 (xsd:base64Binary) は4文字単位で順次デコードする。image_writer を指定した場合はファイルに直接書き込む
+#   Feed RTP payloads to xml.parsers.expat as they arrive, and notify structured events as soon as each element closes.
+#       * The whole XML document is not assembled, and no repeated string search is done.
+#       * Memory and latency track the element size instead of the document size.
+#       * The image (xsd:base64Binary) is decoded in 4-character aligned chunks as it arrives.
+#         If image_writer is given, it is written directly to a file.
+#
+#   通知するイベント (dict)
+#   Notified events (dict)
+#       tt:Message が閉じた時
+#           {"type": "event", "UtcTime": str, "PropertyOperation": str, "topic": str,
+#            "source": {Name: Value}, "key": {Name: Value}, "data": {Name: Value},
+#            "image": bytes or None (image_writer=None), "image_file": str or None (image_writer)}
+#       tt:Frame が閉じた時
+#           {"type": "frame", "UtcTime": str,
+#            "objects": [{"ObjectId": str, "box": (left, top, right, bottom) or None, "class": str or None}]}
+#
+#   Usage:
+#       parser = OnvifMetaParser(on_event)
+#       depacketizer = RtpDepacketizer(sink=parser)
+#       depacketizer.feed(message)      # on_event(event) が呼ばれる
+#
+#       # 画像をファイルに直接書き込む場合
+#       # To write images directly to files
+#       parser = OnvifMetaParser(on_event, image_writer=BackgroundFileWriter(), image_path=lambda event: ...)
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+#       2026/10/18 ver 1.01 画像を順次デコードし、image_writer でファイルに書き込む処理を追加
+##########
+import binascii
+import xml.parsers.expat
+
+# 名前空間とローカル名の区切り文字
+_NS_SEPARATOR = " "
+# base64データから取り除く空白文字
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+##########
+#   ONVIF MetaDataStream パーサ
+#
+#   Note:
+#       on_event : イベント通知先 on_event(event)
+#       image_writer : 画像の書き込み先 (BackgroundFileWriter など)  None の場合は event["image"] に bytes を格納する
+#       image_path : 画像のファイル名を返す関数 image_path(event)  image_writer を指定した場合に使用する
+##########
+class OnvifMetaParser:
+    def __init__(self, on_event, image_writer=None, image_path=None):
+        self.on_event = on_event
+        self.image_writer = image_writer
+        self.image_path = image_path
+
+        # 統計情報
+        self.documents = 0          # 解析した文書数
+        self.events = 0             # 通知したイベント数
+        self.errors = 0             # XMLエラーで破棄した文書数
+
+        self._new_parser()
+
+    ##########
+    #   文書毎に新しい expat パーサを作成する
+    ##########
+    def _new_parser(self):
+        # 書きかけの画像は破棄する
+        if (getattr(self, "_image_handle", None) is not None):
+            self.image_writer.abort(self._image_handle)
+
+        parser = xml.parsers.expat.ParserCreate(namespace_separator=_NS_SEPARATOR)
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._character_data
+        self._parser = parser
+        self._failed = False
+
+        self._depth = 0
+        self._text = None           # 文字データの収集先 (list)。None の場合は収集しない
+        self._topic = None
+        self._event = None
+        self._event_depth = 0
+        self._section = None        # "source", "key", "data"
+        self._frame = None
+        self._object = None
+
+        self._decoding = False      # True : base64Binary の中
+        self._carry = ""            # 4文字に満たないため次回にデコードする base64 文字列
+        self._image = None          # デコードした画像 (bytearray)  image_writer=None の場合
+        self._image_handle = None   # image_writer のハンドル
+
+    ##########
+    #   ペイロードを入力する
+    ##########
+    def feed(self, data):
+        if (self._failed):
+            return
+        try:
+            self._parser.Parse(data, False)
+        except xml.parsers.expat.ExpatError as e:
+            print(f"XML error : {e}")
+            self.errors += 1
+            self._failed = True
+
+    ##########
+    #   文書の終わり
+    ##########
+    def close(self):
+        if (not self._failed):
+            try:
+                self._parser.Parse(b"", True)
+                self.documents += 1
+            except xml.parsers.expat.ExpatError as e:
+                print(f"XML error : {e}")
+                self.errors += 1
+        self._new_parser()
+
+    ##########
+    #   受信中の文書を破棄する
+    ##########
+    def reset(self):
+        self._new_parser()
+
+    ##########
+    #   expat ハンドラ
+    ##########
+    def _start_element(self, name, attrs):
+        self._depth += 1
+        local = name.rpartition(_NS_SEPARATOR)[2]
+
+        if (local == "Message" and "UtcTime" in attrs):
+            # tt:Message (wsnt:Message には UtcTime がない)
+            self._event = {
+                "type": "event",
+                "UtcTime": attrs["UtcTime"],
+                "PropertyOperation": attrs.get("PropertyOperation"),
+                "topic": self._topic,
+                "source": {},
+                "key": {},
+                "data": {},
+                "image": None,
+                "image_file": None,
+            }
+            self._event_depth = self._depth
+        elif (local == "Topic"):
+            self._text = []
+        elif (self._event is not None):
+            if (local == "Source" or local == "Key" or local == "Data"):
+                self._section = local.lower()
+            elif (local == "SimpleItem" and self._section is not None):
+                self._event[self._section][attrs.get("Name")] = attrs.get("Value")
+            elif (local == "base64Binary"):
+                self._start_image()
+        elif (local == "Frame"):
+            self._frame = {"type": "frame", "UtcTime": attrs.get("UtcTime"), "objects": []}
+        elif (self._frame is not None):
+            if (local == "Object"):
+                self._object = {"ObjectId": attrs.get("ObjectId"), "box": None, "class": None}
+            elif (local == "BoundingBox" and self._object is not None):
+                self._object["box"] = tuple(float(attrs.get(key, 0)) for key in ("left", "top", "right", "bottom"))
+            elif (local == "Type" and self._object is not None):
+                self._text = []
+
+    def _end_element(self, name):
+        local = name.rpartition(_NS_SEPARATOR)[2]
+
+        if (local == "Topic" and self._text is not None):
+            self._topic = "".join(self._text).strip()
+            self._text = None
+        elif (self._event is not None):
+            if (local == "Message" and self._depth == self._event_depth):
+                event = self._event
+                self._event = None
+                self._section = None
+                self._emit(event)
+            elif (local == "Source" or local == "Key" or local == "Data"):
+                self._section = None
+            elif (local == "base64Binary" and self._decoding):
+                self._end_image()
+        elif (self._frame is not None):
+            if (local == "Frame"):
+                frame = self._frame
+                self._frame = None
+                self._emit(frame)
+            elif (local == "Object" and self._object is not None):
+                self._frame["objects"].append(self._object)
+                self._object = None
+            elif (local == "Type" and self._text is not None):
+                if (self._object["class"] is None):
+                    self._object["class"] = "".join(self._text).strip()
+                self._text = None
+
+        self._depth -= 1
+
+    def _character_data(self, data):
+        if (self._decoding):
+            self._decode_image(data)
+        elif (self._text is not None):
+            self._text.append(data)
+
+    ##########
+    #   画像 (base64) の順次デコード
+    ##########
+    def _start_image(self):
+        self._decoding = True
+        self._carry = ""
+        if (self.image_writer is not None):
+            path = self.image_path(self._event)
+            self._event["image_file"] = path
+            self._image_handle = self.image_writer.open(path)
+        else:
+            self._image = bytearray()
+
+    def _decode_image(self, data):
+        # 4文字単位でデコードし、余りは次回に回す
+        data = self._carry + data.translate(_WHITESPACE)
+        length = len(data) & ~3
+        self._carry = data[length:]
+        if (length == 0):
+            return
+        try:
+            decoded = binascii.a2b_base64(data[:length])
+        except binascii.Error as e:
+            print(f"base64 error : {e}")
+            self._abort_image()
+            return
+        if (self._image_handle is not None):
+            self.image_writer.write(self._image_handle, decoded)
+        elif (self._image is not None):
+            self._image += decoded
+
+    def _end_image(self):
+        if (self._carry != ""):
+            # 4文字に満たないデータは不正
+            print("base64 error : incomplete data")
+            self._abort_image()
+        self._decoding = False
+        if (self._image_handle is not None):
+            self.image_writer.close(self._image_handle)
+            self._image_handle = None
+        elif (self._image is not None):
+            self._event["image"] = bytes(self._image)
+            self._image = None
+
+    def _abort_image(self):
+        if (self._image_handle is not None):
+            self.image_writer.abort(self._image_handle)
+            self._image_handle = None
+            self._event["image_file"] = None
+        self._image = None
+        self._carry = ""
+        self._decoding = False
+
+    def _emit(self, event):
+        self.events += 1
+        self.on_event(event)
@@ -0,0 +1,268 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# RTP over WebSocket デパケタイザ
+# RTP over WebSocket Depacketizer
+#
+#   RTSP-over-WebSocketで受信したインターリーブデータからRTPパケットを取り出し、
+#   シーケンス番号で並べ替えてマーカービットまでのペイロードを1つのメタデータ(XML文書)に組み立てる
+#       * インターリーブヘッダ($, チャンネル, 長さ)が複数のWebSocketメッセージに分割されていても処理する
+#       * RTPヘッダのCSRC、拡張ヘッダ、パディングを取り除く
+#       * 欠落したパケットを含む文書は破棄し、次のマーカービットから受信を再開する
+#   Extract RTP packets from interleaved data received with RTSP-over-WebSocket, reorder them by sequence number,
+#   and assemble the payloads up to the marker bit into one metadata document (XML).
+#       * Interleaved headers ($, channel, length) split across WebSocket messages are handled.
+#       * CSRC, header extension and padding of the RTP header are removed.
+#       * A document with a lost packet is discarded, and reception restarts after the next marker bit.
+#
+#   Usage:
+#       depacketizer = RtpDepacketizer()
+#       for document in depacketizer.feed(message):     # message : WebSocketで受信したbytes
+#           ...                                         # document : bytearray (XML)
+#
+#       # 文書の完成を待たずに、届いた順にペイロードを渡す場合
+#       # To pass payloads in order without waiting for the whole document
+#       depacketizer = RtpDepacketizer(sink=parser)     # parser.feed(payload), parser.close(), parser.reset()
+#       depacketizer.feed(message)
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+##########
+import collections
+import struct
+
+# RTP固定ヘッダ (V/P/X/CC, M/PT, シーケンス番号, タイムスタンプ, SSRC)
+RTP_HEADER = struct.Struct(">BBHLL")
+# RTP拡張ヘッダ (プロファイル, 長さ(32bit単位))
+RTP_EXTENSION = struct.Struct(">HH")
+# インターリーブヘッダ ('$', チャンネル, 長さ)
+INTERLEAVED_HEADER = struct.Struct(">BBH")
+
+RtpHeader = collections.namedtuple(
+    "RtpHeader", ["marker", "payload_type", "sequence", "timestamp", "ssrc", "csrc"])
+
+
+##########
+#   RTPパケットを解析する
+#
+#   Note:
+#       data : RTPパケット (bytes, bytearray, memoryview)
+#       戻り値 : (RtpHeader, ペイロードのmemoryview)  不正なパケットの場合は None
+##########
+def parse_rtp_packet(data):
+    data = memoryview(data)
+    if (len(data) < RTP_HEADER.size):
+        return None
+
+    b0, b1, sequence, timestamp, ssrc = RTP_HEADER.unpack_from(data, 0)
+    # バージョンは2のみ
+    if ((b0 >> 6) != 2):
+        return None
+    padding = (b0 >> 5) & 0x01
+    extension = (b0 >> 4) & 0x01
+    csrc_count = b0 & 0x0f
+
+    # CSRCリスト
+    offset = RTP_HEADER.size
+    end = len(data)
+    if (offset + 4 * csrc_count > end):
+        return None
+    csrc = struct.unpack_from(f">{csrc_count}L", data, offset)
+    offset += 4 * csrc_count
+
+    # 拡張ヘッダ
+    if (extension):
+        if (offset + RTP_EXTENSION.size > end):
+            return None
+        profile, length = RTP_EXTENSION.unpack_from(data, offset)
+        offset += RTP_EXTENSION.size + 4 * length
+
+    # パディング (最後の1byteがパディング長)
+    if (padding and end > offset):
+        end -= data[end - 1]
+
+    if (offset > end):
+        return None
+
+    header = RtpHeader((b1 >> 7) & 0x01, b1 & 0x7f, sequence, timestamp, ssrc, csrc)
+    return header, data[offset:end]
+
+
+##########
+#   RTPデパケタイザ
+#
+#   Note:
+#       channel : 処理するインターリーブチャンネル (SETUPのinterleaved=0-1 の RTP側)
+#       min_payload_type : 処理するペイロードタイプの下限 (96以上がdynamic)
+#       reorder_window : 並べ替えのために保持するパケット数の上限
+#       sink : None の場合は文書を組み立てて feed() の戻り値で返す
+#              指定した場合は文書を組み立てずに、以下を呼び出す (feed() の戻り値は空)
+#                  sink.feed(payload) : 順番通りのペイロード (memoryview。呼び出し中のみ有効)
+#                  sink.close() : 文書の終わり (マーカービット)
+#                  sink.reset() : 欠落により文書を破棄
+##########
+class RtpDepacketizer:
+    def __init__(self, channel=0, min_payload_type=96, reorder_window=32, sink=None):
+        self.channel = channel
+        self.min_payload_type = min_payload_type
+        self.reorder_window = reorder_window
+        self.sink = sink
+
+        # 統計情報
+        self.packets = 0            # 受信したRTPパケット数
+        self.documents = 0          # 組み立てた文書数
+        self.reordered = 0          # 順序が入れ替わって届いたパケット数
+        self.duplicated = 0         # 重複または遅すぎて捨てたパケット数
+        self.lost = 0               # 欠落したパケット数
+        self.discarded = 0          # 欠落により破棄した文書数
+
+        self._buffer = bytearray()  # 分割されたインターリーブデータ
+        self._expected = None       # 次に期待するシーケンス番号
+        self._pending = {}          # 先に届いたパケット  シーケンス番号 -> (marker, payload)
+        self._document = bytearray()
+        self._synchronized = True   # False : 次のマーカービットまで破棄する
+
+    ##########
+    #   WebSocketで受信したデータを入力する
+    #
+    #   Note:
+    #       戻り値 : 完成した文書(bytearray)のリスト
+    ##########
+    def feed(self, message):
+        documents = []
+
+        # 前回の残りがある場合だけ連結する (通常はメッセージをそのまま解析する)
+        if (len(self._buffer) > 0):
+            self._buffer += message
+            data = self._buffer
+        else:
+            data = message
+        view = memoryview(data)
+
+        offset = 0
+        length = len(data)
+        while (offset + INTERLEAVED_HEADER.size <= length):
+            magic, channel, size = INTERLEAVED_HEADER.unpack_from(view, offset)
+            if (magic != 0x24):
+                # インターリーブヘッダ以外のデータは捨てて次の'$'を探す
+                next_offset = data.find(b"$", offset + 1)
+                offset = length if (next_offset == -1) else next_offset
+                continue
+            if (offset + INTERLEAVED_HEADER.size + size > length):
+                # 残りは次のメッセージで届く
+                break
+            start = offset + INTERLEAVED_HEADER.size
+            if (channel == self.channel):
+                self._feed_packet(view[start:start + size], documents)
+            offset = start + size
+
+        self._buffer = bytearray(view[offset:])
+        return documents
+
+    ##########
+    #   RTPパケットを1つ入力する
+    #
+    #   Note:
+    #       data : インターリーブヘッダを除いたRTPパケット
+    #       戻り値 : 完成した文書(bytearray)のリスト
+    ##########
+    def feed_packet(self, data):
+        documents = []
+        self._feed_packet(data, documents)
+        return documents
+
+    def _feed_packet(self, data, documents):
+        packet = parse_rtp_packet(data)
+        if (packet is None):
+            return
+        header, payload = packet
+        if (header.payload_type < self.min_payload_type):
+            return
+        self.packets += 1
+
+        sequence = header.sequence
+        if (self._expected is None):
+            self._expected = sequence
+
+        # 期待するシーケンス番号との差 (16bitで折り返す)
+        diff = (sequence - self._expected) & 0xffff
+        if (diff >= 0x8000 or sequence in self._pending):
+            # 古いパケット、または重複
+            self.duplicated += 1
+            return
+        if (diff > 0):
+            # 先に届いたパケットは保持する (受信バッファは再利用されるのでコピーする)
+            self.reordered += 1
+            self._pending[sequence] = (header.marker, bytes(payload))
+            if (len(self._pending) > self.reorder_window):
+                self._skip_lost(documents)
+            return
+
+        self._append(header.marker, payload, documents)
+        self._drain_pending(documents)
+
+    ##########
+    #   ペイロードを文書に追加する
+    ##########
+    def _append(self, marker, payload, documents):
+        self._expected = (self._expected + 1) & 0xffff
+        if (self._synchronized):
+            if (self.sink is None):
+                self._document += payload
+            else:
+                self.sink.feed(payload)
+        if (marker):
+            if (self._synchronized):
+                if (self.sink is not None):
+                    self.sink.close()
+                    self.documents += 1
+                elif (len(self._document) > 0):
+                    documents.append(self._document)
+                    self.documents += 1
+            self._document = bytearray()
+            self._synchronized = True
+
+    ##########
+    #   保持しているパケットのうち、順番が来たものを処理する
+    ##########
+    def _drain_pending(self, documents):
+        while (self._expected in self._pending):
+            marker, payload = self._pending.pop(self._expected)
+            self._append(marker, payload, documents)
+
+    ##########
+    #   欠落したパケットを諦めて、保持している最も古いパケットから再開する
+    ##########
+    def _skip_lost(self, documents):
+        oldest = min(self._pending, key=lambda sequence: (sequence - self._expected) & 0xffff)
+        self.lost += (oldest - self._expected) & 0xffff
+        if (self._synchronized):
+            self.discarded += 1
+            if (self.sink is not None):
+                self.sink.reset()
+        self._document = bytearray()
+        self._synchronized = False
+        self._expected = oldest
+        self._drain_pending(documents)
+
+    ##########
+    #   統計情報を表示する
+    ##########
+    def print_stats(self):
+        print(f"packets = {self.packets}, documents = {self.documents}, reordered = {self.reordered}, " + \
+              f"duplicated = {self.duplicated}, lost = {self.lost}, discarded = {self.discarded}")
@@ -16,12 +16,14 @@ limitations under the License.
 # i-PRO AIアプリケーションメタデータ受信サンプル
 # i-PRO AI Application Metadata Receiver Sample
 #
-#   AIカメラからのONVIFストリームを受信し、イベント発生時のJPEG画像をファイルに保存する
+#   AIカメラからのONVIFストリームを受信し、イベント発生時のJPEG画像をイベントストアに保存する
 #       * 実行するとカメラとネゴシエーションの後、メタ情報受信待ちになります
 #       * 終了手段は用意されていないので、Ctlr+C等で強制終了してください
-#   Receive ONVIF stream from AI camera and save JPEG image to file when event occurs.
+#       * 保存したイベントは event_store.py で検索し、JPEG画像を取り出せます
+#   Receive ONVIF stream from AI camera and save JPEG image to the event store when event occurs.
 #       * After execution, the camera negotiates with the camera and waits for the meta information to be received.
 #       * No exit method is provided, so please force close with Ctlr+C, etc.
+#       * The stored events can be searched and their JPEG images extracted with event_store.py.
 #
 #   Requirements:
 #       websocket-client    https://github.com/websocket-client/websocket-client
@@ -60,17 +62,40 @@ limitations under the License.
 #       2023/01/30 ver 1.02 コメント追記・修正
 #       2023/01/30 ver 1.03 時刻にミリ秒が付与されている時に、保存ファイル名が..jpgとなってしまう不具合を修正
 #       2023/01/31 ver 1.04 コメント追記・修正
+#       2026/10/18 ver 1.05 RTPヘッダを解析し、シーケンス番号とマーカービットでXMLデータを組み立てるように変更
+#                           (rtp_depacketizer.py を同じフォルダに保存してください)
+#       2026/10/18 ver 1.06 XMLデータを組み立てずに、受信したペイロードを順次 expat で解析するように変更
+#                           (onvif_meta_parser.py を同じフォルダに保存してください)
+#       2026/10/18 ver 1.07 JPEG画像を受信しながらデコードし、バックグラウンドスレッドでファイルに書き込むように変更
+#                           (background_writer.py を同じフォルダに保存してください)
+#       2026/10/18 ver 1.08 キープアライブを周期毎の threading.Timer から1つのスケジューラに変更
+#                           周期はSETUP応答のSession timeoutから決め、切断時に停止する
+#                           (keepalive_scheduler.py を同じフォルダに保存してください)
+#       2026/10/18 ver 1.09 Digest認証の challenge をキャッシュし、再接続毎に認証ヘッダをローカルで計算するように変更
+#                           401応答の場合のみ challenge を更新する。再接続時にRTSPの状態を初期化する
+#                           (digest_auth.py を同じフォルダに保存してください)
+#       2026/10/18 ver 1.10 JPEG画像を時刻のファイル名で保存するのをやめ、イベントストア (セグメントファイルとインデックス) に保存するように変更
+#                           同じ秒のイベントが上書きされなくなり、時刻・トピック・オブジェクト種別で検索できる
+#                           (event_store.py を同じフォルダに保存してください)
 ##########
+import urllib.error
 import urllib.request
 import websocket
-import base64
-import threading
-import os
+from rtp_depacketizer import RtpDepacketizer
+from onvif_meta_parser import OnvifMetaParser
+from event_store import EventStore
+from keepalive_scheduler import KeepaliveScheduler, session_keepalive_interval
+from digest_auth import DigestAuth
 
 # カメラ接続情報
 _cam_ip = "192.168.0.10"    # Change to match your camera setting
 _cam_id = "user-id"         # Change to match your camera setting
 _cam_pwd = "password"       # Change to match your camera setting
+_cam_auth_path = "/cgi-bin/getinfo?FILE=1"
+_cam_auth = DigestAuth(_cam_id, _cam_pwd)
+    # Digest認証の challenge をキャッシュし、認証ヘッダを再接続毎に計算する
+_cam_auth_retry = False
+    # True : 前回の接続が開始できなかった (challenge を取得し直す)
 
 # Websocket通信用変数
 _ws_h = None
@@ -85,44 +110,60 @@ _rtsp_state = 0
     # 2 : SETUP応答待ち
     # 3 : Meta受信中 
 _rtsp_keepalive_time = 10
+    # キープアライブの周期 [sec]  SETUP応答のSession timeoutの半分に更新する
+_keepalive = None
+    # キープアライブのスケジューラ (全セッションで1つのスレッド)
 
 # メタデータ受信用変数
-_xml_rcvstate = 0
-    # 0 : XML受信開始前
-    # 1 : XMLデータ受信開始
-    # 2 : XMLデータ受信終了
-_xml_rcvdata = None
+#   RTPパケットをシーケンス番号で並べ替え、ペイロードを届いた順に XML パーサに入力する
+#   XML パーサは要素が閉じた時点でイベントを通知する (metarcv_on_event)
+#   JPEG画像は受信しながらデコードし、イベントと一緒にイベントストアに登録する
+_meta_parser = None
+_rtp_depacketizer = None
+_event_store = None
 
-# 受信データ保存フォルダ名(カレントディレクトリ配下に作成)
-_img_savedir = "image"
+# イベントストアのフォルダ名(カレントディレクトリ配下に作成)
+_event_dir = "events"
 
 
 
 ##########
-#   Digest認証用情報を取得する
+#   Digest認証の challenge を取得する
 #
 #   Note:
-#       ダミーのCGIを送信し、認証ヘッダを取得する
+#       認証ヘッダなしでダミーのCGIを送信し、401応答の WWW-Authenticate をキャッシュする
+#       戻り値 : True : 取得成功  False : 認証不要、または Digest ではない
 ##########
-def digest_getAuthHeader(cam_ip, cam_id, cam_pwd):
+def digest_getChallenge(cam_ip, auth):
     # 送信CGI
-    cam_auth_uri = f"http://{cam_ip}/cgi-bin/getinfo?FILE=1"
+    cam_auth_uri = f"http://{cam_ip}{_cam_auth_path}"
 
-    retValue = None
+    try:
+        with urllib.request.urlopen(cam_auth_uri, timeout=10):
+            return False
+    except urllib.error.HTTPError as e:
+        if (e.code != 401):
+            raise
+        return auth.update_challenge(e.headers.get("WWW-Authenticate"))
 
-    # 認証情報設定
-    pass_mgr = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-    pass_mgr.add_password(realm=None, uri=cam_auth_uri, user=cam_id, passwd=cam_pwd)
-    auth_handler = urllib.request.HTTPDigestAuthHandler(pass_mgr)
-    opener = urllib.request.build_opener(auth_handler)
-    urllib.request.install_opener(opener)
 
-    # CGIの送信
-    req = urllib.request.Request(cam_auth_uri)
-    with urllib.request.urlopen(req) as httpres:
-        retValue = req.get_header("Authorization")
+##########
+#   WebSocket接続用のヘッダを返す
+#
+#   Note:
+#       WebSocketApp が接続 (再接続) の直前に呼び出す
+#       challenge をキャッシュ済みの場合は、HTTP通信をせずに認証ヘッダを計算する
+#       再接続時の401応答は on_error に通知されないため、前回の接続が開始できなかった場合は challenge を取得し直す
+##########
+def digest_getAuthHeader():
+    global _cam_auth_retry
 
-    return retValue
+    if (_cam_auth.challenge is None or _cam_auth_retry):
+        if (not digest_getChallenge(_cam_ip, _cam_auth)):
+            return []
+    # on_open で解除する
+    _cam_auth_retry = True
+    return [f"Authorization: {_cam_auth.build_header('GET', _cam_auth_path)}"]
 
 
 ##########
@@ -130,16 +171,19 @@ def digest_getAuthHeader(cam_ip, cam_id, cam_pwd):
 #
 #   Note:
 #       定期的にキープアライブを送信しないと、カメラから接続を切断される為
+#       KeepaliveScheduler から呼び出される。切断済みの場合は False を返し、スケジューラから解除される
 ##########
-def metarcv_keepalive():
+def metarcv_keepalive(ws):
+    if (ws.sock is None or not ws.sock.connected):
+        return False
     # コマンド送信
-    _ws_h.send(
+    ws.send(
         f"GET_PARAMETER {_rtsp_base_uri} RTSP/1.0\r\n" + \
         f"CSeq: {_rtsp_cseq}\r\n" + \
         f"Session:{_rtsp_sid}\r\n" + \
         f"\r\n"
     )
-    threading.Timer(_rtsp_keepalive_time, metarcv_keepalive).start()
+    return True
 
 
 ##########
@@ -153,8 +197,7 @@ def on_message(ws, message):
     global _rtsp_sid
     global _rtsp_cseq
     global _rtsp_state
-    global _xml_rcvdata
-    global _xml_rcvstate
+    global _rtsp_keepalive_time
 
     # RTSPコマンドのレスポンスの場合
     if (type(message) == str):
@@ -195,6 +238,7 @@ def on_message(ws, message):
                 items = param.split(": ")
                 if ("Session" == items[0]):
                     _rtsp_sid = items[1].split(";")[0]
+                    _rtsp_keepalive_time = session_keepalive_interval(items[1])
                     break
             # PLAY送信
             ws.send(
@@ -204,84 +248,50 @@ def on_message(ws, message):
                 f"\r\n"
             )
 
-            # キープアライブスレッドを起動
-            threading.Thread(target=metarcv_keepalive).start()
+            # キープアライブを登録
+            _keepalive.schedule(ws, _rtsp_keepalive_time, lambda: metarcv_keepalive(ws))
             _rtsp_state += 1
     
-    # Metaデータの先頭4byteはWebSocketの識別情報、その後の12byteはRTPヘッダ
+    # Metaデータはインターリーブヘッダ(4byte)とRTPヘッダ、XMLデータの断片
     # RTPヘッダのPayload typeが96以上(dynamic)の場合のみ処理する
-    elif (type(message) == bytes and (message[5] & 0x7f) >= 96):
-        # 受信データのタグ
-        # XMLデータをParseする事が必要だが、サンプルアプリのため簡易に文字列検索でデータを取り出す
-        key_s_xml = "<?xml version="
-        key_e_xml = "</tt:MetaDataStream>"
-        key_s_date = "<tt:Message UtcTime="
-        key_s_img = "<xsd:base64Binary>"
-        key_e_img = "</xsd:base64Binary>"
-
-        # 受信データから識別情報・RTPヘッダを取り除く
-        stripdata = message[16:].decode()
-
-        # XMLデータの開始を受信
-        if (key_s_xml in stripdata):
-            # 1回で全電文を受信している
-            if (key_e_xml in stripdata):
-                _xml_rcvdata = stripdata
-                _xml_rcvstate = 2
-            else:
-                # 分割でXMLデータ受信を開始する
-                _xml_rcvdata = stripdata
-                _xml_rcvstate = 1
-                return
-        elif (key_e_xml in stripdata):
-            # XMLの最後を受信
-            _xml_rcvdata += stripdata
-            _xml_rcvstate = 2
-        else:
-            # 途中のデータを受信
-            if (1 == _xml_rcvstate):
-                _xml_rcvdata += stripdata
-            return
+    elif (type(message) == bytes):
+        _rtp_depacketizer.feed(message)
 
-        # 受信データから日付を取得
-        pos_key_s_date = _xml_rcvdata.find(key_s_date)
-        if (-1 == pos_key_s_date):
-            print("not exist date")
-            _xml_rcvstate = 0
-            return
-        value_date = _xml_rcvdata[pos_key_s_date+len(key_s_date)+1:pos_key_s_date+len(key_s_date)+20]
-
-        # 受信データからJPEGイメージを取得
-        pos_key_s_img = _xml_rcvdata.find(key_s_img)
-        pos_key_e_img = _xml_rcvdata.find(key_e_img)
-        # JPEGイメージ用タグが存在しない場合は終了
-        if (-1 == pos_key_s_img or -1 == pos_key_e_img):
-            print("not exist jpeg")
-            _xml_rcvstate = 0
-            return
-
-        value_img = _xml_rcvdata[pos_key_s_img+len(key_s_img):pos_key_e_img]
-        # JPEGデータはBase64でエンコードされているので元に戻す
-        img_savedata = base64.b64decode(value_img.encode())
-
-        # 保存するファイル名を設定
-        img_savefname = _img_savedir + "/" + value_date.replace(":", "-") + ".jpg"
-        print(img_savefname)
-        #ファイルに保存
-        with open(img_savefname, 'bw') as fd:
-            fd.write(img_savedata)
 
-        # ステータスを元に戻す
-        _xml_rcvstate = 0
+##########
+#   メタデータのイベントを受信した時の処理
+#
+#   Note:
+#       event : OnvifMetaParser が通知するイベント (dict)
+#       イベントストアへの書き込みはバックグラウンドスレッドで行われる
+##########
+def metarcv_on_event(event):
+    # JPEG画像を含むイベントのみ処理する
+    if (event["type"] != "event"):
+        return
+    if (event["image"] is None):
+        print("not exist jpeg")
+        return
+    if (not _event_store.append(_cam_ip, event)):
+        print("event store is busy : dropped")
+        return
+    print(f"{event['UtcTime']} {event['topic']} {len(event['image'])} bytes")
 
 
 ##########
 #   RTSP　エラー発生
 #
 #   Note:
+#       接続時に401応答を受信した場合は、応答の challenge で次回の認証ヘッダを計算する
 ##########
 def on_error(ws, error):
+    global _cam_auth_retry
+
     print(error)
+    if (isinstance(error, websocket.WebSocketBadStatusException) and error.status_code == 401):
+        headers = error.resp_headers or {}
+        if (_cam_auth.update_challenge(headers.get("www-authenticate"))):
+            _cam_auth_retry = False
 
 
 ##########
@@ -289,9 +299,9 @@ def on_error(ws, error):
 #
 #   Note:
 ##########
-def on_error(ws, error):
-    print(error)
 def on_close(ws, close_status_code, close_msg):
+    # キープアライブを停止
+    _keepalive.cancel(ws)
     print("### closed ###")
 
 
@@ -301,7 +311,23 @@ def on_close(ws, close_status_code, close_msg):
 #   Note:
 ##########
 def on_open(ws):
+    global _rtsp_base_uri
+    global _rtsp_sid
+    global _rtsp_cseq
+    global _rtsp_state
+    global _rtp_depacketizer
+    global _cam_auth_retry
+
     print("Opened connection")
+    _cam_auth_retry = False
+    # 再接続の場合は前回の状態を破棄する
+    _rtsp_base_uri = ""
+    _rtsp_sid = ""
+    _rtsp_cseq = 1
+    _rtsp_state = 0
+    _meta_parser.reset()
+    _rtp_depacketizer = RtpDepacketizer(sink=_meta_parser)
+
     # OPTIONS送信
     ws.send(f"OPTIONS {_rtsp_start_uri} RTSP/1.0\r\nCSeq: {_rtsp_cseq}\r\n\r\n")
 
@@ -312,20 +338,18 @@ def on_open(ws):
 #   Note:
 ##########
 if __name__ == "__main__":
-    # JPEG保存用フォルダ作成
-    try:
-        os.mkdir(_img_savedir)
-    except Exception as e:
-        print("")
-
-    # 通信認証情報取得        
-    authInfo = digest_getAuthHeader(_cam_ip, _cam_id, _cam_pwd)
+    # メタデータ受信の準備 (イベントストアのフォルダは自動で作成される)
+    _event_store = EventStore(_event_dir)
+    _keepalive = KeepaliveScheduler()
+    _meta_parser = OnvifMetaParser(metarcv_on_event)
+    _rtp_depacketizer = RtpDepacketizer(sink=_meta_parser)
 
     # WebSocket通信開始
+    #   認証ヘッダは接続 (再接続) 毎に digest_getAuthHeader で計算する
     _ws_h = websocket.WebSocketApp(
         _ws_uri,
         subprotocols = ['binary'], 
-        header=[f"Authorization: {authInfo}"],
+        header=digest_getAuthHeader,
         on_open=on_open,
         on_message=on_message,
         on_error=on_error,
@@ -333,3 +357,7 @@ if __name__ == "__main__":
 
     _ws_h.run_forever(reconnect=5)
 
+    # 登録待ちのイベントを保存してから終了する
+    _keepalive.stop()
+    _event_store.stop()
+
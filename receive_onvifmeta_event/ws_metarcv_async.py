@@ -0,0 +1,478 @@
+'''
+Copyright 2023 i-PRO Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+##########
+#
+# i-PRO AIアプリケーションメタデータ受信サンプル (複数カメラ・asyncio版)
+# i-PRO AI Application Metadata Receiver Sample (multi-camera, asyncio)
+#
+#   1つのプロセス・1つのイベントループで多数のAIカメラからONVIFメタデータを受信する
+#       * カメラ毎の状態 (RTSPシーケンス、セッションID、受信中のXMLなど) は MetaSession に持つ
+#       * OPTIONS/DESCRIBE/SETUP/PLAY のネゴシエーションとメタデータ受信をカメラ毎のタスクで行う
+#       * 全カメラのイベントを1つのキューで返す。キューに溜められるイベント数はカメラ毎に制限し、
+#         超えた場合はそのカメラのイベントを捨てる (1台のカメラが他のカメラのイベントを押し出さない)
+#       * 切断された場合は reconnect_wait 秒後に再接続する
+#       * キープアライブはタスクを作らず、イベントループの call_later で送信する
+#         周期は SETUP 応答の Session timeout から決め、切断時に取り消す
+#       * Digest認証の challenge をカメラ毎にキャッシュし、再接続毎に認証ヘッダをローカルで計算する
+#         カメラが401を返した場合のみ challenge を取得し直す
+#   Receive ONVIF metadata from many AI cameras in one process and one event loop.
+#       * The state of each camera (RTSP CSeq, session ID, XML being received, etc.) is held by MetaSession.
+#       * The OPTIONS/DESCRIBE/SETUP/PLAY negotiation and metadata reception run in one task per camera.
+#       * Events of all cameras are returned through one queue. The number of queued events is limited
+#         per camera, and events over the limit are dropped, so one camera cannot push out the others.
+#       * When disconnected, the camera is reconnected after reconnect_wait seconds.
+#       * Keepalives are sent by call_later of the event loop instead of a task per camera.
+#         The period is decided from the Session timeout of the SETUP response, and cancelled on close.
+#       * The digest challenge is cached per camera and the Authorization header is calculated locally
+#         on every reconnect. The challenge is fetched again only when the camera answers 401.
+#
+#   Requirements:
+#       aiohttp     https://docs.aiohttp.org/
+#         pip3 install aiohttp
+#
+#   Usage:
+#       以下の箇所を使用するカメラの設定に合わせて変更してください
+#       Change the following sections to match the settings of the cameras you are using.
+#           cameras = [ MetaCameraSetting("camera00", "192.168.0.10", "user-id", "password"), ... ]
+#
+#       async with AsyncMetaCollector(cameras) as collector:
+#           async for name, event in collector:
+#               ...
+#
+#   Note:
+#       rtp_depacketizer.py, onvif_meta_parser.py, digest_auth.py, keepalive_scheduler.py, event_store.py
+#       を同じフォルダに保存してください
+#       You need to save rtp_depacketizer.py, onvif_meta_parser.py, digest_auth.py, keepalive_scheduler.py and
+#       event_store.py in the same location as this program.
+#
+#   Author:
+#       Ozawa Kazuya (小澤 和哉)
+#
+#   History:
+#       2026/10/18 ver 1.00 初版
+#       2026/10/18 ver 1.01 キープアライブをタスクから call_later に変更し、周期を SETUP 応答の Session timeout から決める
+#       2026/10/18 ver 1.02 Digest認証の challenge をキャッシュし、再接続毎のダミーCGIの送信を廃止
+#       2026/10/18 ver 1.03 main() のJPEG画像の保存先をイベントストアに変更
+#       2026/10/18 ver 1.04 コネクション数の上限 (aiohttp の既定値 100) を解除し、接続待ちにタイムアウトを設定
+##########
+import asyncio
+import time
+
+import aiohttp
+
+from rtp_depacketizer import RtpDepacketizer
+from onvif_meta_parser import OnvifMetaParser
+from event_store import EventStore
+from digest_auth import DigestAuth
+from keepalive_scheduler import session_keepalive_interval
+
+
+##########
+#   RTSP応答を解析する
+#
+#   Note:
+#       戻り値 : (ステータスコード, ヘッダのdict)  ヘッダ名は小文字
+##########
+def parse_rtsp_response(message):
+    lines = message.split("\r\n")
+    items = lines[0].split(" ", 2)
+    status = int(items[1]) if (len(items) >= 2 and items[1].isdigit()) else 0
+    headers = {}
+    for line in lines[1:]:
+        if (line == ""):
+            break
+        name, sep, value = line.partition(":")
+        if (sep):
+            headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+##########
+#   RTSP応答のエラー
+##########
+class RtspError(Exception):
+    pass
+
+
+##########
+#   カメラ1台の接続設定
+##########
+class MetaCameraSetting:
+    def __init__(self, name, host, user, password, stream="stream_1", track="trackID=4"):
+        self.name = name
+        self.host = host            # IPアドレス (または host:port)
+        self.user = user
+        self.password = password
+        self.stream = stream
+        self.track = track          # メタデータのトラック
+
+    @property
+    def ws_url(self):
+        return f"ws://{self.host}/rtsp-over-websocket"
+
+    @property
+    def rtsp_url(self):
+        return f"rtsp://{self.host.split(':')[0]}/MediaInput/{self.stream}?event=1"
+
+    @property
+    def auth_path(self):
+        return "/cgi-bin/getinfo?FILE=1"
+
+
+##########
+#   カメラ1台の接続 (RTSPセッション)
+#
+#   Note:
+#       RTSPの状態とメタデータの受信処理 (デパケタイザ、XMLパーサ) をカメラ毎に持つ
+#       keepalive_time : キープアライブの周期 [sec]  None の場合は SETUP 応答の Session timeout の半分
+##########
+class MetaSession:
+    def __init__(self, camera, on_event, image_writer=None, image_path=None, keepalive_time=None):
+        self.camera = camera
+        self.keepalive_time = keepalive_time
+
+        self.cseq = 1
+        self.base_uri = ""
+        self.session_id = ""
+        self.session_interval = None    # SETUP 応答の Session timeout から求めた周期 [sec]
+        self.ws = None
+        self._keepalive_handle = None
+
+        # 統計情報
+        self.connects = 0           # 接続回数
+        self.errors = 0             # 接続エラー回数
+        self.events = 0             # 受信したイベント数
+        self.dropped = 0            # キューが一杯のため捨てたイベント数
+        self.queued = 0             # キューに入っているイベント数
+
+        self.auth = DigestAuth(camera.user, camera.password)    # 再接続しても challenge を使い回す
+        self.parser = OnvifMetaParser(on_event, image_writer=image_writer, image_path=image_path)
+        self.depacketizer = RtpDepacketizer(sink=self.parser)
+
+    ##########
+    #   接続毎に状態を初期化する
+    ##########
+    def reset(self):
+        self.stop_keepalive()
+        self.cseq = 1
+        self.base_uri = ""
+        self.session_id = ""
+        self.session_interval = None
+        self.ws = None
+        self.parser.reset()
+        self.depacketizer = RtpDepacketizer(sink=self.parser)
+
+    ##########
+    #   RTSPリクエストを送信し、応答を待つ
+    #
+    #   Note:
+    #       応答待ちの間に受信したメタデータも処理する
+    #       戻り値 : 応答ヘッダのdict
+    ##########
+    async def request(self, method, uri, *headers):
+        cseq = self.cseq
+        self.cseq += 1
+        text = f"{method} {uri} RTSP/1.0\r\nCSeq: {cseq}\r\n"
+        for header in headers:
+            text += header + "\r\n"
+        await self.ws.send_str(text + "\r\n")
+
+        while True:
+            msg = await self.ws.receive()
+            if (msg.type == aiohttp.WSMsgType.BINARY):
+                self.depacketizer.feed(msg.data)
+            elif (msg.type == aiohttp.WSMsgType.TEXT):
+                status, response = parse_rtsp_response(msg.data)
+                if (response.get("cseq") != str(cseq)):
+                    continue
+                if (status != 200):
+                    raise RtspError(f"{method} : {msg.data.splitlines()[0]}")
+                return response
+            else:
+                raise RtspError(f"{method} : websocket closed")
+
+    ##########
+    #   OPTIONS/DESCRIBE/SETUP/PLAY
+    ##########
+    async def negotiate(self):
+        rtsp_url = self.camera.rtsp_url
+        await self.request("OPTIONS", rtsp_url)
+
+        response = await self.request("DESCRIBE", rtsp_url, "Accept: application/sdp")
+        self.base_uri = response.get("content-base", rtsp_url + "/")
+
+        response = await self.request(
+            "SETUP", f"{self.base_uri}{self.camera.track}", "Transport: RTP/AVP/TCP;unicast;interleaved=0-1")
+        self.session_id = response.get("session", "").split(";")[0]
+        self.session_interval = session_keepalive_interval(response.get("session", ""))
+
+        await self.request("PLAY", self.base_uri, f"Session:{self.session_id}")
+
+    ##########
+    #   キープアライブ (GET_PARAMETER) の送信を開始する
+    #
+    #   Note:
+    #       イベントループの call_later で登録するので、カメラ毎のタスクやスレッドは作らない
+    ##########
+    def start_keepalive(self):
+        interval = self.keepalive_time if self.keepalive_time is not None else self.session_interval
+        self._keepalive_handle = asyncio.get_running_loop().call_later(interval, self._send_keepalive)
+
+    ##########
+    #   キープアライブの送信を停止する
+    ##########
+    def stop_keepalive(self):
+        if (self._keepalive_handle is not None):
+            self._keepalive_handle.cancel()
+            self._keepalive_handle = None
+
+    def _send_keepalive(self):
+        self._keepalive_handle = None
+        if (self.ws is None or self.ws.closed):
+            # 切断済み (受信側で再接続する)
+            return
+        cseq = self.cseq
+        self.cseq += 1
+        task = asyncio.ensure_future(self.ws.send_str(
+            f"GET_PARAMETER {self.base_uri} RTSP/1.0\r\nCSeq: {cseq}\r\nSession:{self.session_id}\r\n\r\n"))
+        # 送信エラーは受信側で検出するので、ここでは結果を捨てる
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self.start_keepalive()
+
+    ##########
+    #   メタデータ受信 (切断されるまで)
+    ##########
+    async def receive(self):
+        async for msg in self.ws:
+            if (msg.type == aiohttp.WSMsgType.BINARY):
+                self.depacketizer.feed(msg.data)
+            elif (msg.type == aiohttp.WSMsgType.TEXT):
+                # GET_PARAMETER の応答
+                status, response = parse_rtsp_response(msg.data)
+                if (status != 200):
+                    raise RtspError(msg.data.splitlines()[0])
+            else:
+                break
+
+    def __str__(self):
+        return f"connects = {self.connects}, errors = {self.errors}, events = {self.events}, " + \
+               f"dropped = {self.dropped}, packets = {self.depacketizer.packets}, lost = {self.depacketizer.lost}"
+
+
+##########
+#   複数カメラのメタデータ受信
+#
+#   Note:
+#       cameras : MetaCameraSetting のリスト
+#       queue_size : イベントキューの大きさ
+#       per_camera_queue : 1台のカメラがキューに入れられるイベント数の上限
+#       image_writer : 画像の書き込み先 (BackgroundFileWriter)  None の場合は event["image"] に bytes を格納する
+#       image_path : 画像のファイル名を返す関数 image_path(camera_name, event)
+##########
+class AsyncMetaCollector:
+    def __init__(self, cameras, queue_size=1000, per_camera_queue=100, image_writer=None, image_path=None,
+                 reconnect_wait=5, timeout=10):
+        self.cameras = cameras
+        self.queue_size = queue_size
+        self.per_camera_queue = per_camera_queue
+        self.image_writer = image_writer
+        self.image_path = image_path
+        self.reconnect_wait = reconnect_wait
+        self.timeout = timeout
+
+        self.sessions = {}
+        self._http = None
+        self._queue = None
+        self._tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    ##########
+    #   (カメラ名, イベント) を返す
+    ##########
+    async def __anext__(self):
+        if (self._queue is None):
+            raise StopAsyncIteration
+        session, event = await self._queue.get()
+        session.queued -= 1
+        return session.camera.name, event
+
+    ##########
+    #   全カメラの受信を開始する
+    ##########
+    async def start(self):
+        # WebSocket は接続中ずっとコネクションを1つ使うので、コネクション数を制限しない (既定値 100 では101台目以降が接続できない)
+        # connect は空きコネクション待ちを含む接続までの時間
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=None, connect=self.timeout, sock_connect=self.timeout))
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        for camera in self.cameras:
+            self.sessions[camera.name] = self._create_session(camera)
+        self._tasks = [asyncio.create_task(self._run(session)) for session in self.sessions.values()]
+
+    ##########
+    #   全カメラの受信を終了する
+    ##########
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if (self._http is not None):
+            await self._http.close()
+            self._http = None
+
+    def print_stats(self):
+        for name, session in self.sessions.items():
+            print(f"{name:20s} {session}")
+
+    def _create_session(self, camera):
+        session = None
+
+        def on_event(event):
+            self._put(session, event)
+
+        image_path = None
+        if (self.image_path is not None):
+            image_path = lambda event: self.image_path(camera.name, event)
+        session = MetaSession(camera, on_event, self.image_writer, image_path)
+        return session
+
+    ##########
+    #   イベントをキューに入れる (カメラ毎の上限を超えた場合は捨てる)
+    ##########
+    def _put(self, session, event):
+        session.events += 1
+        if (session.queued >= self.per_camera_queue or self._queue.full()):
+            session.dropped += 1
+            return
+        session.queued += 1
+        self._queue.put_nowait((session, event))
+
+    ##########
+    #   Digest認証の challenge を取得する (認証ヘッダなしでダミーのCGIを送信する)
+    ##########
+    async def _get_challenge(self, camera, auth):
+        url = f"http://{camera.host}{camera.auth_path}"
+        async with self._http.get(url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as rs:
+            await rs.read()
+            if (rs.status == 401):
+                auth.update_challenge(rs.headers.get("WWW-Authenticate"))
+            elif (rs.status != 200):
+                raise RtspError(f"getinfo : status = {rs.status}")
+
+    ##########
+    #   WebSocket接続
+    #
+    #   Note:
+    #       キャッシュした challenge で認証ヘッダを計算する。HTTP通信は challenge がない場合のみ
+    #       401応答の場合は、応答の challenge で1回だけ接続し直す (カメラ再起動で nonce が変わった場合など)
+    ##########
+    async def _connect(self, session):
+        camera = session.camera
+        auth = session.auth
+        for retry in range(2):
+            if (auth.challenge is None):
+                await self._get_challenge(camera, auth)
+            authorization = auth.build_header("GET", camera.auth_path)
+            headers = {"Authorization": authorization} if authorization else {}
+            try:
+                return await self._http.ws_connect(camera.ws_url, protocols=["binary"], headers=headers,
+                                                   max_msg_size=0)
+            except aiohttp.WSServerHandshakeError as e:
+                if (e.status != 401 or retry > 0):
+                    raise
+                challenge = e.headers.get("WWW-Authenticate") if e.headers else None
+                if (not auth.update_challenge(challenge)):
+                    auth.challenge = None
+        raise RtspError("websocket : authentication failed")
+
+    ##########
+    #   カメラ1台の受信タスク
+    ##########
+    async def _run(self, session):
+        camera = session.camera
+        while True:
+            try:
+                async with await self._connect(session) as ws:
+                    session.reset()
+                    session.ws = ws
+                    session.connects += 1
+                    await asyncio.wait_for(session.negotiate(), self.timeout)
+                    session.start_keepalive()
+                    await session.receive()
+                print(f"{camera.name} : closed")
+
+            except asyncio.CancelledError:
+                raise
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, RtspError, ConnectionError) as e:
+                session.errors += 1
+                print(f"{camera.name} : {e!r}")
+
+            finally:
+                session.stop_keepalive()
+                session.ws = None
+
+            await asyncio.sleep(self.reconnect_wait)
+
+
+##########
+#   Main処理
+#
+#   Note:
+#       イベントを受信し、5秒毎に統計を表示する
+##########
+async def main():
+    # Change to match your camera settings.
+    cameras = [
+        MetaCameraSetting(f"camera{i:02d}", f"192.168.0.{10 + i}", "user-id", "password")
+        for i in range(4)
+    ]
+
+    # イベントと JPEG画像はイベントストアに保存する (event_store.py で検索できる)
+    store = EventStore("events")
+
+    try:
+        async with AsyncMetaCollector(cameras) as collector:
+            last_print = time.perf_counter()
+            async for name, event in collector:
+                # 受信したイベントの処理をここに書く
+                if (event["type"] == "event" and event["image"] is not None):
+                    store.append(name, event)
+                    print(f"{name} : {event['topic']} : {len(event['image'])} bytes")
+
+                if (time.perf_counter() - last_print >= 5.0):
+                    collector.print_stats()
+                    print(f"event store : {store}")
+                    last_print = time.perf_counter()
+    finally:
+        store.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl+C で終了する
+        print("KeyboardInterrupt")